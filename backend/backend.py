@@ -1,24 +1,39 @@
 # backend.py — full version (deep scan + vi-fold search + Sheets/Drive fallbacks + debug)
 import os
+import asyncio
 import re
 import io
 import csv
 import json
 import time
+import threading
 import unicodedata
+from functools import lru_cache
+from itertools import islice
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 
 from ftfy import fix_text, fix_encoding
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
+from cachetools import TTLCache
+import numpy as np
 
 # HTTP fetch & HTML parse
 import httpx
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse, parse_qs
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 # =========================
 # Local Utility Imports  
 # =========================
@@ -62,6 +77,11 @@ from urllib.parse import urlparse, parse_qs
 #     deep_scan_all_sheets
 # )
 
+# ---- Fast diacritic folding (str.translate) cho các vòng sync ----
+try:
+    from backend.utils.text_processing import fold_vi_fast
+except Exception:
+    from utils.text_processing import fold_vi_fast
 
 # ---- Google Sheets via gspread (values/formulas) ----
 try:
@@ -81,6 +101,14 @@ try:
 except Exception:
     HAS_GOOGLE_API = False
 
+# ---- Fast HTML parser (selectolax/Modest, C) — fallback BeautifulSoup ----
+try:
+    from selectolax.parser import HTMLParser
+    HAS_SELECTOLAX = True
+except Exception:
+    HAS_SELECTOLAX = False
+    HTMLParser = None  # type: ignore
+
 # ---- MySQL Database Integration ----
 try:
     from backend import db_mysql
@@ -178,15 +206,16 @@ def normalize_to_gsheets_csv_export(u: str, gid_hint: str | None = None) -> tupl
 
 # NOTE: `add_link` removed — it was unused and incorrectly mutated LINK_POOL (dict).
 # Use LINK_POOL.setdefault(url, []) and LINK_POOL_LIST append sites during indexing instead.
-# Debug ring buffer for logs
-DEBUG_LOG: List[str] = []
+# Debug ring buffer for logs (deque có maxlen: tự đẩy dòng cũ ra, O(1))
 DEBUG_LOG_MAX = 5000
+DEBUG_LOG: deque = deque(maxlen=DEBUG_LOG_MAX)
 STATS: Dict[str, Any] = {"built_at": None, "total_links": 0, "per_sheet": []}
 
 # Skip / cache
 GSPREAD_SKIP_IDS: set[str] = set()        # spreadsheet IDs not suitable for gspread
 URL_ACCESS_CACHE: dict[str, str] = {}     # url -> "ok"|"private"|"unsupported"
-DRIVE_META_CACHE: dict[str, dict] = {}    # fileId -> {id,name,mimeType}
+DRIVE_META_CACHE: TTLCache = TTLCache(maxsize=8192, ttl=600)  # fileId -> {id,name,mimeType}, TTL 10 phút
+DRIVE_META_LOCK = threading.Lock()  # TTLCache không thread-safe
 # =========================
 # --- VN-safe decoding helpers ----------------------------------------------
 # =========================
@@ -225,6 +254,13 @@ def read_csv_text(csv_text: str) -> list[list[str]]:
     reader = csv.reader(io.StringIO(csv_text))
     return [row for row in reader]
 
+def read_csv_text_iter(csv_text: str):
+    """
+    Như read_csv_text nhưng trả iterator (lazy) — dùng kèm islice để không dựng cả sheet.
+    """
+    csv_text = vn_fix_if_needed(csv_text)
+    return csv.reader(io.StringIO(csv_text))
+
 def read_csv_bytes(csv_bytes: bytes, encoding_hint: Optional[str] = None) -> list[list[str]]:
     """
     Đọc CSV từ bytes; ưu tiên utf-8-sig -> utf-8 -> hint -> replace.
@@ -258,20 +294,44 @@ def _dlog(msg: str):
     line = f"[{ts}] {msg}"
     print(line, flush=True)
     DEBUG_LOG.append(line)
-    if len(DEBUG_LOG) > DEBUG_LOG_MAX:
-        del DEBUG_LOG[: len(DEBUG_LOG) - DEBUG_LOG_MAX]
 
 # =========================
 # Utilities
 # =========================
+# Bản ghi link phẳng trong LINK_POOL_LIST (tuple gọn hơn dict 7 key)
+LinkRec = namedtuple("LinkRec", "url sheet row col address gid sheet_name")
+
+def _link_to_dict(rec: LinkRec) -> Dict[str, Any]:
+    """Chuyển LinkRec sang dict chỉ ở biên API/DB (JSON response, insert payload)."""
+    return {
+        "url": rec.url or "",
+        "sheet": rec.sheet or "",
+        "row": rec.row,
+        "col": rec.col,
+        "address": rec.address or "",
+        "gid": rec.gid,
+        "sheet_name": rec.sheet_name or "",
+    }
+
 COL_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-def _a1_addr(row: int, col: int) -> str:
+# Bảng nhãn cột dựng sẵn: _COL_LABELS[1..702] = A..Z, AA..ZZ
+_COL_LABELS: List[str] = [""] + list(COL_LETTERS)
+for _a in COL_LETTERS:
+    for _b in COL_LETTERS:
+        _COL_LABELS.append(_a + _b)
+del _a, _b
+
+def _slow_col_label(col: int) -> str:
     c = col
     label = ""
     while c:
         c, rem = divmod(c - 1, 26)
         label = COL_LETTERS[rem] + label
-    return f"{label}{row}"
+    return label
+
+def _a1_addr(row: int, col: int) -> str:
+    label = _COL_LABELS[col] if 0 < col < len(_COL_LABELS) else _slow_col_label(col)
+    return label + str(row)
 
 URL_RE = re.compile(r"https?://[^\s)>\]\"']+", re.IGNORECASE)
 DOCS_ID_RE = re.compile(r"docs\.google\.com/document/d/([a-zA-Z0-9_-]+)")
@@ -283,6 +343,7 @@ GID_RE = re.compile(r"[#?&]gid=(\d+)")
 
 
 
+@lru_cache(maxsize=65536)  # hàm thuần; cùng URL lặp lại rất nhiều giữa các cell/sheet
 def classify_google_url(url: str) -> Tuple[str, Optional[str], Optional[str]]:
     """
     Return (kind, file_id, gid?) where kind in {'docs','sheets','unknown'}.
@@ -319,16 +380,23 @@ def extract_links_from_cell(val: Any, formula: Any) -> List[str]:
     """
     val_s = val if isinstance(val, str) else ("" if val is None else str(val))
     fm_s = formula if isinstance(formula, str) else ("" if formula is None else str(formula))
+    # Tiền kiểm substring (memmem ở tầng C): đa số cell không có link → bỏ qua regex
+    val_has_url = "://" in val_s
+    fm_has_url = "://" in fm_s
+    fm_has_hl = bool(fm_s) and "HYPERLINK" in fm_s.upper()
+    if not (val_has_url or fm_has_url or fm_has_hl):
+        return []
     links: List[str] = []
-    if val_s:
+    if val_has_url:
         links += URL_RE.findall(val_s)
-    if fm_s:
+    if fm_has_hl:
         m = re.search(r'HYPERLINK\s*\(\s*"([^"]+)"', fm_s, re.IGNORECASE)
         if m:
             u = m.group(1)
             if not u.startswith("http") and ("docs.google.com" in u or "drive.google.com" in u):
                 u = "https://" + u
             links.append(u)
+    if fm_has_url:
         links += URL_RE.findall(fm_s)
     out, seen = [], set()
     for u in links:
@@ -418,8 +486,10 @@ def get_drive_service():
 def get_drive_file_meta(file_id: str) -> Optional[dict]:
     if not file_id:
         return None
-    if file_id in DRIVE_META_CACHE:
-        return DRIVE_META_CACHE[file_id]
+    with DRIVE_META_LOCK:
+        cached = DRIVE_META_CACHE.get(file_id)
+    if cached is not None:
+        return cached
     svc = get_drive_service()
     if not svc:
         return None
@@ -437,7 +507,8 @@ def get_drive_file_meta(file_id: str) -> Optional[dict]:
                 fields="id,name,mimeType"
             ).execute()
             meta = {"id": meta2.get("id"), "name": meta2.get("name"), "mimeType": meta2.get("mimeType")}
-        DRIVE_META_CACHE[file_id] = meta
+        with DRIVE_META_LOCK:
+            DRIVE_META_CACHE[file_id] = meta
         return meta
     except Exception as e:
         _dlog(f"[drive] get meta failed {file_id}: {e}")
@@ -536,7 +607,7 @@ def _coerce_link_item(item) -> dict | None:
 
     return None
 
-def _iter_all_indexed_links(limit: int | None = None) -> list[dict]:
+def _iter_all_indexed_links(limit: int | None = None) -> list[LinkRec]:
     # Dùng LINK_POOL_LIST nếu bạn đã làm theo patch trước; nếu không có, fallback từ LINK_POOL_MAP
     pool = globals().get("LINK_POOL_LIST")
     if isinstance(pool, list):
@@ -547,15 +618,15 @@ def _iter_all_indexed_links(limit: int | None = None) -> list[dict]:
     pool_map = globals().get("LINK_POOL", {})
     for u, locs in (pool_map or {}).items():
         for loc in (locs or []):
-            out.append({
-                "url": u,
-                "sheet": loc.get("sheet", ""),
-                "row": loc.get("row", ""),
-                "col": loc.get("col", ""),
-                "address": loc.get("address", ""),
-                "gid": loc.get("sheet_gid") or loc.get("gid"),
-                "sheet_name": loc.get("sheet_name", "")
-            })
+            out.append(LinkRec(
+                u,
+                loc.get("sheet", ""),
+                loc.get("row", ""),
+                loc.get("col", ""),
+                loc.get("address", ""),
+                loc.get("sheet_gid") or loc.get("gid"),
+                loc.get("sheet_name", ""),
+            ))
             if limit and len(out) >= limit:
                 return out
     return out
@@ -658,6 +729,15 @@ def _rows_from_plaintext_as_table(text: str, max_rows: int = 5) -> List[List[str
         rows.append([p.strip() for p in parts])
     return rows
 
+def _fix_or_empty(c: Any) -> str:
+    if c is None:
+        return ""
+    return fix_vietnamese_text(c if isinstance(c, str) else str(c))
+
+def _fix_rows(rows: Optional[List[List[Any]]], max_rows: int) -> List[List[str]]:
+    """Sửa tiếng Việt từng ô cho max_rows hàng đầu (map chạy ở tầng C, ô lặp lại trúng cache)."""
+    return [list(map(_fix_or_empty, row or ())) for row in islice(rows or (), max_rows)]
+
 async def preview_tables_from_url(url: str, max_rows: int = 5) -> Dict[str, Any]:
     """
     Preview chỉ cho dạng bảng:
@@ -683,11 +763,7 @@ async def preview_tables_from_url(url: str, max_rows: int = 5) -> Dict[str, Any]
             # chuẩn hoá tiếng Việt theo ô
             fixed_tables = []
             for sheet_name, rows in rows_map.items():
-                fixed_rows = [
-                    [fix_vietnamese_text(c) if c is not None else "" for c in (row or [])]
-                    for row in (rows or [])[:max_rows]
-                ]
-                fixed_tables.append({"name": sheet_name, "rows": fixed_rows})
+                fixed_tables.append({"name": sheet_name, "rows": _fix_rows(rows, max_rows)})
             return {"kind": "sheets", "tables": fixed_tables}
         except Exception as e:
             _dlog(f"[sheets] preview via Drive API failed {file_id}: {e}")
@@ -699,15 +775,11 @@ async def preview_tables_from_url(url: str, max_rows: int = 5) -> Dict[str, Any]
     try:
         if is_google_sheets_url(url):
             export_url, sheet_hint = build_gsheets_csv_export(url)
-            import requests
-            resp = requests.get(export_url, timeout=20)
+            resp = await _get_http_client().get(export_url, timeout=20)
             resp.raise_for_status()
             csv_text = decode_http_response(resp)       # decode utf-8/utf-8-sig chuẩn
-            rows = read_csv_text(csv_text)           # CSV → ma trận
-            fixed_rows = [
-                [fix_vietnamese_text(c) if c is not None else "" for c in (row or [])]
-                for row in (rows or [])[:max_rows]
-            ]
+            rows = read_csv_text_iter(csv_text)      # CSV → iterator hàng
+            fixed_rows = _fix_rows(rows, max_rows)
             return {
                 "kind": "sheets",
                 "tables": [{"name": f"Google Sheets ({sheet_hint})", "rows": fixed_rows}]
@@ -725,11 +797,7 @@ async def preview_tables_from_url(url: str, max_rows: int = 5) -> Dict[str, Any]
             try:
                 rows_map = _rows_from_xlsx_bytes(data, max_rows=max_rows) or {}
                 for sheet_name, rows in rows_map.items():
-                    fixed_rows = [
-                        [fix_vietnamese_text(c) if c is not None else "" for c in (row or [])]
-                        for row in (rows or [])[:max_rows]
-                    ]
-                    tables.append({"name": sheet_name, "rows": fixed_rows})
+                    tables.append({"name": sheet_name, "rows": _fix_rows(rows, max_rows)})
             except Exception as e:
                 _dlog(f"[excel-xlsx] preview failed: {e}")
         return {"kind": "excel", "tables": tables}
@@ -769,11 +837,7 @@ async def preview_tables_from_url(url: str, max_rows: int = 5) -> Dict[str, Any]
             txt = await _http_get_text(cand)
             if not txt:
                 continue
-            rows = read_csv_text(txt)
-            fixed_rows = [
-                [normalize_vn_text_block(str(c)) if c is not None else "" for c in (row or [])]
-                for row in (rows or [])[:max_rows]
-            ]
+            fixed_rows = _fix_rows(read_csv_text_iter(txt), max_rows)
             return {"kind": "csv", "tables": [{"name": "Data", "rows": fixed_rows}]}
     except Exception as e:
         _dlog(f"[fallback-csv] preview failed: {e}")
@@ -787,6 +851,51 @@ async def preview_tables_from_url(url: str, max_rows: int = 5) -> Dict[str, Any]
 # =========================
 # HTTP fetch helper
 # =========================
+try:
+    import h2  # noqa: F401  (httpx cần gói h2 để bật HTTP/2)
+    _HAS_H2 = True
+except Exception:
+    _HAS_H2 = False
+
+# Một AsyncClient dùng chung cho cả process: giữ keep-alive, tránh bắt tay TCP+TLS mỗi lần gọi
+_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+        _HTTP_CLIENT = httpx.AsyncClient(
+            http2=_HAS_H2,
+            follow_redirects=True,
+            timeout=20.0,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            headers={"User-Agent": "Mozilla/5.0"},
+        )
+    return _HTTP_CLIENT
+
+@app.on_event("startup")
+async def _startup_http_client():
+    _get_http_client()
+
+@app.on_event("shutdown")
+async def _shutdown_http_client():
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is not None:
+        await _HTTP_CLIENT.aclose()
+        _HTTP_CLIENT = None
+
+def _html_to_text(html: str) -> str:
+    """Bóc tag script/style/noscript rồi lấy text; ưu tiên selectolax nếu có."""
+    if HAS_SELECTOLAX:
+        tree = HTMLParser(html)
+        for node in tree.css("script,style,noscript"):
+            node.decompose()
+        root = tree.body if tree.body is not None else tree.root
+        return root.text(separator="\n") if root is not None else ""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "noscript"]):
+        tag.extract()
+    return soup.get_text("\n")
+
 async def _http_get_text(url: str, timeout: float = 20.0) -> Optional[str]:
     """
     Tải nội dung qua HTTP:
@@ -794,28 +903,19 @@ async def _http_get_text(url: str, timeout: float = 20.0) -> Optional[str]:
       - HTML: bóc sạch tag, trả text
     """
     try:
-        async with httpx.AsyncClient(
-            follow_redirects=True,
-            timeout=timeout,
-            headers={"User-Agent": "Mozilla/5.0"}
-        ) as client:
-            r = await client.get(url)
-            if r.status_code != 200:
-                try:
-                    _dlog(f"[http] {r.status_code} on {url}")
-                except Exception:
-                    pass
-                return None
-            ct = (r.headers.get("content-type") or "").lower()
-            if "text/plain" in ct or url.lower().endswith(".txt"):
-                return r.text
-            if "text/csv" in ct or url.lower().endswith(".csv"):
-                return r.text
-            html = r.text
-            soup = BeautifulSoup(html, "html.parser")
-            for tag in soup(["script", "style", "noscript"]):
-                tag.extract()
-            return soup.get_text("\n")
+        r = await _get_http_client().get(url, timeout=timeout)
+        if r.status_code != 200:
+            try:
+                _dlog(f"[http] {r.status_code} on {url}")
+            except Exception:
+                pass
+            return None
+        ct = (r.headers.get("content-type") or "").lower()
+        if "text/plain" in ct or url.lower().endswith(".txt"):
+            return r.text
+        if "text/csv" in ct or url.lower().endswith(".csv"):
+            return r.text
+        return _html_to_text(r.text)
     except Exception as e:
         try:
             _dlog(f"[http] error {e} on {url}")
@@ -823,6 +923,42 @@ async def _http_get_text(url: str, timeout: float = 20.0) -> Optional[str]:
             pass
         return None
 
+# Giới hạn số request đồng thời tới cùng một host khi race export candidates
+_FETCH_HOST_LIMIT = 4
+_FETCH_HOST_SEMS: Dict[str, asyncio.Semaphore] = {}
+
+def _host_sem(url: str) -> asyncio.Semaphore:
+    host = urlparse(url).netloc
+    sem = _FETCH_HOST_SEMS.get(host)
+    if sem is None:
+        sem = _FETCH_HOST_SEMS[host] = asyncio.Semaphore(_FETCH_HOST_LIMIT)
+    return sem
+
+async def _http_get_text_limited(url: str) -> Optional[str]:
+    async with _host_sem(url):
+        return await _http_get_text(url)
+
+async def _first_text(urls: List[str]) -> Optional[str]:
+    """
+    Gọi _http_get_text cho mọi candidate cùng lúc, lấy text khác rỗng về sớm nhất,
+    huỷ các request còn lại.
+    """
+    if not urls:
+        return None
+    if len(urls) == 1:
+        return await _http_get_text_limited(urls[0])
+    tasks = [asyncio.create_task(_http_get_text_limited(u)) for u in urls]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            text = await fut
+            if text:
+                return text
+        return None
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+
 def _csv_to_text(rows: List[List[str]]) -> str:
     output = io.StringIO()
     writer = csv.writer(output)
@@ -898,7 +1034,20 @@ def _mark_url_private(url: str, reason: str = "private"):
         URL_ACCESS_CACHE[url] = "private"
         _dlog(f"[fetch] mark private for {url} ({reason})")
 
+# Cache nội dung đã fetch theo URL (TTL 5 phút), giới hạn theo tổng số ký tự
+_FETCH_TEXT_CACHE_MAX_CHARS = 64_000_000
+_FETCH_TEXT_CACHE: TTLCache = TTLCache(maxsize=_FETCH_TEXT_CACHE_MAX_CHARS, ttl=300, getsizeof=len)
+
 async def fetch_text_from_url(url: str) -> Optional[str]:
+    cached = _FETCH_TEXT_CACHE.get(url)
+    if cached is not None:
+        return cached
+    text = await _fetch_text_from_url_uncached(url)
+    if text and len(text) <= _FETCH_TEXT_CACHE_MAX_CHARS:
+        _FETCH_TEXT_CACHE[url] = text
+    return text
+
+async def _fetch_text_from_url_uncached(url: str) -> Optional[str]:
     kind, file_id, maybe_gid = classify_google_url(url)
 
     # Nếu đã biết url private → bỏ qua luôn
@@ -974,14 +1123,14 @@ async def fetch_text_from_url(url: str) -> Optional[str]:
         _mark_url_private(url, "excel_download_or_parse_failed")
         return None
 
-    # Nếu không có/không đọc MIME (public?) → thử public export candidates
-    for cand in export_candidates(url):
-        text = await _http_get_text(cand)
-        if text:
-            return fix_vietnamese_text(text)
+    # Nếu không có/không đọc MIME (public?) → thử public export candidates (chạy đua song song)
+    cands = export_candidates(url)
+    text = await _first_text(cands)
+    if text:
+        return fix_vietnamese_text(text)
 
-    # Cuối cùng: HTML thường
-    if kind == "unknown":
+    # Cuối cùng: HTML thường (bỏ qua nếu url đã nằm trong candidates)
+    if kind == "unknown" and url not in cands:
         text = await _http_get_text(url)
         if text:
             return fix_vietnamese_text(text)
@@ -1091,7 +1240,7 @@ def deep_scan_all_sheets(service, spreadsheet_id: str) -> Dict[str, List[Dict[st
 # =========================
 # Indexer
 # =========================
-def _peek_url_rows(u: str, nrows: int = 10, gid: str | None = None) -> list[list[str]]:
+async def _peek_url_rows(u: str, nrows: int = 10, gid: str | None = None) -> list[list[str]]:
     """
     Đọc nhanh 10 dòng đầu từ một URL bảng (Google Sheets/CSV) và sửa tiếng Việt từng ô.
     Không raise lỗi — nếu có vấn đề sẽ trả [].
@@ -1105,38 +1254,81 @@ def _peek_url_rows(u: str, nrows: int = 10, gid: str | None = None) -> list[list
                 sep = "&" if "?" in base else "?"
                 u = f"{base}{sep}gid={gid}"
             export_url, _hint = build_gsheets_csv_export(u)
-            import requests
-            resp = requests.get(export_url, timeout=25)
+            resp = await _get_http_client().get(export_url, timeout=25)
             resp.raise_for_status()
             csv_text = decode_http_response(resp)
-            rows = read_csv_text(csv_text)
-            out = []
-            for row in rows[:nrows]:
-                out.append([fix_vietnamese_text("" if c is None else str(c)) for c in (row or [])])
-            return out
+            return _fix_rows(read_csv_text_iter(csv_text), nrows)
 
         # CSV public
         if u.endswith(".csv") or "format=csv" in u:
-            import requests
-            resp = requests.get(u, timeout=25)
+            resp = await _get_http_client().get(u, timeout=25)
             resp.raise_for_status()
             csv_text = decode_http_response(resp)
-            rows = read_csv_text(csv_text)
-            out = []
-            for row in rows[:nrows]:
-                out.append([fix_vietnamese_text("" if c is None else str(c)) for c in (row or [])])
-            return out
+            return _fix_rows(read_csv_text_iter(csv_text), nrows)
     except Exception as e:
         _dlog(f"[peek] failed {u}: {e}")
     return []
 
+_INDEX_FETCH_WORKERS = 8
+
+# Siêu tập của mọi điều kiện trong vòng cell (thống kê "http"/"HYPERLINK" và
+# tiền kiểm "://" của extract_links_from_cell) → hàng không khớp chắc chắn không có link
+_LINKISH = re.compile(r"http|://|hyperlink", re.IGNORECASE)
+
+def _sheet_has_linkish(values: List[List[Any]], formulas: List[List[Any]]) -> bool:
+    """
+    Một lần quét regex trên toàn bộ values + formulas của sheet.
+    False → sheet không có link nào, khỏi quét từng hàng/từng cell.
+    """
+    try:
+        return bool(_LINKISH.search("\n".join(map("\t".join, values)))
+                    or _LINKISH.search("\n".join(map("\t".join, formulas or ()))))
+    except TypeError:  # có ô không phải str → để vòng per-row tự kiểm
+        return True
+
+def _row_has_text(row_vals: List[Any]) -> bool:
+    """
+    Hàng có ít nhất một ô khác trắng? any() loại nhanh hàng rỗng hoàn toàn ở tầng C,
+    sau đó join + strip một lần thay vì strip từng ô.
+    """
+    if not any(row_vals):
+        return False
+    return not "".join(filter(None, row_vals)).isspace()
+
+def _read_sheet_grids(ws) -> Tuple[Optional[List[List[str]]], List[List[str]]]:
+    """
+    Đọc values + formulas của một worksheet (chạy trong thread pool).
+    Trả (None, []) nếu không đọc được values.
+    """
+    title = ws.title
+    try:
+        values = ws.get_all_values()
+    except Exception as e:
+        _dlog(f"[index] cannot read values: {title}: {e}")
+        return None, []
+
+    nrows = len(values)
+    ncols = max((len(r) for r in values), default=0)
+    try:
+        if nrows > 0 and ncols > 0:
+            rng = f"A1:{_a1_addr(nrows, ncols)}"
+            raw_formulas = ws.get(rng, value_render_option="FORMULA")
+            formulas = [[cell if isinstance(cell, str) else ("" if cell is None else str(cell)) for cell in row]
+                        for row in raw_formulas]
+        else:
+            formulas = []
+    except Exception as e:
+        _dlog(f"[index] cannot read formulas: {title}: {e}")
+        formulas = []
+    return values, formulas
+
 def index_sources(verbose: bool = False, deep: bool = False) -> Tuple[List[Dict[str, Any]], List[str]]:
     rows: List[Dict[str, Any]] = []
     sheets: List[str] = []
 
     # reset kho link
     LINK_POOL.clear()        # dict: url -> [loc]
-    LINK_POOL_LIST.clear()   # list phẳng: [{url, sheet, row, col, address, gid, sheet_name}]
+    LINK_POOL_LIST.clear()   # list phẳng: [LinkRec(url, sheet, row, col, address, gid, sheet_name)]
 
     STATS["per_sheet"] = []
     start_ts = time.time()
@@ -1183,32 +1375,22 @@ def index_sources(verbose: bool = False, deep: bool = False) -> Tuple[List[Dict[
 
     # để tránh trùng khi đổ vào LIST phẳng
     seen_flat_keys: set[str] = set()  # key = f"{url}@@{address}"
+    # để dedup O(1) khi merge deep vào LINK_POOL (map)
+    seen_map_keys: set[tuple[str, str, str]] = set()  # (url, sheet, address)
 
-    sheet_row_base: Dict[str, int] = {}
+    # Tải values + formulas của mọi sheet song song (I/O-bound), rồi xử lý tuần tự như cũ
+    with ThreadPoolExecutor(max_workers=min(_INDEX_FETCH_WORKERS, max(1, len(worksheets)))) as pool:
+        grids = list(pool.map(_read_sheet_grids, worksheets))
 
-    for ws in worksheets:
+    for ws, (values, formulas) in zip(worksheets, grids):
         title = ws.title
         sheets.append(title)
 
-        try:
-            values = ws.get_all_values()
-        except Exception as e:
-            _dlog(f"[index] cannot read values: {title}: {e}")
+        if values is None:
             continue
 
         nrows = len(values)
         ncols = max((len(r) for r in values), default=0)
-        try:
-            if nrows > 0 and ncols > 0:
-                rng = f"A1:{_a1_addr(nrows, ncols)}"
-                raw_formulas = ws.get(rng, value_render_option="FORMULA")
-                formulas = [[cell if isinstance(cell, str) else ("" if cell is None else str(cell)) for cell in row]
-                            for row in raw_formulas]
-            else:
-                formulas = []
-        except Exception as e:
-            _dlog(f"[index] cannot read formulas: {title}: {e}")
-            formulas = []
 
         # stats
         non_empty_cells = 0
@@ -1217,31 +1399,44 @@ def index_sources(verbose: bool = False, deep: bool = False) -> Tuple[List[Dict[
         cell_with_links = 0
         list_before = len(LINK_POOL_LIST)
         map_before = len(LINK_POOL)
+        flat_batch: List[LinkRec] = []  # gom link phẳng của sheet, extend 1 lần vào LINK_POOL_LIST
 
         if verbose:
             _dlog(f"[index] Sheet '{title}' size ≈ {nrows}x{ncols}")
 
-        # pack rows cho search theo hàng
-        base_row_index = len(rows)
-        sheet_row_base[title] = base_row_index
-        for r in range(nrows):
-            row_vals = values[r]
-            if any((cell or "").strip() for cell in row_vals):
-                rows.append({
+        # MỘT lượt duyệt: vừa đóng gói hàng cho search, vừa trích link từ cell
+        sheet_rows: Dict[int, Dict[str, Any]] = {}  # số hàng (1-based) -> row record
+        sheet_linkish = _sheet_has_linkish(values, formulas)
+        for r, row_vals in enumerate(values):
+            fm_row = formulas[r] if r < len(formulas) else ()
+            row_rec: Optional[Dict[str, Any]] = None
+            if _row_has_text(row_vals):
+                text = " ".join(x for x in row_vals if isinstance(x, str))
+                text_fixed = fix_vietnamese_text(text)
+                row_rec = {
                     "sheet": title,
                     "row": r + 1,
                     "cols": row_vals,
-                    "text": " ".join(x for x in row_vals if isinstance(x, str)),
+                    "text": text,
+                    # chuẩn hoá 1 lần lúc index, search_rows không phải làm lại mỗi query
+                    "text_fixed": text_fixed,
+                    "text_fold": fold_vi_fast(text_fixed),
                     "links": []
-                })
+                }
+                rows.append(row_rec)
+                sheet_rows[r + 1] = row_rec
+
+            # Sheet không có dấu hiệu link nào, hoặc hàng này không có → bỏ qua vòng từng cell
+            if not sheet_linkish or not (_LINKISH.search("\t".join(v for v in row_vals if isinstance(v, str)))
+                    or _LINKISH.search("\t".join(f for f in fm_row if isinstance(f, str)))):
+                non_empty_cells += sum(1 for v in row_vals if isinstance(v, str) and v.strip())
+                continue
 
-        # duyệt cell để trích link
-        for r in range(nrows):
             for c in range(ncols):
-                v = values[r][c] if c < len(values[r]) else ""
+                v = row_vals[c] if c < len(row_vals) else ""
                 if isinstance(v, str) and v.strip():
                     non_empty_cells += 1
-                fm = formulas[r][c] if (r < len(formulas) and c < len(formulas[r])) else ""
+                fm = fm_row[c] if c < len(fm_row) else ""
                 if ("http" in (v or "")) and isinstance(v, str):
                     value_http_cells += 1
                 if ("http" in (fm or "")) or ("HYPERLINK" in (fm or "")):
@@ -1266,26 +1461,17 @@ def index_sources(verbose: bool = False, deep: bool = False) -> Tuple[List[Dict[
                         if sheet_name:
                             loc["sheet_name"] = sheet_name
                     LINK_POOL.setdefault(u, []).append(loc)
+                    seen_map_keys.add((u, title, a1))
 
                     # 2) list phẳng (phục vụ scan_all_links)
                     k = f"{u}@@{a1}"
                     if k not in seen_flat_keys:
                         seen_flat_keys.add(k)
-                        LINK_POOL_LIST.append({
-                            "url": u,
-                            "sheet": title,
-                            "row": r + 1,
-                            "col": c + 1,
-                            "address": a1,
-                            "gid": maybe_gid,
-                            "sheet_name": sheet_name
-                        })
+                        flat_batch.append(LinkRec(u, title, r + 1, c + 1, a1, maybe_gid, sheet_name))
 
                 # đẩy link vào record hàng (để follow_links hoạt động như cũ)
-                try:
-                    rows[base_row_index + r]["links"].extend(link_list)
-                except Exception:
-                    pass
+                if row_rec is not None:
+                    row_rec["links"].extend(link_list)
 
         # deep rich-text links
         deep_added_list = 0
@@ -1300,8 +1486,9 @@ def index_sources(verbose: bool = False, deep: bool = False) -> Tuple[List[Dict[
                 sheet_name2 = gid_to_name.get(str(maybe_gid2), "") if maybe_gid2 else ""
 
                 # map
-                exists = any(loc.get("sheet")==title and loc.get("address")==a1_deep for loc in LINK_POOL.get(u, []))
-                if not exists:
+                map_key = (u, title, a1_deep)
+                if map_key not in seen_map_keys:
+                    seen_map_keys.add(map_key)
                     LINK_POOL.setdefault(u, []).append({
                         "sheet": title, "row": r1, "col": c1, "address": a1_deep,
                         **({"sheet_gid": maybe_gid2} if maybe_gid2 else {}),
@@ -1313,17 +1500,15 @@ def index_sources(verbose: bool = False, deep: bool = False) -> Tuple[List[Dict[
                 k2 = f"{u}@@{a1_deep}"
                 if k2 not in seen_flat_keys:
                     seen_flat_keys.add(k2)
-                    LINK_POOL_LIST.append({
-                        "url": u, "sheet": title, "row": r1, "col": c1, "address": a1_deep,
-                        "gid": maybe_gid2, "sheet_name": sheet_name2
-                    })
+                    flat_batch.append(LinkRec(u, title, r1, c1, a1_deep, maybe_gid2, sheet_name2))
                     deep_added_list += 1
 
                 # gắn vào row record
-                try:
-                    rows[sheet_row_base[title] + (r1 - 1)]["links"].append(u)
-                except Exception:
-                    pass
+                row_rec = sheet_rows.get(r1)
+                if row_rec is not None:
+                    row_rec["links"].append(u)
+
+        LINK_POOL_LIST.extend(flat_batch)
 
         sheet_stat = {
             "sheet": title,
@@ -1373,43 +1558,64 @@ def _tokens(q_fold: str) -> list[str]:
     # tách theo khoảng trắng, bỏ token 1 ký tự hay stopword rất ngắn nếu muốn
     return [t for t in re.split(r"\s+", q_fold) if len(t) >= 2]
 
+@lru_cache(maxsize=1024)
+def _compiled_tokens(q_fold: str) -> tuple:
+    # compile 1 lần mỗi query thay vì mỗi token × mỗi row
+    return tuple(re.compile(rf"\b{re.escape(t)}\b") for t in _tokens(q_fold))
+
 def _all_tokens_in_text(q_fold: str, text_fold: str) -> bool:
     # match biên từ trên text đã bỏ dấu để tránh match một phần "nguyen" trong "truongnguyen"
-    toks = _tokens(q_fold)
-    return all(re.search(rf"\b{re.escape(tok)}\b", text_fold) for tok in toks)
+    return all(p.search(text_fold) for p in _compiled_tokens(q_fold))
+
+# Corpus dạng list song song với DATABASE_ROWS cho rapidfuzz.process.cdist (dựng lại khi rebuild)
+_ROW_CORPUS: Dict[str, Any] = {"key": None, "fixed": [], "fold": []}
+
+def _row_corpus() -> Tuple[List[str], List[str]]:
+    key = (id(DATABASE_ROWS), len(DATABASE_ROWS))
+    if _ROW_CORPUS["key"] != key:
+        _ROW_CORPUS["fixed"] = [r["text_fixed"] for r in DATABASE_ROWS]
+        _ROW_CORPUS["fold"] = [r["text_fold"] for r in DATABASE_ROWS]
+        _ROW_CORPUS["key"] = key
+    return _ROW_CORPUS["fixed"], _ROW_CORPUS["fold"]
 
 def search_rows(query: str, top_k: int = 20, fuzz_threshold: int = 85, exact: bool = False) -> List[Dict[str, Any]]:
     results: List[Tuple[int, Dict[str, Any]]] = []
     if not query or not str(query).strip():
         return []
     q_fixed, q_fold = normalize_query(query)
-    tokens = _tokens(q_fold)
-    
-    for row in DATABASE_ROWS:
-        raw = row.get("text") or ""
-        text_fixed = fix_vietnamese_text(raw)
-        text_fold  = fold_vietnamese(text_fixed)
-        if exact:
-            ok = _all_tokens_in_text(q_fold, text_fold)
-            score = 100 if ok else 0
-        else:
-            if q_fixed.lower() in text_fixed.lower() or q_fold in text_fold:
-                score = 100
-            else:
-                score = max(
-                    fuzz.partial_ratio(q_fixed, text_fixed),
-                    fuzz.partial_ratio(q_fold,  text_fold)
-                )
-        
-        if score >= (100 if exact else fuzz_threshold):
-            results.append((score, {
-                "sheet": row["sheet"],
-                "row": row["row"],
-                "snippet": _snippet(text_fixed, q_fixed),
-                "snippet_nodau": _snippet(text_fold, q_fold),
-                "links": sorted(set(row.get("links", []))),
-                "score": score
-            }))
+
+    def _hit(row: Dict[str, Any], score) -> Dict[str, Any]:
+        return {
+            "sheet": row["sheet"],
+            "row": row["row"],
+            "snippet": _snippet(row["text_fixed"], row["text_fold"], q_fold),
+            "snippet_nodau": _snippet(row["text_fold"], row["text_fold"], q_fold),
+            "links": sorted(set(row.get("links", []))),
+            "score": score
+        }
+
+    if exact:
+        for row in DATABASE_ROWS:
+            if _all_tokens_in_text(q_fold, row["text_fold"]):
+                results.append((100, _hit(row, 100)))
+    else:
+        corpus_fixed, corpus_fold = _row_corpus()
+        if corpus_fixed:
+            # chấm điểm cả corpus trong C (rapidfuzz), chỉ duyệt Python trên các hàng qua ngưỡng
+            s_fixed = process.cdist([q_fixed], corpus_fixed, scorer=fuzz.partial_ratio,
+                                    score_cutoff=fuzz_threshold, workers=-1)[0]
+            s_fold = process.cdist([q_fold], corpus_fold, scorer=fuzz.partial_ratio,
+                                   score_cutoff=fuzz_threshold, workers=-1)[0]
+            # max + ngưỡng đều chạy vector trong numpy; ghi đè tại chỗ, không cấp phát mảng mới
+            scores = np.maximum(s_fixed, s_fold, out=s_fixed)
+            q_low = q_fixed.lower()
+            for i in np.flatnonzero(scores >= fuzz_threshold):
+                row = DATABASE_ROWS[i]
+                if q_low in row["text_fixed"].lower() or q_fold in row["text_fold"]:
+                    score = 100
+                else:
+                    score = float(scores[i])
+                results.append((score, _hit(row, score)))
     results.sort(key=lambda x: x[0], reverse=True)
     return [r for _, r in results[:top_k]]
 
@@ -1417,12 +1623,15 @@ def search_rows(query: str, top_k: int = 20, fuzz_threshold: int = 85, exact: bo
 def _tokens_fold(q: str) -> list[str]:
     return [t for t in re.split(r"\s+", fold_vietnamese(q)) if t]
 
+@lru_cache(maxsize=1024)
+def _compiled_word(tok: str):
+    return re.compile(rf"\b{re.escape(tok)}\b")
+
 def _all_tokens_word_boundary(text_fold: str, toks: list[str]) -> bool:
-    return all(re.search(rf"\b{re.escape(tok)}\b", text_fold) for tok in toks)
+    return all(_compiled_word(tok).search(text_fold) for tok in toks)
 
-def _match_score(q_raw: str, s_raw: str, exact: bool, fuzz_threshold: int) -> int:
-    q_fix, s_fix = fix_vietnamese_text(q_raw), fix_vietnamese_text(s_raw)
-    q_fold, s_fold = fold_vietnamese(q_fix), fold_vietnamese(s_fix)
+def _match_score_norm(q_fix: str, q_fold: str, s_fix: str, s_fold: str, exact: bool) -> int:
+    """Như _match_score nhưng nhận text đã chuẩn hoá sẵn (không fix/fold lại)."""
     if exact:
         return 100 if _all_tokens_word_boundary(s_fold, _tokens_fold(q_fix)) else 0
     return max(
@@ -1430,18 +1639,37 @@ def _match_score(q_raw: str, s_raw: str, exact: bool, fuzz_threshold: int) -> in
         fuzz.partial_ratio(q_fold, s_fold)
     )
 
-def _snippet(s: str, q: str, window: int = 60) -> str:
-    s_fix, q_fix = fix_vietnamese_text(s), fix_vietnamese_text(q)
-    s_fold, q_fold = fold_vietnamese(s_fix), fold_vietnamese(q_fix)
-    m = re.search(re.escape(q_fold), s_fold, flags=re.IGNORECASE)
-    if not m:
+def _match_score(q_raw: str, s_raw: str, exact: bool, fuzz_threshold: int) -> int:
+    q_fix, s_fix = fix_vietnamese_text(q_raw), fix_vietnamese_text(s_raw)
+    return _match_score_norm(q_fix, fold_vi_fast(q_fix), s_fix, fold_vi_fast(s_fix), exact)
+
+def _snippet(s_fix: str, s_fold: str, q_fold: str, window: int = 60) -> str:
+    """
+    Cắt đoạn quanh vị trí khớp. Nhận text đã fix/fold sẵn; text fold đã lowercase
+    và q_fold không cần regex → str.find.
+    """
+    i = s_fold.find(q_fold)
+    if i < 0:
         # fallback: lấy đầu dòng
         return s_fix[:window*2]
-    i = m.start()
     left = max(0, i - window)
     right = min(len(s_fix), i + window)
     return s_fix[left:right]
 # ---- CORE: search trong 1 URL (Sheets/CSV) trả về list hit ----
+def _read_csv_rows_fast(csv_text: str, max_rows: int) -> List[List[str]]:
+    """
+    Parse CSV bằng pandas (C engine) -> list các hàng chuỗi ("" thay cho ô trống).
+    Không có pandas hoặc CSV lệch số cột (C engine báo lỗi) -> quay về read_csv_text.
+    """
+    try:
+        import pandas as pd
+        df = pd.read_csv(io.StringIO(csv_text), engine="c", header=None, dtype=str,
+                         keep_default_na=False, nrows=max_rows, skip_blank_lines=False)
+        return df.fillna("").values.tolist()
+    except Exception:
+        return [["" if c is None else str(c) for c in row]
+                for row in read_csv_text(csv_text)[:max_rows]]
+
 def _search_in_one_url_core(u: str, q: str, *, gid: str | None = None,
                             exact: bool = False, fuzz_threshold: int = 85,
                             max_rows: int = 10000) -> list[dict] | dict:
@@ -1455,22 +1683,37 @@ def _search_in_one_url_core(u: str, q: str, *, gid: str | None = None,
 
     # 2) Parse CSV -> rows
     try:
-        rows = read_csv_text(csv_text)
+        rows = _read_csv_rows_fast(csv_text, max_rows)
     except Exception as e:
         return {"error": f"csv_parse_failed: {e}", "normalized_url": finfo.get("normalized_url")}
+    if not rows:
+        return []
 
     # 3) Match
     hits: list[dict] = []
-    for idx, row in enumerate(rows[:max_rows], start=1):
-        line = " | ".join("" if c is None else str(c) for c in row)
-        score = _match_score(q, line, exact, fuzz_threshold)
-        if score >= (100 if exact else fuzz_threshold):
-            hits.append({
-                "row": idx,
-                "score": score,
-                "snippet": _snippet(line, q),
-                "values": [fix_vietnamese_text("" if c is None else str(c)) for c in row],
-            })
+    q_fix = fix_vietnamese_text(q)
+    q_fold = fold_vi_fast(q_fix)
+    lines_fix = [fix_vietnamese_text(" | ".join(row)) for row in rows]
+    lines_fold = [fold_vi_fast(s) for s in lines_fix]
+    if exact:
+        scores = [_match_score_norm(q_fix, q_fold, s_fix, s_fold, True)
+                  for s_fix, s_fold in zip(lines_fix, lines_fold)]
+        idxs = [i for i, sc in enumerate(scores) if sc >= 100]
+    else:
+        # chấm cả file một lần trong C (rapidfuzz), giống search_rows
+        s1 = process.cdist([q_fix], lines_fix, scorer=fuzz.partial_ratio,
+                           score_cutoff=fuzz_threshold, workers=-1)[0]
+        s2 = process.cdist([q_fold], lines_fold, scorer=fuzz.partial_ratio,
+                           score_cutoff=fuzz_threshold, workers=-1)[0]
+        scores = np.maximum(s1, s2, out=s1)
+        idxs = np.flatnonzero(scores >= fuzz_threshold).tolist()
+    for i in idxs:
+        hits.append({
+            "row": i + 1,
+            "score": float(scores[i]),
+            "snippet": _snippet(lines_fix[i], lines_fold[i], q_fold),
+            "values": [fix_vietnamese_text(c) for c in rows[i]],
+        })
     return hits
 
 # =========================
@@ -1500,15 +1743,19 @@ async def search_url(
         resp.raise_for_status()
         csv_text = decode_http_response(resp)
         rows = read_csv_text(csv_text)
+        q_fix = fix_vietnamese_text(q)
+        q_fold = fold_vi_fast(q_fix)
 
         for idx, row in enumerate(rows[:max_rows], start=1):
             line = " | ".join("" if c is None else str(c) for c in row)
-            score = _match_score(q, line, exact, fuzz_threshold)
+            s_fix = fix_vietnamese_text(line)
+            s_fold = fold_vi_fast(s_fix)
+            score = _match_score_norm(q_fix, q_fold, s_fix, s_fold, exact)
             if score >= (100 if exact else fuzz_threshold):
                 hits.append({
                     "row": idx,
                     "score": score,
-                    "snippet": _snippet(line, q),
+                    "snippet": _snippet(s_fix, s_fold, q_fold),
                     "values": [fix_vietnamese_text("" if c is None else str(c)) for c in row],
                 })
 
@@ -1521,14 +1768,18 @@ async def search_url(
         resp.raise_for_status()
         csv_text = decode_http_response(resp)
         rows = read_csv_text(csv_text)
+        q_fix = fix_vietnamese_text(q)
+        q_fold = fold_vi_fast(q_fix)
         for idx, row in enumerate(rows[:max_rows], start=1):
             line = " | ".join("" if c is None else str(c) for c in row)
-            score = _match_score(q, line, exact, fuzz_threshold)
+            s_fix = fix_vietnamese_text(line)
+            s_fold = fold_vi_fast(s_fix)
+            score = _match_score_norm(q_fix, q_fold, s_fix, s_fold, exact)
             if score >= (100 if exact else fuzz_threshold):
                 hits.append({
                     "row": idx,
                     "score": score,
-                    "snippet": _snippet(line, q),
+                    "snippet": _snippet(s_fix, s_fold, q_fold),
                     "values": [fix_vietnamese_text("" if c is None else str(c)) for c in row],
                 })
         return {"url": u, "kind": "csv", "query": q, "hits": hits}
@@ -1549,7 +1800,7 @@ def debug_link_count():
 
 @app.get("/debug/links")
 def debug_links(limit: int = 50):
-    return {"count": len(LINK_POOL), "items": LINK_POOL[:limit]}
+    return {"count": len(LINK_POOL_LIST), "items": [_link_to_dict(r) for r in LINK_POOL_LIST[:limit]]}
 
 
 @app.get("/links_index")
@@ -1608,7 +1859,7 @@ def debug_stats():
 @app.get("/debug/scan_log")
 def debug_scan_log(limit: int = 300):
     limit = max(1, min(limit, 2000))
-    return {"lines": DEBUG_LOG[-limit:]}
+    return {"lines": list(islice(DEBUG_LOG, max(0, len(DEBUG_LOG) - limit), None))}
 
 @app.get("/debug/capabilities")
 def debug_capabilities():
@@ -1620,6 +1871,12 @@ def debug_capabilities():
         "USE_DEEP": USE_DEEP,
     }
 
+@app.get("/debug/url_cache")
+def debug_url_cache():
+    info = classify_google_url.cache_info()
+    total = info.hits + info.misses
+    return {**info._asdict(), "hit_rate": round(info.hits / total, 4) if total else None}
+
 @app.get("/debug/gspread_skip")
 def debug_gspread_skip():
     return {"count": len(GSPREAD_SKIP_IDS), "ids": list(GSPREAD_SKIP_IDS)[:50]}
@@ -1681,14 +1938,14 @@ async def search(
     seen_urls: set[str] = set()
 
     # --- helper nội bộ để thêm debug cho một URL ---
-    def _append_debug(u: str, src_item: dict, gid: str | None):
+    async def _append_debug(u: str, src_item: dict, gid: str | None):
         if not scan_all_links_debug:
             return
         try:
             norm_u, _ = normalize_to_gsheets_csv_export(u, gid_hint=gid)
         except Exception:
             norm_u = u
-        peek = _peek_url_rows(u, nrows=max(1, min(int(peek_rows), 20)), gid=gid)
+        peek = await _peek_url_rows(u, nrows=max(1, min(int(peek_rows), 20)), gid=gid)
         debug_scan.append({
             "url": u,
             "normalized_url": norm_u,
@@ -1734,7 +1991,7 @@ async def search(
                             "normalized_url": norm_u,
                             "source": src,
                             "error": url_result.get("error"),
-                            "peek": _peek_url_rows(u, nrows=max(1, min(int(peek_rows), 20)), gid=gid)
+                            "peek": await _peek_url_rows(u, nrows=max(1, min(int(peek_rows), 20)), gid=gid)
                         })
                     continue
 
@@ -1747,7 +2004,7 @@ async def search(
                         "source": "row_links"
                     })
                 # debug (kể cả không match)
-                _append_debug(u, src, gid)
+                await _append_debug(u, src, gid)
             except Exception as e:
                 if scan_all_links_debug:
                     debug_scan.append({
@@ -1761,14 +2018,14 @@ async def search(
     if scan_all_links:
         all_links = _iter_all_indexed_links(limit=link_limit_all) or []
         for item in all_links:
-            u = item.get("url") if isinstance(item, dict) else None
+            u = item.url
             if not u or u in seen_urls:
                 continue
             if is_google_docs(u):
                 # không scan Google Docs (chưa hỗ trợ)
                 continue
             seen_urls.add(u)
-            gid = item.get("gid") if isinstance(item, dict) else None
+            gid = item.gid
 
             try:
                 url_result = _search_in_one_url_core(
@@ -1782,14 +2039,14 @@ async def search(
                             "url": u,
                             "normalized_url": norm_u,
                             "source": {
-                                "sheet": item.get("sheet",""),
-                                "row": item.get("row",""),
-                                "address": item.get("address",""),
+                                "sheet": item.sheet,
+                                "row": item.row,
+                                "address": item.address,
                                 "gid": gid,
-                                "sheet_name": item.get("sheet_name","")
+                                "sheet_name": item.sheet_name
                             },
                             "error": url_result.get("error"),
-                            "peek": _peek_url_rows(u, nrows=max(1, min(int(peek_rows), 20)), gid=gid)
+                            "peek": await _peek_url_rows(u, nrows=max(1, min(int(peek_rows), 20)), gid=gid)
                         })
                     continue
 
@@ -1800,24 +2057,24 @@ async def search(
                         "count": len(url_result),
                         "matches": url_result[:5],
                         "source": {
-                            "sheet": item.get("sheet",""),
-                            "row": item.get("row",""),
-                            "address": item.get("address","")
+                            "sheet": item.sheet,
+                            "row": item.row,
+                            "address": item.address
                         }
                     })
                 # debug (kể cả không match)
-                _append_debug(u, item if isinstance(item, dict) else {}, gid)
+                await _append_debug(u, _link_to_dict(item), gid)
 
             except Exception as e:
                 if scan_all_links_debug:
                     debug_scan.append({
                         "url": u,
                         "source": {
-                            "sheet": item.get("sheet",""),
-                            "row": item.get("row",""),
-                            "address": item.get("address",""),
+                            "sheet": item.sheet,
+                            "row": item.row,
+                            "address": item.address,
                             "gid": gid,
-                            "sheet_name": item.get("sheet_name","")
+                            "sheet_name": item.sheet_name
                         },
                         "error": f"exception: {e}",
                         "peek": []
@@ -1902,21 +2159,11 @@ def mysql_sync_links(clear_first: bool = False):
             deleted = db_mysql.clear_links_table()
             _dlog(f"[mysql] Cleared {deleted} old links")
         
-        # Chuyển LINK_POOL_LIST sang format phù hợp
-        links_to_insert = []
-        for item in LINK_POOL_LIST:
-            links_to_insert.append({
-                "url": item.get("url", ""),
-                "sheet": item.get("sheet", ""),
-                "row": item.get("row"),
-                "col": item.get("col"),
-                "address": item.get("address", ""),
-                "gid": item.get("gid"),
-                "sheet_name": item.get("sheet_name", ""),
-            })
+        # Chuyển LINK_POOL_LIST sang format phù hợp (list comprehension: cấp phát 1 lần)
+        links_to_insert = [_link_to_dict(item) for item in LINK_POOL_LIST]
         
         inserted, updated = db_mysql.insert_links_batch(links_to_insert)
-        new_count = db_mysql.get_links_count()
+        new_count = db_mysql.get_links_count(exact=True)  # ước lượng table_rows có thể chưa cập nhật
         
         return {
             "ok": True,
@@ -1977,21 +2224,14 @@ def add_link_to_pool(
                 gid = qs["gid"][0]
         
         # Create address (A1 notation)
-        address = f"{chr(64 + col)}{row}"  # Simple: col 1 = A, col 2 = B, etc.
+        address = _a1_addr(row, col)
         
         # Create link record
-        link_record = {
-            "url": url,
-            "sheet": sheet,
-            "row": row,
-            "col": col,
-            "address": address,
-            "gid": gid,
-            "sheet_name": sheet_name,
-        }
+        rec = LinkRec(url, sheet, row, col, address, gid, sheet_name)
+        link_record = _link_to_dict(rec)
         
         # Add to LINK_POOL_LIST (flat list)
-        LINK_POOL_LIST.append(link_record)
+        LINK_POOL_LIST.append(rec)
         
         # Add to LINK_POOL (map: url -> list of locations)
         if url not in LINK_POOL:
@@ -2068,12 +2308,12 @@ def mysql_sync_ctv_data(clear_first: bool = False):
             
             # Chuẩn hóa text cho search
             text_fixed = fix_vietnamese_text(text)
-            text_normalized = fold_vietnamese(text_fixed)
+            text_normalized = fold_vi_fast(text_fixed)
             
             # Sử dụng unit làm "full_name" cho search (tên đơn vị)
             # Và category làm "mssv" (mảng hoạt động)
             full_name = unit if unit else category
-            name_normalized = fold_vietnamese(full_name) if full_name else ""
+            name_normalized = fold_vi_fast(fix_vietnamese_text(full_name)) if full_name else ""
             
             ctv_records.append({
                 "sheet": sheet,
@@ -2090,7 +2330,7 @@ def mysql_sync_ctv_data(clear_first: bool = False):
         
         # Insert batch
         inserted = db_mysql.insert_ctv_data_batch(ctv_records)
-        new_count = db_mysql.get_ctv_data_count()
+        new_count = db_mysql.get_ctv_data_count(exact=True)  # ước lượng table_rows có thể chưa cập nhật
         
         return {
             "ok": True,
@@ -2160,7 +2400,7 @@ def mysql_ctv_search_mssv(mssv: str = Query(..., description="MSSV để tìm"),
 def mysql_ctv_search(q: str = Query(..., description="Tìm kiếm tổng hợp"), limit: int = 50):
     """
     Tìm kiếm CTV theo tên, MSSV, đơn vị, hoặc chương trình.
-    Tự động detect: nếu là số → search MSSV, nếu là text → search full-text.
+    Một query duy nhất: MSSV khớp chính xác HOẶC full-text trên text không dấu.
     """
     if not HAS_MYSQL:
         return {"ok": False, "error": "MySQL module not available"}
@@ -2168,15 +2408,9 @@ def mysql_ctv_search(q: str = Query(..., description="Tìm kiếm tổng hợp")
     try:
         start_time = time.time()
         
-        # Detect query type
-        if q.strip().isdigit():
-            # Search by MSSV
-            results = db_mysql.search_ctv_by_mssv(q, limit=limit)
-            search_type = "mssv"
-        else:
-            # Full-text search
-            results = db_mysql.search_ctv_fulltext(q, limit=limit)
-            search_type = "fulltext"
+        _, q_fold = normalize_query(q)
+        results = db_mysql.search_ctv(q.strip(), q_fold, limit=limit)
+        search_type = "mssv+fulltext"
         
         exec_time_ms = int((time.time() - start_time) * 1000)
         
@@ -2198,7 +2432,7 @@ def mysql_ctv_by_sheet(sheet: str = Query(..., description="Sheet name"), limit:
         return {"ok": False, "error": "MySQL module not available"}
     
     try:
-        results = db_mysql.get_ctv_by_sheet(sheet, limit=limit)
+        results = list(db_mysql.get_ctv_by_sheet(sheet, limit=limit))
         return {
             "ok": True,
             "sheet": sheet,
@@ -2231,6 +2465,22 @@ def debug_sample_rows(limit: int = 5):
         "hint": "Check 'cols' array to identify which column contains name, MSSV, unit, program"
     }
 
+# Các sheet CSV anh em thường lặp lại header/footer và dòng trống → cache kết quả fold
+_FOLD_CACHE: Dict[int, str] = {}
+_FOLD_CACHE_MAX = 500_000
+
+def _fold_row_text(row_text: str) -> str:
+    """Fold (bỏ dấu) có cache theo hash(row_text), dùng chung cho mọi URL.
+    row_text đã qua vn_fix (read_csv_text_iter) nên dùng fold_vi_fast."""
+    h = hash(row_text)
+    cached = _FOLD_CACHE.get(h)
+    if cached is None:
+        if len(_FOLD_CACHE) > _FOLD_CACHE_MAX:
+            _FOLD_CACHE.clear()
+        cached = fold_vi_fast(row_text)
+        _FOLD_CACHE[h] = cached
+    return cached
+
 @app.post("/mysql/sync_content")
 async def mysql_sync_content(
     url: str = Query(..., description="URL to fetch and sync"),
@@ -2268,26 +2518,28 @@ async def mysql_sync_content(
         row_count = 0
         try:
             if is_google_sheets_url(url) or url.endswith(".csv") or "format=csv" in url:
-                csv_rows = read_csv_text(text)
-                row_count = len(csv_rows)
+                csv_iter = read_csv_text_iter(text)
                 
                 # Prepare parsed rows data
-                for idx, row in enumerate(csv_rows[:1000], start=1):  # Limit 1000 rows
+                for idx, row in enumerate(islice(csv_iter, 1000), start=1):  # Limit 1000 rows
                     row_text = " | ".join("" if c is None else str(c) for c in row)
                     rows_data.append({
                         "row_number": idx,
                         "values": row,
                         "text": row_text,
-                        "normalized": fold_vietnamese(row_text),
+                        "normalized": _fold_row_text(row_text),
                     })
+                # Đếm phần còn lại mà không giữ trong bộ nhớ
+                row_count = len(rows_data) + sum(1 for _ in csv_iter)
         except Exception as e:
             _dlog(f"[mysql] Failed to parse CSV: {e}")
         
-        # Upsert main content
-        db_mysql.upsert_fetched_content(
+        # Upsert main content + parsed rows trong một transaction
+        inserted_rows = db_mysql.upsert_content_with_rows(
             url=url,
             raw_content=text[:1000000],  # Limit to 1MB
             normalized_content=normalized[:1000000],
+            rows_data=rows_data,
             content_type="text/csv" if row_count > 0 else "text/plain",
             gid=gid,
             row_count=row_count,
@@ -2295,11 +2547,6 @@ async def mysql_sync_content(
             error_message=None
         )
         
-        # Insert parsed rows
-        inserted_rows = 0
-        if rows_data:
-            inserted_rows = db_mysql.insert_parsed_rows_batch(url, rows_data)
-        
         return {
             "ok": True,
             "url": url,
@@ -2311,10 +2558,63 @@ async def mysql_sync_content(
     except Exception as e:
         return {"ok": False, "error": str(e), "url": url}
 
+# Số parsed_rows gom qua nhiều URL trước khi ghi một lần (insert_parsed_rows_multi)
+_PARSED_ROWS_FLUSH_AT = 2000
+
+def _store_fetched_text(url: str, gid: Optional[str], text: Optional[str]) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Parse + ghi fetched_content của một URL (chạy trong thread, không chặn event loop).
+    Trả về (số dòng CSV, rows_data chờ ghi parsed_rows); row_count = -1 nếu fetch lỗi.
+    """
+    if not text:
+        db_mysql.upsert_fetched_content(
+            url=url, raw_content=None, normalized_content=None,
+            gid=gid, status="error", error_message="fetch_failed"
+        )
+        return -1, []
+
+    normalized = fix_vietnamese_text(text)
+    row_count = 0
+    rows_data: List[Dict[str, Any]] = []
+    try:
+        if is_google_sheets_url(url) or url.endswith(".csv"):
+            csv_iter = read_csv_text_iter(text)
+
+            for idx, row in enumerate(islice(csv_iter, 500), start=1):
+                row_text = " | ".join("" if c is None else str(c) for c in row)
+                rows_data.append({
+                    "row_number": idx,
+                    "values": row,
+                    "text": row_text,
+                    "normalized": _fold_row_text(row_text),
+                })
+            row_count = len(rows_data) + sum(1 for _ in csv_iter)
+    except Exception:
+        rows_data = []
+
+    db_mysql.upsert_fetched_content(
+        url=url,
+        raw_content=text[:500000],
+        normalized_content=normalized[:500000],
+        content_type="text/csv" if row_count > 0 else "text/plain",
+        gid=gid,
+        row_count=row_count,
+        status="ok",
+        error_message=None
+    )
+    return row_count, rows_data
+
+def _write_parsed_rows_bulk(batch: List[Tuple[str, Dict[str, Any]]]) -> int:
+    """Ghi một batch parsed_rows trong bulk_session (1 transaction, tắt unique/FK checks)."""
+    with db_mysql.bulk_session() as conn:
+        return db_mysql.insert_parsed_rows_multi(batch, conn=conn)
+
 @app.post("/mysql/sync_all_content")
-async def mysql_sync_all_content(limit: int = 50):
+async def mysql_sync_all_content(limit: int = 50, workers: int = 4):
     """
     Fetch và sync nội dung của tất cả links trong LINK_POOL (hoặc limit đầu tiên).
+    Pipeline: fetcher → asyncio.Queue → N worker (parse + ghi MySQL trong thread),
+    để thời gian chờ mạng chồng lên thời gian parse/ghi DB.
     """
     if not HAS_MYSQL:
         return {"ok": False, "error": "MySQL module not available"}
@@ -2323,70 +2623,84 @@ async def mysql_sync_all_content(limit: int = 50):
         results = {"ok": True, "processed": 0, "success": 0, "failed": 0, "details": []}
         
         links_to_process = _iter_all_indexed_links(limit=limit)
-        
-        for item in links_to_process:
-            url = item.get("url")
-            gid = item.get("gid")
-            
-            if not url:
-                continue
-            
+        n_workers = max(1, min(int(workers), 16))
+        queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+        pending_rows: List[Tuple[str, Dict[str, Any]]] = []  # (url, row) gom qua nhiều URL
+
+        # Mọi flush đi qua một lock: hai transaction DELETE ... WHERE url IN (...) rồi INSERT
+        # chạy song song trên idx_url (không unique) cùng lấy gap lock một khoảng rồi deadlock
+        flush_lock = asyncio.Lock()
+        details_by_url: Dict[str, Dict[str, Any]] = {}
+        failed_urls: set = set()  # URL có parsed_rows không ghi được
+
+        async def flush_rows():
+            async with flush_lock:
+                if not pending_rows:
+                    return
+                batch = pending_rows[:]
+                pending_rows.clear()
+                try:
+                    await asyncio.to_thread(_write_parsed_rows_bulk, batch)
+                except Exception as e:
+                    _dlog(f"[mysql] insert_parsed_rows_multi failed ({len(batch)} rows): {e}")
+                    for url in dict.fromkeys(u for u, _ in batch):
+                        failed_urls.add(url)
+                        detail = details_by_url.get(url)
+                        if detail is not None and detail["status"] == "ok":
+                            # đã tính success trước khi batch của nó được ghi -> chuyển sang failed
+                            detail.update(status="error", error=f"parsed_rows write failed: {e}")
+                            results["success"] -= 1
+                            results["failed"] += 1
+
+        async def fetcher():
             try:
-                # Fetch
-                text = await fetch_text_from_url(url)
-                
-                if text:
-                    # Parse and insert
-                    normalized = fix_vietnamese_text(text)
-                    row_count = 0
-                    
+                for item in links_to_process:
+                    url = item.url
+                    if not url:
+                        continue
                     try:
-                        if is_google_sheets_url(url) or url.endswith(".csv"):
-                            csv_rows = read_csv_text(text)
-                            row_count = len(csv_rows)
-                            
-                            rows_data = []
-                            for idx, row in enumerate(csv_rows[:500], start=1):
-                                row_text = " | ".join("" if c is None else str(c) for c in row)
-                                rows_data.append({
-                                    "row_number": idx,
-                                    "values": row,
-                                    "text": row_text,
-                                    "normalized": fold_vietnamese(row_text),
-                                })
-                            
-                            if rows_data:
-                                db_mysql.insert_parsed_rows_batch(url, rows_data)
-                    except Exception:
-                        pass
-                    
-                    db_mysql.upsert_fetched_content(
-                        url=url,
-                        raw_content=text[:500000],
-                        normalized_content=normalized[:500000],
-                        content_type="text/csv" if row_count > 0 else "text/plain",
-                        gid=gid,
-                        row_count=row_count,
-                        status="ok",
-                        error_message=None
-                    )
-                    
-                    results["success"] += 1
-                    results["details"].append({"url": url, "status": "ok", "rows": row_count})
-                else:
-                    db_mysql.upsert_fetched_content(
-                        url=url, raw_content=None, normalized_content=None,
-                        gid=gid, status="error", error_message="fetch_failed"
-                    )
+                        text = await fetch_text_from_url(url)
+                    except Exception as e:
+                        results["failed"] += 1
+                        results["details"].append({"url": url, "status": "error", "error": str(e)})
+                        continue
+                    await queue.put((url, item.gid, text))
+            finally:
+                for _ in range(n_workers):
+                    await queue.put(None)
+
+        async def worker():
+            while True:
+                job = await queue.get()
+                if job is None:
+                    return
+                url, gid, text = job
+                try:
+                    row_count, rows_data = await asyncio.to_thread(_store_fetched_text, url, gid, text)
+                    if rows_data:
+                        # rows của một URL luôn nằm trọn trong một batch
+                        pending_rows.extend((url, r) for r in rows_data)
+                        if len(pending_rows) >= _PARSED_ROWS_FLUSH_AT:
+                            await flush_rows()
+                    if url in failed_urls:
+                        results["failed"] += 1
+                        results["details"].append({"url": url, "status": "error",
+                                                   "error": "parsed_rows write failed"})
+                    elif row_count >= 0:
+                        results["success"] += 1
+                        detail = {"url": url, "status": "ok", "rows": row_count}
+                        details_by_url[url] = detail
+                        results["details"].append(detail)
+                    else:
+                        results["failed"] += 1
+                        results["details"].append({"url": url, "status": "failed"})
+                    results["processed"] += 1
+                except Exception as e:
                     results["failed"] += 1
-                    results["details"].append({"url": url, "status": "failed"})
-                
-                results["processed"] += 1
-                
-            except Exception as e:
-                results["failed"] += 1
-                results["details"].append({"url": url, "status": "error", "error": str(e)})
-        
+                    results["details"].append({"url": url, "status": "error", "error": str(e)})
+
+        await asyncio.gather(fetcher(), *[worker() for _ in range(n_workers)])
+        await flush_rows()
         return results
     
     except Exception as e:
@@ -2398,14 +2712,57 @@ def mysql_content_summary():
     if not HAS_MYSQL:
         return {"ok": False, "error": "MySQL module not available"}
     try:
-        summary = db_mysql.get_content_summary()
+        summary = list(db_mysql.get_content_summary())
         return {"ok": True, "summary": summary}
     except Exception as e:
         return {"ok": False, "error": str(e)}
 
+# Log search query được gom trong RAM rồi flush định kỳ (executemany), không ghi DB trên request path
+_SEARCH_LOG_BUF: deque = deque(maxlen=10000)
+_SEARCH_LOG_FLUSH_EVERY_S = 2.0
+_SEARCH_LOG_TASK: Optional[asyncio.Task] = None
+
+async def _flush_search_log():
+    if not _SEARCH_LOG_BUF:
+        return
+    # popleft từng phần tử (atomic): entry append từ thread khác giữa chừng không bị mất
+    batch = [_SEARCH_LOG_BUF.popleft() for _ in range(len(_SEARCH_LOG_BUF))]
+    try:
+        await asyncio.to_thread(db_mysql.log_search_queries_many, batch)
+    except Exception as e:
+        _dlog(f"[mysql] flush search log failed ({len(batch)} rows): {e}")
+
+async def _search_log_flusher():
+    while True:
+        await asyncio.sleep(_SEARCH_LOG_FLUSH_EVERY_S)
+        await _flush_search_log()
+
+@app.on_event("startup")
+async def _startup_search_log():
+    global _SEARCH_LOG_TASK
+    if HAS_MYSQL:
+        _SEARCH_LOG_TASK = asyncio.create_task(_search_log_flusher())
+
+@app.on_event("shutdown")
+async def _shutdown_search_log():
+    if _SEARCH_LOG_TASK is not None:
+        _SEARCH_LOG_TASK.cancel()
+    if HAS_MYSQL:
+        await _flush_search_log()
+
+def _json_bytes(obj: Any) -> bytes:
+    if HAS_ORJSON:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, ensure_ascii=False, default=str).encode("utf-8")
+
+
 @app.get("/mysql/search")
 def mysql_search(q: str = Query(..., description="Search query"), limit: int = 50):
-    """Full-text search trong MySQL parsed_rows table."""
+    """
+    Full-text search trong MySQL parsed_rows table.
+    Dòng được đọc hết từ MySQL (tối đa 500) rồi mới stream: mỗi dòng serialize khi gửi,
+    không dumps cả response một lần. count/execution_time_ms nằm cuối object JSON.
+    """
     if not HAS_MYSQL:
         return {"ok": False, "error": "MySQL module not available"}
     
@@ -2413,27 +2770,23 @@ def mysql_search(q: str = Query(..., description="Search query"), limit: int = 5
         start_time = time.time()
         q_fixed, q_fold = normalize_query(q)
         
-        results = db_mysql.search_in_parsed_rows(q_fixed, limit=limit)
-        
-        # Fallback: search với query không dấu
-        if not results:
-            results = db_mysql.search_in_parsed_rows(q_fold, limit=limit)
-        
-        exec_time_ms = int((time.time() - start_time) * 1000)
-        
-        # Log query
-        db_mysql.log_search_query(q, q_fold, len(results), exec_time_ms)
-        
-        return {
-            "ok": True,
-            "query": q,
-            "results": results,
-            "count": len(results),
-            "execution_time_ms": exec_time_ms,
-        }
+        # Một query trên cột không dấu (bao trùm bản có dấu), không cần lượt fallback.
+        # Kết quả đọc hết ở đây (limit có trần): connection đã về pool trước khi stream
+        rows = db_mysql.search_in_parsed_rows(q_fixed, limit=limit)
     except Exception as e:
         return {"ok": False, "error": str(e)}
 
+    def _body():
+        yield b'{"ok":true,"query":' + _json_bytes(q) + b',"results":['
+        for i, row in enumerate(rows):
+            yield (b"," if i else b"") + _json_bytes(row)
+        exec_time_ms = int((time.time() - start_time) * 1000)
+        # Log query (buffer; background task sẽ flush)
+        _SEARCH_LOG_BUF.append((q, q_fold, len(rows), exec_time_ms, time.time()))
+        yield b'],"count":' + str(len(rows)).encode() + b',"execution_time_ms":' + str(exec_time_ms).encode() + b"}"
+
+    return StreamingResponse(_body(), media_type="application/json")
+
 # =========================
 # Startup
 # =========================
@@ -4,8 +4,13 @@ Centralizes all environment variables, global data structures, and feature flags
 """
 import os
 import time
+import threading
+from collections import deque
 from typing import Any, Dict, List
 
+from cachetools import TTLCache
+from fastapi.responses import JSONResponse, ORJSONResponse
+
 # =========================
 # Environment Configuration
 # =========================
@@ -15,6 +20,11 @@ DEFAULT_SPREADSHEET_ID = os.environ.get(
 )
 GOOGLE_CREDS = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", "credentials.json")
 USE_DEEP = os.environ.get("DEEP_INDEX", "1").lower() in ("1", "true", "yes")
+# Last successful index build (spreadsheet modifiedTime), used by incremental rebuilds
+INDEX_STATE_FILE = os.environ.get(
+    "INDEX_STATE_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".index_state.json")
+)
 
 # =========================
 # Feature Flags
@@ -35,6 +45,16 @@ try:
 except Exception:
     HAS_GOOGLE_API = False
 
+try:
+    import orjson  # noqa: F401  (used by ORJSONResponse)
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Default response class for the API routers: orjson (C) encodes large result lists
+# several times faster than stdlib json; plain JSONResponse when orjson isn't installed
+JSON_RESPONSE_CLASS = ORJSONResponse if HAS_ORJSON else JSONResponse
+
 try:
     from backend import db_mysql
     HAS_MYSQL = True
@@ -59,13 +79,14 @@ LINK_POOL_MAP: Dict[str, List[Dict[str, Any]]] = {}
 # Caches
 GSPREAD_SKIP_IDS: set[str] = set()
 URL_ACCESS_CACHE: dict[str, str] = {}  # url -> "ok"|"private"|"unsupported"
-DRIVE_META_CACHE: dict[str, dict] = {}  # fileId -> {id, name, mimeType}
+DRIVE_META_CACHE: TTLCache = TTLCache(maxsize=8192, ttl=600)  # fileId -> {id, name, mimeType}, 10 min TTL
+DRIVE_META_LOCK = threading.Lock()  # TTLCache is not thread-safe
 
 # =========================
 # Debug & Statistics
 # =========================
-DEBUG_LOG: List[str] = []
 DEBUG_LOG_MAX = 5000
+DEBUG_LOG: deque = deque(maxlen=DEBUG_LOG_MAX)  # bounded ring buffer, O(1) eviction
 
 STATS: Dict[str, Any] = {
     "built_at": None,
@@ -82,5 +103,3 @@ def debug_log(msg: str):
     line = f"[{ts}] {msg}"
     print(line, flush=True)
     DEBUG_LOG.append(line)
-    if len(DEBUG_LOG) > DEBUG_LOG_MAX:
-        del DEBUG_LOG[: len(DEBUG_LOG) - DEBUG_LOG_MAX]
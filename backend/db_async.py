@@ -0,0 +1,115 @@
+"""
+Truy vấn MySQL bất đồng bộ (aiomysql) cho các endpoint đọc của /api/mysql.
+
+Pool aiomysql được tạo một lần (get_pool) và giữ cho tới shutdown (close_pool): handler
+async không chiếm thread của threadpool FastAPI và không bắt tay connect() mỗi request.
+SQL và cách gộp kết quả dùng chung với db_mysql nên hai đường trả về cùng định dạng.
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import aiomysql
+    HAS_AIOMYSQL = True
+except ImportError:
+    aiomysql = None
+    HAS_AIOMYSQL = False
+
+try:
+    from backend import db_mysql
+except ImportError:
+    import db_mysql
+
+_POOL_MINSIZE = 5
+_POOL_MAXSIZE = 25
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_pool():
+    """Pool aiomysql dùng chung (tạo lần đầu, các lần sau trả lại pool cũ)."""
+    global _pool
+    if not HAS_AIOMYSQL:
+        raise ImportError("aiomysql not installed")
+    if _pool is not None:
+        return _pool
+    async with _pool_lock:
+        if _pool is None:
+            config = db_mysql.MYSQL_CONFIG
+            _pool = await aiomysql.create_pool(
+                host=config["host"],
+                port=config["port"],
+                user=config["user"],
+                password=config["password"],
+                db=config["database"],
+                charset=config["charset"],
+                minsize=_POOL_MINSIZE,
+                maxsize=_POOL_MAXSIZE,
+                autocommit=True,
+                pool_recycle=300,
+            )
+    return _pool
+
+
+async def close_pool() -> None:
+    """Đóng pool khi shutdown (không làm gì nếu chưa tạo)."""
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+async def _fetch_all(sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+    """Một query trên connection mượn từ pool, trả list dict."""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute(sql, params)
+            return list(await cur.fetchall())
+
+
+async def search_student_links(query: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """Bản async của db_mysql.search_student_links (cùng định dạng kết quả)."""
+    where, params = db_mysql._student_predicate(query)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute(db_mysql._SEARCH_STUDENTS_SQL.format(where=where), params + (limit,))
+            students = await cur.fetchall()
+            if not students:
+                return []
+            students_dict = db_mysql._students_with_links(students)
+            ids = list(students_dict)
+            await cur.execute(
+                db_mysql._SEARCH_LINKS_SQL.format(ids=", ".join(["%s"] * len(ids))), ids
+            )
+            return db_mysql._attach_links(students_dict, await cur.fetchall())
+
+
+async def quick_search(query: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """Bản async của db_mysql.quick_search."""
+    where, params = db_mysql._student_predicate(query)
+    return await _fetch_all(db_mysql._QUICK_SEARCH_SQL.format(where=where), params + (limit,))
+
+
+async def get_student_links_by_mssv(mssv: str) -> Optional[Dict[str, Any]]:
+    """Bản async của db_mysql.get_student_links_by_mssv."""
+    return db_mysql._mssv_result(await _fetch_all(db_mysql._MSSV_LINKS_SQL, (mssv,)))
+
+
+async def get_stats(fresh: bool = False) -> Dict[str, Any]:
+    """Bản async của db_mysql.get_stats; dùng chung cache 60s với bản sync."""
+    cache = db_mysql._stats_cache
+    if not fresh and cache["data"] and time.time() - cache["t"] < db_mysql._STATS_TTL:
+        return cache["data"]
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cur:
+            await cur.execute(db_mysql._STATS_COUNTS_SQL)
+            stats = dict(await cur.fetchone())
+            await cur.execute(db_mysql._TOP_STUDENTS_SQL)
+            stats["top_students"] = list(await cur.fetchall())
+    cache["data"], cache["t"] = stats, time.time()
+    return stats
@@ -1,10 +1,15 @@
 import os
+import re
+import hashlib
+import tempfile
 import json
+import logging
 import time
 import threading
 from functools import lru_cache
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 try:
     import mysql.connector
@@ -19,6 +24,28 @@ except ImportError:
     PoolError = Exception
     pooling = None
 
+from cachetools import LRUCache, TTLCache, cached
+
+try:
+    from backend.utils.text_processing import fold_vietnamese
+except ImportError:
+    from utils.text_processing import fold_vietnamese
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def _json_dumps(obj: Any) -> str:
+    """JSON cho cột JSON: orjson (C, giữ nguyên Unicode) nếu có, không thì json chuẩn."""
+    if HAS_ORJSON:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
+
+log = logging.getLogger(__name__)
 
 # =========================
 # Configuration
@@ -33,12 +60,31 @@ MYSQL_CONFIG = {
     "autocommit": False,
     "database": os.environ.get("MYSQL_DATABASE", "ctv_links"),
     "pool_name": "ctv_pool",
-    "pool_size": 20,
+    "pool_size": int(os.environ.get("MYSQL_POOL_SIZE", "25")),  # mysql-connector cho tối đa 32
+    # Không gửi COM_RESET_CONNECTION mỗi lần trả connection về pool
+    # (bulk_session tự khôi phục các biến session nó đã đổi)
+    "pool_reset_session": False,
 }
+# LOAD DATA LOCAL INFILE cho batch_insert_student_links rất lớn: opt-in, vì client cho phép
+# local infile thì server có thể yêu cầu đọc file phía client
+LOCAL_INFILE_ENABLED = os.environ.get("MYSQL_LOCAL_INFILE", "0") == "1"
+if LOCAL_INFILE_ENABLED:
+    MYSQL_CONFIG["allow_local_infile"] = True
+_POOL_KEYS = ("pool_name", "pool_size", "pool_reset_session")
+
+
+def _direct_config(with_database: bool = True) -> Dict[str, Any]:
+    """MYSQL_CONFIG cho mysql.connector.connect() trực tiếp (không qua pool)."""
+    config = {k: v for k, v in MYSQL_CONFIG.items() if k not in _POOL_KEYS}
+    if not with_database:
+        config.pop("database", None)
+    return config
 
 DB_NAME = "ctv_links"
 DB_POOL = None
 POOL_LOCK = threading.Lock()
+# Thời gian tối đa chờ một connection rảnh khi cả pool đang được mượn
+_POOL_WAIT_SECONDS = float(os.environ.get("MYSQL_POOL_WAIT", "5"))
 
 
 # =========================
@@ -53,39 +99,40 @@ def get_db_connection():
         raise ImportError("mysql-connector-python not installed")
     
     # 1. Initialize Pool safely
+    pool_err = None
     if DB_POOL is None:
         with POOL_LOCK:
             if DB_POOL is None:
                 try:
                     DB_POOL = mysql.connector.pooling.MySQLConnectionPool(**MYSQL_CONFIG)
                 except MySQLError as err:
-                     # Allow connecting without DB for init_schema
-                     if err.errno == 1049: # Unknown database
-                         temp_config = MYSQL_CONFIG.copy()
-                         temp_config.pop("database", None)
-                         temp_config.pop("pool_name", None)
-                         temp_config.pop("pool_size", None)
-                         conn = mysql.connector.connect(**temp_config)
-                         yield conn
-                         return
-                     raise err
-
-    # 2. Get Connection with Retry
+                    pool_err = err
+
+    # 1b. Pool creation failed -> direct connection (ngoài lock, luôn đóng khi xong)
+    if pool_err is not None:
+        # Unknown database (1049) -> kết nối không chọn DB, cho init_schema
+        conn = mysql.connector.connect(**_direct_config(getattr(pool_err, "errno", None) != 1049))
+        try:
+            yield conn
+        finally:
+            if conn.is_connected():
+                conn.close()
+        return
+
+    # 2. Get Connection: pool hết chỗ thì chờ connection được trả về (backoff tăng dần)
+    #    tới _POOL_WAIT_SECONDS, thay vì bỏ cuộc sau vài lần thử cố định
     conn = None
-    attempts = 0
-    max_retries = 3
-    
-    while attempts < max_retries:
+    deadline = time.monotonic() + _POOL_WAIT_SECONDS
+    delay = 0.02
+
+    while conn is None:
         try:
             conn = DB_POOL.get_connection()
-            break
         except PoolError:
-            attempts += 1
-            if attempts == max_retries:
-                raise MySQLError(f"Connection pool exhausted after {max_retries} retries")
-            time.sleep(0.2)  # Wait for a connection to be returned
-        except MySQLError as e:
-            raise e
+            if time.monotonic() >= deadline:
+                raise MySQLError(f"Connection pool exhausted after waiting {_POOL_WAIT_SECONDS}s")
+            time.sleep(delay)  # Wait for a connection to be returned
+            delay = min(delay * 2, 0.5)
 
     # 3. Yield and Close
     try:
@@ -102,14 +149,112 @@ def get_db_connection():
             conn.close()  # Returns to pool
 
 
+@contextmanager
+def get_db_connection_ro():
+    """
+    Connection cho các hàm chỉ đọc: bọc trong START TRANSACTION READ ONLY để InnoDB
+    đi fast-path read-only (không cấp transaction id, không đụng trx_sys mutex).
+    Transaction ngầm còn mở từ lần mượn trước (autocommit=False, pool không reset session)
+    bị rollback trước, nên mỗi lần đọc có snapshot mới.
+    """
+    with get_db_connection() as conn:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.start_transaction(readonly=True)
+        try:
+            yield conn
+        finally:
+            try:
+                conn.commit()
+            except MySQLError:
+                pass
+
+
+@contextmanager
+def bulk_session():
+    """
+    Connection cho bulk load: một transaction, tắt unique_checks/foreign_key_checks
+    trong session; COMMIT một lần khi thoát, ROLLBACK nếu lỗi, rồi khôi phục biến session.
+    Các hàm ghi nhận tham số `conn` sẽ không tự commit khi chạy trong session này.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SET autocommit=0")
+        cursor.execute("SET unique_checks=0")
+        cursor.execute("SET foreign_key_checks=0")
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                cursor.execute("SET unique_checks=1")
+                cursor.execute("SET foreign_key_checks=1")
+                cursor.execute(f"SET autocommit={int(bool(MYSQL_CONFIG['autocommit']))}")
+            finally:
+                cursor.close()
+
+
+@contextmanager
+def ingest_session(relax_checks: bool = False):
+    """
+    MỘT connection + cursor cho nhiều batch ghi liên tiếp (VD nhiều sheet/URL):
+    autocommit tắt, COMMIT đúng một lần khi thoát, ROLLBACK nếu lỗi.
+    relax_checks=True: tắt unique_checks/foreign_key_checks trong session để InnoDB gom ghi
+    secondary index vào change buffer — CHỈ cho ghi append-only vào bảng không có UNIQUE phụ
+    (ctv_data, parsed_rows); với upsert (ON DUPLICATE KEY / INSERT IGNORE trên khoá UNIQUE)
+    InnoDB có thể bỏ sót trùng lặp khi unique_checks=0.
+    Biến session được khôi phục khi thoát vì pool không reset session (pool_reset_session=False).
+    Dùng: with ingest_session() as (conn, cur): insert_ctv_data_batch(..., cursor=cur)
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SET autocommit=0")
+            if relax_checks:
+                cursor.execute("SET unique_checks=0")
+                cursor.execute("SET foreign_key_checks=0")
+            yield conn, cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                if relax_checks:
+                    cursor.execute("SET unique_checks=1")
+                    cursor.execute("SET foreign_key_checks=1")
+                cursor.execute(f"SET autocommit={int(bool(MYSQL_CONFIG['autocommit']))}")
+            finally:
+                cursor.close()
+
+
+@contextmanager
+def _batch_cursor(conn=None, cursor=None, relax_checks: bool = False):
+    """
+    Cursor cho các hàm ghi batch: dùng cursor/conn caller truyền vào (không commit),
+    nếu không có thì mở ingest_session(relax_checks) riêng (commit khi xong).
+    """
+    if cursor is not None:
+        yield cursor
+    elif conn is not None:
+        own = conn.cursor()
+        try:
+            yield own
+        finally:
+            own.close()
+    else:
+        with ingest_session(relax_checks) as (_, own):
+            yield own
+
+
 def test_connection() -> Dict[str, Any]:
     """Test MySQL connection."""
     try:
-        # Connect without specifying database first
-        config = MYSQL_CONFIG.copy()
-        config.pop("database", None)
-        
-        conn = mysql.connector.connect(**config)
+        # Connect without specifying database first (bypass the pool)
+        conn = mysql.connector.connect(**_direct_config(with_database=False))
         cursor = conn.cursor()
         cursor.execute("SELECT VERSION()")
         version = cursor.fetchone()[0]
@@ -126,10 +271,220 @@ def test_connection() -> Dict[str, Any]:
         return {"ok": False, "error": str(e)}
 
 
+# Prepared statements (binary protocol) cho các query đọc nóng:
+# cursor prepared được giữ lại theo (connection vật lý, SQL), nên câu lệnh chỉ PREPARE
+# một lần trên mỗi connection của pool (pool_reset_session=False giữ chúng sống).
+_PREPARED: Dict[int, Dict[str, Any]] = {}
+
+
+# Lỗi làm mất statement phía server (mất kết nối / handler không còn): chỉ khi đó mới prepare lại
+_PREPARED_LOST_ERRNOS = frozenset({2006, 2013, 1243})
+
+
+def _evict_prepared(per_conn: Dict[str, Any], sql: Optional[str] = None) -> None:
+    """Đóng rồi bỏ cursor prepared khỏi cache (một câu `sql`, hoặc cả connection) để server DEALLOCATE."""
+    for key in ([sql] if sql is not None else list(per_conn)):
+        cursor = per_conn.pop(key, None)
+        if cursor is None:
+            continue
+        try:
+            cursor.close()
+        except Exception:
+            pass  # connection đã chết: statement mất cùng session
+
+
+def _prepared_call(conn, sql: str, params: Tuple[Any, ...], consume, retry: bool = True):
+    """
+    Chạy `sql` bằng cursor prepared đã cache cho connection này, trả consume(cursor).
+    retry=True (chỉ cho đọc): statement mất phía server thì prepare lại và chạy lại một lần.
+    Ghi không bao giờ chạy lại: transaction bao quanh có thể đã bị rollback.
+    """
+    cnx = getattr(conn, "_cnx", None)  # PooledMySQLConnection bọc connection thật
+    if cnx is None:
+        # connection trực tiếp (fallback, sống ngắn) -> không đáng cache prepared
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(sql, params)
+            return consume(cursor)
+        finally:
+            cursor.close()
+    per_conn = _PREPARED.setdefault(id(cnx), {})
+    for attempt in (0, 1):
+        cursor = per_conn.get(sql)
+        if cursor is None:
+            cursor = per_conn[sql] = cnx.cursor(prepared=True, dictionary=True)
+        try:
+            cursor.execute(sql, params)
+            return consume(cursor)
+        except MySQLError as e:
+            if getattr(e, "errno", None) in _PREPARED_LOST_ERRNOS:
+                _evict_prepared(per_conn)  # mọi statement của session cũ đều đã mất
+                if retry and not attempt:
+                    continue
+            else:
+                _evict_prepared(per_conn, sql)  # deadlock, lock timeout, dữ liệu sai...: không chạy lại
+            raise
+    return None
+
+
+def _execute_prepared(conn, sql: str, params: Tuple[Any, ...]) -> List[Dict[str, Any]]:
+    """SELECT qua cursor prepared đã cache, trả list dict."""
+    return _prepared_call(conn, sql, params, lambda cur: cur.fetchall()) or []
+
+
+def _execute_prepared_write(conn, sql: str, params: Tuple[Any, ...]) -> Tuple[int, int]:
+    """INSERT/UPDATE qua cursor prepared đã cache, trả (rowcount, lastrowid); không commit."""
+    return _prepared_call(
+        conn, sql, params, lambda cur: (cur.rowcount, cur.lastrowid), retry=False
+    ) or (0, 0)
+
+
 # =========================
 # Core Query Functions: Query → MSSV/Name → Links
 # =========================
 
+_FT_MIN_TOKEN = 3  # innodb_ft_min_token_size mặc định
+_FT_OPERATORS_RE = re.compile(r'[+\-<>()~*"@]+')
+_STUDENT_LIKE = "(s.mssv LIKE %s OR s.full_name LIKE %s OR s.search_name LIKE %s)"
+
+
+def _student_predicate(query: str) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    WHERE cho bảng student (alias s) dùng FULLTEXT ft_student thay vì quét LIKE '%q%'.
+    Token đủ dài -> "+tok*" (bắt buộc, match tiền tố) trong BOOLEAN MODE.
+    Token ngắn hơn ngưỡng FULLTEXT không vào được index: khi có, AND thêm điều kiện
+    LIKE trên tập đã được FULLTEXT thu hẹp; không có token dài nào thì chỉ còn LIKE.
+    """
+    tokens = _FT_OPERATORS_RE.sub(" ", query or "").split()
+    long_tokens = [t for t in tokens if len(t) >= _FT_MIN_TOKEN]
+    pattern = f"%{query}%"
+    like_params = (pattern, pattern, pattern)
+    if not long_tokens:
+        return _STUDENT_LIKE, like_params
+    where = "MATCH(s.full_name, s.mssv, s.search_name) AGAINST (%s IN BOOLEAN MODE)"
+    params: Tuple[Any, ...] = (" ".join(f"+{t}*" for t in long_tokens),)
+    if len(long_tokens) < len(tokens):
+        where += " AND " + _STUDENT_LIKE
+        params += like_params
+    return where, params
+
+
+# SQL đọc dùng chung với db_async (cùng paramstyle %s)
+_SEARCH_STUDENTS_SQL = """
+    SELECT s.student_id, s.full_name, s.mssv, s.search_name
+    FROM student s
+    WHERE {where}
+    ORDER BY s.student_id
+    LIMIT %s
+"""
+_SEARCH_LINKS_SQL = """
+    SELECT
+        sl.student_id,
+        sl.link_id,
+        l.url,
+        l.title,
+        l.kind,
+        l.gid,
+        sl.sheet_name,
+        sl.row_number,
+        sl.snippet
+    FROM student_link sl
+    JOIN link l ON sl.link_id = l.link_id
+    WHERE sl.student_id IN ({ids})
+    ORDER BY sl.student_id, sl.sheet_name, sl.row_number
+"""
+_QUICK_SEARCH_SQL = """
+    SELECT 
+        s.student_id,
+        s.full_name,
+        s.mssv,
+        COUNT(sl.link_id) as link_count
+    FROM student s
+    LEFT JOIN student_link sl ON s.student_id = sl.student_id
+    WHERE {where}
+    GROUP BY s.student_id, s.full_name, s.mssv
+    ORDER BY link_count DESC, s.full_name
+    LIMIT %s
+"""
+_MSSV_LINKS_SQL = """
+    SELECT 
+        s.student_id,
+        s.full_name,
+        s.mssv,
+        l.url,
+        l.title,
+        l.kind,
+        l.gid,
+        sl.sheet_name,
+        sl.row_number,
+        sl.address,
+        sl.snippet
+    FROM student s
+    LEFT JOIN student_link sl ON s.student_id = sl.student_id
+    LEFT JOIN link l ON sl.link_id = l.link_id
+    WHERE s.mssv = %s
+    ORDER BY sl.sheet_name, sl.row_number
+"""
+
+
+def _students_with_links(students: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """{student_id: student + "links": []} từ các dòng _SEARCH_STUDENTS_SQL."""
+    return {
+        row["student_id"]: {
+            "student_id": row["student_id"],
+            "full_name": row["full_name"],
+            "mssv": row["mssv"],
+            "search_name": row["search_name"],
+            "links": []
+        }
+        for row in students
+    }
+
+
+def _attach_links(students_dict: Dict[int, Dict[str, Any]], rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Gắn các dòng _SEARCH_LINKS_SQL vào sinh viên tương ứng."""
+    for row in rows:
+        students_dict[row["student_id"]]["links"].append({
+            "link_id": row["link_id"],
+            "url": row["url"],
+            "title": row["title"],
+            "kind": row["kind"],
+            "gid": row["gid"],
+            "sheet_name": row["sheet_name"],
+            "row_number": row["row_number"],
+            "snippet": row["snippet"]
+        })
+    return list(students_dict.values())
+
+
+def _mssv_result(rows: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Gộp các dòng _MSSV_LINKS_SQL thành một sinh viên + links (None nếu không có)."""
+    if not rows:
+        return None
+    
+    result = {
+        "student_id": rows[0]["student_id"],
+        "full_name": rows[0]["full_name"],
+        "mssv": rows[0]["mssv"],
+        "links": []
+    }
+    
+    for row in rows:
+        if row["url"]:
+            result["links"].append({
+                "url": row["url"],
+                "title": row["title"],
+                "kind": row["kind"],
+                "gid": row["gid"],
+                "sheet": row["sheet_name"],
+                "row": row["row_number"],
+                "address": row["address"],
+                "snippet": row["snippet"]
+            })
+    
+    return result
+
+
 @lru_cache(maxsize=1024)
 def search_student_links(query: str, limit: int = 50) -> List[Dict[str, Any]]:
     """
@@ -142,65 +497,63 @@ def search_student_links(query: str, limit: int = 50) -> List[Dict[str, Any]]:
         "links": [{"url": str, "sheet": str, "row": int, "address": str}, ...]
     }]
     """
-    with get_db_connection() as conn:
-        cursor = conn.cursor(dictionary=True)
+    with get_db_connection_ro() as conn:
+        # Bước 1: tối đa `limit` sinh viên khớp (MSSV / tên qua FULLTEXT ft_student)
+        where, params = _student_predicate(query)
+        students = _execute_prepared(conn, _SEARCH_STUDENTS_SQL.format(where=where), params + (limit,))
+        if not students:
+            return []
         
-        # Search by MSSV (exact hoặc partial)
-        sql = """
-            SELECT 
-                s.student_id,
-                s.full_name,
-                s.mssv,
-                s.search_name,
-                sl.link_id,
-                l.url,
-                l.title,
-                l.kind,
-                l.gid,
-                sl.sheet_name,
-                sl.row_number,
-                sl.snippet
-            FROM student s
-            LEFT JOIN student_link sl ON s.student_id = sl.student_id
-            LEFT JOIN link l ON sl.link_id = l.link_id
-            WHERE s.mssv LIKE %s 
-               OR s.full_name LIKE %s
-               OR s.search_name LIKE %s
-            ORDER BY s.student_id, sl.sheet_name, sl.row_number
-            LIMIT %s
-        """
+        students_dict = _students_with_links(students)
         
-        pattern = f"%{query}%"
-        cursor.execute(sql, (pattern, pattern, pattern, limit * 10))
+        # Bước 2: toàn bộ links của các sinh viên đó trong MỘT query
+        # (không còn cắt LIMIT trên hàng JOIN làm mất sinh viên có nhiều link)
+        ids = list(students_dict)
+        format_strings = ", ".join(["%s"] * len(ids))
+        cursor = conn.cursor(dictionary=True)  # số %s thay đổi theo ids -> không prepare
+        cursor.execute(_SEARCH_LINKS_SQL.format(ids=format_strings), ids)
         rows = cursor.fetchall()
         cursor.close()
         
-        # Group by student
-        students_dict = {}
-        for row in rows:
-            sid = row["student_id"]
-            if sid not in students_dict:
-                students_dict[sid] = {
-                    "student_id": sid,
-                    "full_name": row["full_name"],
-                    "mssv": row["mssv"],
-                    "search_name": row["search_name"],
-                    "links": []
-                }
-            
-            if row["url"]:  # Only add if link exists
-                students_dict[sid]["links"].append({
-                    "link_id": row["link_id"],
-                    "url": row["url"],
-                    "title": row["title"],
-                    "kind": row["kind"],
-                    "gid": row["gid"],
-                    "sheet_name": row["sheet_name"],
-                    "row_number": row["row_number"],
-                    "snippet": row["snippet"]
-                })
-        
-        return list(students_dict.values())[:limit]
+        return _attach_links(students_dict, rows)
+
+
+# Dạng phẳng (một dòng mỗi link) cho /api/search: LIMIT áp ở mức dòng link.
+# Chỉ `limit` sinh viên đầu tiên có thể góp dòng nên bảng dẫn xuất cắt student trước khi JOIN.
+_SEARCH_LINK_ROWS_SQL = """
+    SELECT
+        s.student_id,
+        s.full_name,
+        s.mssv,
+        l.url,
+        l.title,
+        sl.sheet_name,
+        sl.row_number,
+        sl.snippet
+    FROM (
+        SELECT s.student_id, s.full_name, s.mssv
+        FROM student s
+        WHERE {where}
+        ORDER BY s.student_id
+        LIMIT %s
+    ) s
+    LEFT JOIN student_link sl ON sl.student_id = s.student_id
+    LEFT JOIN link l ON l.link_id = sl.link_id
+    ORDER BY s.student_id, sl.sheet_name, sl.row_number
+    LIMIT %s
+"""
+
+
+def search_student_link_rows(query: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Như search_student_links nhưng trả tối đa `limit` dòng phẳng (sinh viên × link) trong
+    MỘT query; sinh viên không có link cho một dòng với url = None.
+    Không cache: kết quả phải thấy ngay dữ liệu vừa ingest (extract-students, process-linked-sheets).
+    """
+    where, params = _student_predicate(query)
+    with get_db_connection_ro() as conn:
+        return _execute_prepared(conn, _SEARCH_LINK_ROWS_SQL.format(where=where),
+                                 params + (limit, limit))
 
 
 @lru_cache(maxsize=1024)
@@ -209,86 +562,15 @@ def quick_search(query: str, limit: int = 20) -> List[Dict[str, Any]]:
     Quick search - chỉ trả về student info + count links.
     Nhanh hơn search_student_links() vì không JOIN link details.
     """
-    with get_db_connection() as conn:
-        cursor = conn.cursor(dictionary=True)
-        
-        sql = """
-            SELECT 
-                s.student_id,
-                s.full_name,
-                s.mssv,
-                COUNT(sl.link_id) as link_count
-            FROM student s
-            LEFT JOIN student_link sl ON s.student_id = sl.student_id
-            WHERE s.mssv LIKE %s 
-               OR s.full_name LIKE %s
-               OR s.search_name LIKE %s
-            GROUP BY s.student_id, s.full_name, s.mssv
-            ORDER BY link_count DESC, s.full_name
-            LIMIT %s
-        """
-        
-        pattern = f"%{query}%"
-        cursor.execute(sql, (pattern, pattern, pattern, limit))
-        rows = cursor.fetchall()
-        cursor.close()
-        
-        return rows
+    with get_db_connection_ro() as conn:
+        where, params = _student_predicate(query)
+        return _execute_prepared(conn, _QUICK_SEARCH_SQL.format(where=where), params + (limit,))
 
 
 def get_student_links_by_mssv(mssv: str) -> Optional[Dict[str, Any]]:
     """Lấy tất cả links của 1 sinh viên theo MSSV (exact match)."""
-    with get_db_connection() as conn:
-        cursor = conn.cursor(dictionary=True)
-        
-        sql = """
-            SELECT 
-                s.student_id,
-                s.full_name,
-                s.mssv,
-                l.url,
-                l.title,
-                l.kind,
-                l.gid,
-                sl.sheet_name,
-                sl.row_number,
-                sl.address,
-                sl.snippet
-            FROM student s
-            LEFT JOIN student_link sl ON s.student_id = sl.student_id
-            LEFT JOIN link l ON sl.link_id = l.link_id
-            WHERE s.mssv = %s
-            ORDER BY sl.sheet_name, sl.row_number
-        """
-        
-        cursor.execute(sql, (mssv,))
-        rows = cursor.fetchall()
-        cursor.close()
-        
-        if not rows:
-            return None
-        
-        result = {
-            "student_id": rows[0]["student_id"],
-            "full_name": rows[0]["full_name"],
-            "mssv": rows[0]["mssv"],
-            "links": []
-        }
-        
-        for row in rows:
-            if row["url"]:
-                result["links"].append({
-                    "url": row["url"],
-                    "title": row["title"],
-                    "kind": row["kind"],
-                    "gid": row["gid"],
-                    "sheet": row["sheet_name"],
-                    "row": row["row_number"],
-                    "address": row["address"],
-                    "snippet": row["snippet"]
-                })
-        
-        return result
+    with get_db_connection_ro() as conn:
+        return _mssv_result(_execute_prepared(conn, _MSSV_LINKS_SQL, (mssv,)))
 
 
 # =========================
@@ -298,8 +580,6 @@ def get_student_links_by_mssv(mssv: str) -> Optional[Dict[str, Any]]:
 def insert_student(full_name: str, mssv: Optional[str] = None) -> int:
     """Insert student, returns student_id."""
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        
         sql = """
             INSERT INTO student (full_name, mssv)
             VALUES (%s, %s)
@@ -308,10 +588,9 @@ def insert_student(full_name: str, mssv: Optional[str] = None) -> int:
                 student_id = LAST_INSERT_ID(student_id)
         """
         
-        cursor.execute(sql, (full_name, mssv))
+        _, student_id = _execute_prepared_write(conn, sql, (full_name, mssv))
         conn.commit()
-        student_id = cursor.lastrowid
-        cursor.close()
+        _clear_id_lookup_caches()
         
         return student_id
 
@@ -320,8 +599,6 @@ def insert_link(url: str, title: Optional[str] = None, kind: Optional[str] = Non
                 gid: Optional[str] = None) -> int:
     """Insert link, returns link_id."""
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        
         sql = """
             INSERT INTO link (url, title, kind, gid)
             VALUES (%s, %s, %s, %s)
@@ -332,10 +609,9 @@ def insert_link(url: str, title: Optional[str] = None, kind: Optional[str] = Non
                 link_id = LAST_INSERT_ID(link_id)
         """
         
-        cursor.execute(sql, (url, title, kind, gid))
+        _, link_id = _execute_prepared_write(conn, sql, (url, title, kind, gid))
         conn.commit()
-        link_id = cursor.lastrowid
-        cursor.close()
+        _clear_id_lookup_caches()
         
         return link_id
 
@@ -350,8 +626,6 @@ def link_student_to_url(
 ) -> bool:
     """Tạo mối liên kết student <-> link."""
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        
         sql = """
             INSERT INTO student_link 
             (student_id, link_id, sheet_name, row_number, address, snippet)
@@ -362,224 +636,1229 @@ def link_student_to_url(
                 snippet = VALUES(snippet)
         """
         
-        cursor.execute(sql, (student_id, link_id, sheet_name, row_number, address, snippet))
+        affected, _ = _execute_prepared_write(
+            conn, sql, (student_id, link_id, sheet_name, row_number, address, snippet)
+        )
+        if affected == 1:  # dòng mới (2 = cập nhật dòng đã có)
+            cursor = conn.cursor()
+            try:
+                _refresh_link_counts(cursor, {student_id})
+            finally:
+                cursor.close()
         conn.commit()
-        affected = cursor.rowcount
-        cursor.close()
         
         return affected > 0
 
 
+def insert_students_batch(
+    students: List[Tuple[str, Optional[str]]],
+    conn=None,
+    cursor=None
+) -> Dict[str, int]:
+    """
+    Bản batch của insert_student: [(full_name, mssv), ...] -> {full_name: student_id}.
+    Một multi-row INSERT ... ON DUPLICATE KEY UPDATE cho cả danh sách, rồi đọc lại id
+    (LAST_INSERT_ID chỉ trả id của dòng đầu khi insert nhiều dòng) bằng JOIN với danh sách
+    tên đầu vào: so sánh theo collation của cột nhưng trả về đúng chuỗi input làm khoá,
+    nên tên khác hoa/thường/dấu với bản đã lưu không cần thêm lượt SELECT từng tên.
+    """
+    rows = list({name: (name, mssv) for name, mssv in students if name}.values())
+    if not rows:
+        return {}
+    with _batch_cursor(conn, cursor) as cur:
+        _multi_insert(cur, "student", ["full_name", "mssv"], rows,
+                      suffix="ON DUPLICATE KEY UPDATE mssv = COALESCE(VALUES(mssv), mssv)")
+        ids: Dict[str, int] = {}
+        names = [name for name, _ in rows]
+        for i in range(0, len(names), _MULTI_INSERT_CHUNK):
+            chunk = names[i:i + _MULTI_INSERT_CHUNK]
+            keys = " UNION ALL ".join(["SELECT %s AS name"] * len(chunk))
+            cur.execute(
+                f"SELECT k.name, s.student_id FROM ({keys}) AS k "
+                f"JOIN student s ON s.full_name = k.name",
+                chunk
+            )
+            ids.update({name: sid for name, sid in cur.fetchall()})
+    return ids
+
+
+def _url_hash(url: str) -> bytes:
+    """Giá trị cột link.url_hash (= UNHEX(MD5(url)), BINARY(16)) tính ở Python để bind thẳng."""
+    return hashlib.md5(url.encode("utf-8")).digest()
+
+
+def insert_links_batch_upsert(
+    links: List[Tuple[str, Optional[str], Optional[str], Optional[str]]],
+    conn=None,
+    cursor=None
+) -> Dict[str, int]:
+    """
+    Bản batch của insert_link: [(url, title, kind, gid), ...] -> {url: link_id}.
+    Khoá là url_hash: băm MD5 ở Python một lần mỗi URL, dedupe theo hash rồi bind
+    16 byte vào WHERE (server không phải MD5 lại từng tham số).
+    """
+    by_hash = {_url_hash(link[0]): link for link in links if link and link[0]}
+    rows = list(by_hash.values())
+    if not rows:
+        return {}
+    with _batch_cursor(conn, cursor) as cur:
+        _multi_insert(cur, "link", ["url", "title", "kind", "gid"], rows,
+                      suffix="""ON DUPLICATE KEY UPDATE
+                title = COALESCE(VALUES(title), title),
+                kind = COALESCE(VALUES(kind), kind),
+                gid = COALESCE(VALUES(gid), gid)""")
+        ids: Dict[str, int] = {}
+        hashes = list(by_hash)
+        for i in range(0, len(hashes), _MULTI_INSERT_CHUNK):
+            chunk = hashes[i:i + _MULTI_INSERT_CHUNK]
+            cur.execute(
+                f"SELECT url_hash, link_id FROM link "
+                f"WHERE url_hash IN ({', '.join(['%s'] * len(chunk))})",
+                chunk
+            )
+            ids.update({by_hash[bytes(h)][0]: lid for h, lid in cur.fetchall()})
+    return ids
+
+
+def link_students_to_urls_batch(
+    rows: List[Tuple[int, int, Optional[str], Optional[int], Optional[str], Optional[str]]],
+    conn=None,
+    cursor=None
+) -> int:
+    """
+    Bản batch của link_student_to_url:
+    [(student_id, link_id, sheet_name, row_number, address, snippet), ...] -> rowcount MySQL.
+    """
+    if not rows:
+        return 0
+    with _batch_cursor(conn, cursor) as cur:
+        return _multi_insert(
+            cur, "student_link",
+            ["student_id", "link_id", "sheet_name", "row_number", "address", "snippet"],
+            rows,
+            suffix="""ON DUPLICATE KEY UPDATE
+                sheet_name = VALUES(sheet_name),
+                address = VALUES(address),
+                snippet = VALUES(snippet)"""
+        )
+
+
 # =========================
 # Batch Operations
 # =========================
 
+@lru_cache(maxsize=8192)
 def get_student_id_by_name(full_name: str) -> Optional[int]:
-    """Check if student exists by exact full_name."""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT student_id FROM student WHERE full_name = %s", (full_name,))
-        row = cursor.fetchone()
-        cursor.close()
-        return row[0] if row else None
+    """
+    Check if student exists by exact full_name.
+    Cache theo tên (student_id không đổi sau khi cấp); kết quả None cũng được cache nên
+    các hàm ghi student gọi _clear_id_lookup_caches().
+    """
+    with get_db_connection_ro() as conn:
+        rows = _execute_prepared(
+            conn, "SELECT student_id FROM student WHERE full_name = %s LIMIT 1", (full_name,)
+        )
+        return rows[0]["student_id"] if rows else None
 
 
+@lru_cache(maxsize=8192)
 def get_link_id_by_url(url: str) -> Optional[int]:
-    """Check if link exists by url (using hash)."""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT link_id FROM link WHERE url_hash = UNHEX(MD5(%s))", (url,))
-        row = cursor.fetchone()
-        cursor.close()
-        return row[0] if row else None
+    """Check if link exists by url (using hash). Cache như get_student_id_by_name."""
+    with get_db_connection_ro() as conn:
+        rows = _execute_prepared(conn, "SELECT link_id FROM link WHERE url_hash = %s", (_url_hash(url),))
+        return rows[0]["link_id"] if rows else None
+
+
+def _clear_id_lookup_caches() -> None:
+    """Bỏ cache tra id (kể cả kết quả None) sau khi có student/link mới được ghi."""
+    get_student_id_by_name.cache_clear()
+    get_link_id_by_url.cache_clear()
 
 
 def check_student_link_exists(student_id: int, link_id: int, row_number: int) -> bool:
     """Check if connection exists."""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT 1 FROM student_link WHERE student_id = %s AND link_id = %s AND row_number = %s",
+    with get_db_connection_ro() as conn:
+        rows = _execute_prepared(
+            conn,
+            "SELECT 1 AS hit FROM student_link WHERE student_id = %s AND link_id = %s AND row_number = %s",
             (student_id, link_id, row_number)
         )
-        row = cursor.fetchone()
-        cursor.close()
-        return row is not None
+        return bool(rows)
+
+
+# id đã ghi xong, khoá theo đúng bộ giá trị đã upsert: (full_name, mssv) / (url, title, kind, gid).
+# Gặp lại y hệt (rất thường khi sync lại cùng sheet) thì upsert chỉ ghi lại giá trị cũ,
+# nên bỏ qua được cả câu INSERT lẫn lượt đọc lại id.
+_STUDENT_IDS: LRUCache = LRUCache(maxsize=65536)
+_LINK_IDS: LRUCache = LRUCache(maxsize=65536)
+_ID_CACHE_LOCK = threading.Lock()
 
 
-def batch_insert_student_links(records: List[Dict[str, Any]]) -> int:
+# Số record mỗi transaction: COMMIT (fsync redo log) một lần mỗi chunk thay vì mỗi record,
+# transaction không phình vô hạn với input lớn, và lỗi chỉ rollback chunk của nó
+_STUDENT_LINK_COMMIT_EVERY = 1000
+
+
+def batch_insert_student_links(records: List[Dict[str, Any]], unsafe_bulk: bool = False) -> int:
     """
     Batch insert student-link records.
-    Uses a single connection to avoid socket exhaustion (Error 10048).
+    Ba pha bulk trên một connection, COMMIT một lần mỗi _STUDENT_LINK_COMMIT_EVERY record
+    (thay cho 4-6 query + commit mỗi record):
+    1. multi-row upsert student          -> {full_name: student_id}
+    2. multi-row upsert link (url_hash)  -> {url: link_id}
+    3. multi-row INSERT IGNORE student_link (PRIMARY KEY (student_id, link_id, row_number))
+    Chunk lỗi được rollback và ghi log; các chunk khác vẫn được ghi.
+    unsafe_bulk=True: caller bảo đảm input tin cậy (VD rebuild vào bảng rỗng) -> tắt
+    foreign_key_checks/unique_checks trong session (ingest_session(relax_checks=True)).
+    Với unique_checks=0 InnoDB có thể bỏ sót trùng full_name/url_hash đã có sẵn trong bảng,
+    nên không dùng cho nạp bổ sung vào dữ liệu cũ.
+    Trả số liên kết student_link mới được tạo.
     """
+    # Bỏ record trùng (full_name, url_hash, row) trước mọi câu SQL: PRIMARY KEY của
+    # student_link chỉ giữ bản đầu tiên (INSERT IGNORE) nên bản sau chỉ tốn băng thông.
+    # Bản trùng vẫn được giữ nếu mang metadata mới (mssv/title/kind/gid chưa thấy).
+    seen: Dict[Tuple[str, bytes, int], Tuple[Any, ...]] = {}
+    unique_records = []
+    for rec in records:
+        full_name = (rec.get("full_name") or "").strip()
+        if not full_name:
+            continue
+        url = rec.get("url") or ""
+        key = (full_name, _url_hash(url) if url else b"", rec.get("row") or 0)
+        meta = (rec.get("mssv"), rec.get("title"), rec.get("kind"),
+                rec.get("main_sheet") or rec.get("program"))
+        prev = seen.get(key)
+        if prev is not None:
+            if all(m is None or m == p for m, p in zip(meta, prev)):
+                continue
+            meta = tuple(p if m is None else m for m, p in zip(meta, prev))
+        seen[key] = meta
+        unique_records.append(rec)
+    records = unique_records
+
+    if LOCAL_INFILE_ENABLED and len(records) > _LOAD_DATA_THRESHOLD:
+        try:
+            inserted = _load_student_links_infile(records, unsafe_bulk)
+            _clear_id_lookup_caches()
+            return inserted
+        except Exception as e:  # server tắt local_infile, thiếu quyền... -> đường multi-row
+            log.warning("[batch_insert] LOAD DATA path failed, falling back to multi-row INSERT: %s", e)
+
     inserted = 0
-    
-    # SQL Templates
-    sql_check_student = "SELECT student_id FROM student WHERE full_name = %s"
-    sql_insert_student = """
-        INSERT INTO student (full_name, mssv)
-        VALUES (%s, %s)
-        ON DUPLICATE KEY UPDATE 
-            mssv = VALUES(mssv),
-            student_id = LAST_INSERT_ID(student_id)
+    failed = 0
+    for start in range(0, len(records), _STUDENT_LINK_COMMIT_EVERY):
+        chunk = records[start:start + _STUDENT_LINK_COMMIT_EVERY]
+        try:
+            inserted += _insert_student_links_chunk(chunk, unsafe_bulk)
+        except Exception as e:
+            failed += len(chunk)
+            log.exception("[batch_insert] Error inserting records %d-%d", start, start + len(chunk) - 1)
+    if failed:
+        log.warning("[batch_insert] %d/%d records rolled back", failed, len(records))
+    _clear_id_lookup_caches()
+    return inserted
+
+
+def _refresh_link_counts(cursor, student_ids: Iterable[int]) -> None:
     """
-    
-    sql_check_link = "SELECT link_id FROM link WHERE url_hash = UNHEX(MD5(%s))"
-    sql_insert_link = """
-        INSERT INTO link (url, title, kind, gid)
-        VALUES (%s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE 
-            title = VALUES(title),
-            kind = VALUES(kind),
-            gid = VALUES(gid),
-            link_id = LAST_INSERT_ID(link_id)
+    Đặt lại student.link_count (cột phi chuẩn hoá cho top-N trong get_stats) bằng số dòng
+    student_link thật của các student vừa được ghi — idempotent, không phụ thuộc việc
+    INSERT IGNORE đã bỏ qua dòng nào.
     """
-    
-    sql_check_conn = "SELECT 1 FROM student_link WHERE student_id = %s AND link_id = %s AND row_number = %s"
-    sql_insert_conn = """
-        INSERT INTO student_link 
-        (student_id, link_id, sheet_name, row_number, address, snippet)
-        VALUES (%s, %s, %s, %s, %s, %s)
+    ids = list(student_ids)
+    for i in range(0, len(ids), _MULTI_INSERT_CHUNK):
+        chunk = ids[i:i + _MULTI_INSERT_CHUNK]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(
+            f"""
+            UPDATE student s
+            JOIN (
+                SELECT student_id, COUNT(*) AS c FROM student_link
+                WHERE student_id IN ({placeholders})
+                GROUP BY student_id
+            ) x ON x.student_id = s.student_id
+            SET s.link_count = x.c
+            """,
+            chunk
+        )
+
+
+def _group_student_link_records(records: List[Dict[str, Any]]):
+    """
+    Gom records thành (students {full_name: mssv}, links {url: (url, title, kind, gid)},
+    pending [(full_name, url, sheet, row, address, snippet)]) — mỗi student/link một lần.
     """
+    students: Dict[str, Optional[str]] = {}
+    links: Dict[str, Tuple[str, Optional[str], Optional[str], Optional[str]]] = {}
+    pending: List[Tuple[str, str, Optional[str], int, Optional[str], Optional[str]]] = []
+
+    for rec in records:
+        full_name = (rec.get("full_name") or "").strip()
+        if not full_name:
+            continue
+        students.setdefault(full_name, rec.get("mssv"))
+
+        url = rec.get("url", "")
+        title = rec.get("title")
+        kind = rec.get("kind")
+        # Use 'main_sheet' (Spreadsheet Title) as gid primarily, fallback to 'program'
+        gid = rec.get("main_sheet") or rec.get("program")
+        if not url:
+            continue
+
+        # Check link type for logging
+        if kind == 'drive' or 'drive.google.com' in url or 'docs.google.com' in url:
+            log.debug("[batch_insert] Drive link: %s title=%s kind=%s gid=%s", url, title, kind, gid)
 
+        # Cùng URL nhiều lần trong batch: metadata sau ghi đè nếu khác None (như COALESCE)
+        prev = links.get(url)
+        if prev:
+            title, kind, gid = title or prev[1], kind or prev[2], gid or prev[3]
+        links[url] = (url, title, kind, gid)
+
+        pending.append((
+            full_name, url, rec.get("sheet"), rec.get("row") or 0,
+            rec.get("address"), rec.get("snippet")
+        ))
+    return students, links, pending
+
+
+def _insert_student_links_chunk(records: List[Dict[str, Any]], relax_checks: bool = False) -> int:
+    """Một transaction của batch_insert_student_links; lỗi được raise cho caller."""
+    students, links, pending = _group_student_link_records(records)
+    if not students:
+        return 0
+
+    name2id: Dict[str, int] = {}
+    url2id: Dict[str, int] = {}
+    new_students: List[Tuple[str, Optional[str]]] = []
+    new_links: List[Tuple[str, Optional[str], Optional[str], Optional[str]]] = []
+    with _ID_CACHE_LOCK:
+        for student in students.items():
+            sid = _STUDENT_IDS.get(student)
+            if sid is None:
+                new_students.append(student)
+            else:
+                name2id[student[0]] = sid
+        for link in links.values():
+            lid = _LINK_IDS.get(link)
+            if lid is None:
+                new_links.append(link)
+            else:
+                url2id[link[0]] = lid
+
+    with ingest_session(relax_checks) as (_, cursor):
+        written_students = insert_students_batch(new_students, cursor=cursor)
+        written_links = insert_links_batch_upsert(new_links, cursor=cursor)
+        name2id.update(written_students)
+        url2id.update(written_links)
+        rows = [
+            (name2id[name], url2id[url], sheet, row_num, address, snippet)
+            for name, url, sheet, row_num, address, snippet in pending
+            if name in name2id and url in url2id
+        ]
+        inserted = _multi_insert(
+            cursor, "student_link",
+            ["student_id", "link_id", "sheet_name", "row_number", "address", "snippet"],
+            rows, ignore=True
+        )
+        if inserted:
+            _refresh_link_counts(cursor, {row[0] for row in rows})
+
+    # Chỉ cache sau khi COMMIT thành công (id của transaction bị rollback không tồn tại)
+    with _ID_CACHE_LOCK:
+        for student in new_students:
+            if student[0] in written_students:
+                _STUDENT_IDS[student] = written_students[student[0]]
+        for link in new_links:
+            if link[0] in written_links:
+                _LINK_IDS[link] = written_links[link[0]]
+    return inserted
+
+
+_LOAD_DATA_THRESHOLD = 5000
+# LOAD DATA: tab-separated, \N = NULL, escape bằng backslash (mặc định của MySQL)
+_TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r", "\0": "\\0"})
+
+
+def _write_tsv(rows: Iterable[Tuple[Any, ...]]) -> str:
+    """Ghi rows ra file tạm theo định dạng mặc định của LOAD DATA; trả đường dẫn."""
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", newline="\n",
+                                     suffix=".tsv", delete=False) as f:
+        for row in rows:
+            f.write("\t".join(
+                "\\N" if v is None else str(v).translate(_TSV_ESCAPES) for v in row
+            ))
+            f.write("\n")
+        return f.name
+
+
+def _load_student_links_infile(records: List[Dict[str, Any]], relax_checks: bool = False) -> int:
+    """
+    Đường bulk cho input rất lớn: ghi student/link/student_link ra 3 file TSV, LOAD DATA
+    LOCAL INFILE vào bảng TEMPORARY (bộ nạp bulk, không qua SQL parser từng VALUES),
+    rồi INSERT ... SELECT sang bảng thật trong một transaction. Trả số student_link mới.
+    Cần MYSQL_LOCAL_INFILE=1 (client) và local_infile=ON (server).
+    """
+    students, links, pending = _group_student_link_records(records)
+    if not students:
+        return 0
+    files = [
+        _write_tsv(students.items()),
+        _write_tsv(links.values()),
+        _write_tsv(pending),
+    ]
+    try:
+        with ingest_session(relax_checks) as (_, cursor):
+            cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_student, tmp_link, tmp_student_link")
+            cursor.execute(
+                "CREATE TEMPORARY TABLE tmp_student "
+                "(full_name VARCHAR(255) NOT NULL, mssv VARCHAR(50) NULL) "
+                "DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci"
+            )
+            cursor.execute(
+                "CREATE TEMPORARY TABLE tmp_link "
+                "(url TEXT NOT NULL, title VARCHAR(500) NULL, kind VARCHAR(32) NULL, gid VARCHAR(512) NULL) "
+                "DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci"
+            )
+            cursor.execute(
+                "CREATE TEMPORARY TABLE tmp_student_link "
+                "(full_name VARCHAR(255) NOT NULL, url TEXT NOT NULL, sheet_name VARCHAR(255) NULL, "
+                "row_number INT NULL, address VARCHAR(16) NULL, snippet VARCHAR(512) NULL) "
+                "DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci"
+            )
+            for path, table in zip(files, ("tmp_student", "tmp_link", "tmp_student_link")):
+                cursor.execute(
+                    f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4",
+                    (path,)
+                )
+            cursor.execute("""
+                INSERT INTO student (full_name, mssv)
+                SELECT full_name, mssv FROM tmp_student
+                ON DUPLICATE KEY UPDATE mssv = COALESCE(VALUES(mssv), student.mssv)
+            """)
+            cursor.execute("""
+                INSERT INTO link (url, title, kind, gid)
+                SELECT url, title, kind, gid FROM tmp_link
+                ON DUPLICATE KEY UPDATE
+                    title = COALESCE(VALUES(title), link.title),
+                    kind = COALESCE(VALUES(kind), link.kind),
+                    gid = COALESCE(VALUES(gid), link.gid)
+            """)
+            cursor.execute("""
+                INSERT IGNORE INTO student_link
+                (student_id, link_id, sheet_name, row_number, address, snippet)
+                SELECT s.student_id, l.link_id, t.sheet_name, t.row_number, t.address, t.snippet
+                FROM tmp_student_link t
+                JOIN student s ON s.full_name = t.full_name
+                JOIN link l ON l.url_hash = UNHEX(MD5(t.url))
+            """)
+            inserted = max(cursor.rowcount, 0)
+            if inserted:
+                cursor.execute("""
+                    UPDATE student s
+                    JOIN (
+                        SELECT sl.student_id, COUNT(*) AS c
+                        FROM tmp_student t
+                        JOIN student s2 ON s2.full_name = t.full_name
+                        JOIN student_link sl ON sl.student_id = s2.student_id
+                        GROUP BY sl.student_id
+                    ) x ON x.student_id = s.student_id
+                    SET s.link_count = x.c
+                """)
+            cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_student, tmp_link, tmp_student_link")
+            return inserted
+    finally:
+        for path in files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# =========================
+# Index/Content DBs (ctv_data, parsed_rows, ... — xem schema.sql)
+# =========================
+LINKS_DB_NAME = os.environ.get("MYSQL_LINKS_DATABASE", "ctv_links_db")
+CONTENT_DB_NAME = os.environ.get("MYSQL_CONTENT_DATABASE", "ctv_content_db")
+
+
+def _scalar_int(conn, sql: str) -> int:
+    """
+    SELECT một giá trị số qua cmd_query/get_rows: bỏ qua việc dựng MySQLCursor cho
+    các query một-lần (đếm dòng) mà dashboard poll liên tục. Chỉ dùng với SQL không
+    có tham số từ người dùng (tên schema/bảng là hằng trong module).
+    """
+    conn.cmd_query(sql)
+    rows, _ = conn.get_rows()
+    value = rows[0][0] if rows else None
+    return int(value or 0)  # get_rows có thể trả bytes (connector thuần Python) — int() nhận cả hai
+
+
+def _approx_row_count(conn, schema: str, table: str) -> int:
+    """Số dòng ước lượng từ information_schema (O(1), không quét bảng như COUNT(*))."""
+    return _scalar_int(
+        conn,
+        "SELECT table_rows FROM information_schema.tables "
+        f"WHERE table_schema = '{schema}' AND table_name = '{table}'"
+    )
+
+
+def _truncate_tables(tables: List[Tuple[str, str]]) -> Dict[str, int]:
+    """
+    TRUNCATE từng bảng (drop + tạo lại tablespace, không log/xoá từng dòng như DELETE).
+    TRUNCATE tự commit và không rollback được. Trả {table: số dòng ước lượng trước khi xoá}.
+    """
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        
-        for rec in records:
+        try:
+            counts = {}
+            for schema, table in tables:
+                counts[table] = _approx_row_count(conn, schema, table)
+                cursor.execute(f"TRUNCATE TABLE {schema}.{table}")
+            return counts
+        finally:
+            cursor.close()
+            _invalidate_summaries()
+
+
+def clear_links_table() -> int:
+    """Xoá toàn bộ links; trả số dòng (ước lượng) đã xoá."""
+    return _truncate_tables([(LINKS_DB_NAME, "links")])["links"]
+
+
+def clear_ctv_data_table() -> int:
+    """Xoá toàn bộ ctv_data; trả số dòng (ước lượng) đã xoá."""
+    return _truncate_tables([(LINKS_DB_NAME, "ctv_data")])["ctv_data"]
+
+
+def clear_content_tables() -> Dict[str, int]:
+    """Xoá parsed_rows + fetched_content; trả {table: số dòng (ước lượng) đã xoá}."""
+    return _truncate_tables([(CONTENT_DB_NAME, "parsed_rows"), (CONTENT_DB_NAME, "fetched_content")])
+
+
+# COUNT(*) chính xác (quét index) giữ 60s: dashboard poll liên tục không quét lại.
+# Cache + lock như _APPROX_COUNT_CACHE: được gọi từ nhiều thread của threadpool.
+_EXACT_COUNT_CACHE: TTLCache = TTLCache(maxsize=16, ttl=60)
+_EXACT_COUNT_LOCK = threading.Lock()
+
+
+# Ước lượng table_rows tự nó đã xấp xỉ: giữ 10s để dashboard poll không mở connection mỗi lần
+_APPROX_COUNT_CACHE: TTLCache = TTLCache(maxsize=16, ttl=10)
+_APPROX_COUNT_LOCK = threading.Lock()
+
+
+@cached(_APPROX_COUNT_CACHE, lock=_APPROX_COUNT_LOCK)
+def _cached_approx_count(schema: str, table: str) -> int:
+    with get_db_connection_ro() as conn:
+        return _approx_row_count(conn, schema, table)
+
+
+@cached(_EXACT_COUNT_CACHE, lock=_EXACT_COUNT_LOCK)
+def _cached_exact_count(schema: str, table: str) -> int:
+    with get_db_connection_ro() as conn:
+        return _scalar_int(conn, f"SELECT COUNT(*) FROM {schema}.{table}")
+
+
+def _table_count(schema: str, table: str, exact: bool = False) -> int:
+    """
+    Số dòng của bảng cho dashboard. Mặc định đọc information_schema.tables.table_rows
+    (ước lượng của InnoDB, O(1), cache 10s); exact=True chạy COUNT(*) (cache 60s).
+    Cả hai cache bị xoá khi có ghi (_invalidate_summaries).
+    """
+    if exact:
+        return _cached_exact_count(schema, table)
+    return _cached_approx_count(schema, table)
+
+
+def get_links_count(exact: bool = False) -> int:
+    """Số links (ước lượng, xem _table_count)."""
+    return _table_count(LINKS_DB_NAME, "links", exact)
+
+
+def get_ctv_data_count(exact: bool = False) -> int:
+    """Số dòng ctv_data (ước lượng, xem _table_count)."""
+    return _table_count(LINKS_DB_NAME, "ctv_data", exact)
+
+
+_FETCH_BATCH = 256
+
+
+def _iter_query(sql: str, params: Tuple[Any, ...] = ()) -> Iterator[Dict[str, Any]]:
+    """
+    Chạy SELECT trên cursor unbuffered và stream từng dòng (fetchmany theo lô),
+    không dựng cả kết quả trong RAM. Connection được giữ tới khi generator kết thúc
+    hoặc bị đóng; caller cần list thì bọc list().
+    """
+    with get_db_connection_ro() as conn:
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        try:
+            cursor.execute(sql, params)
+            while True:
+                batch = cursor.fetchmany(_FETCH_BATCH)
+                if not batch:
+                    break
+                yield from batch
+        finally:
+            # cursor unbuffered phải đọc hết kết quả trước khi close (khi caller dừng sớm)
             try:
-                # 1. Check/Get Student
-                full_name = rec.get("full_name", "").strip()
-                if not full_name:
-                    continue
+                while cursor.fetchmany(_FETCH_BATCH):
+                    pass
+            except MySQLError:
+                pass
+            cursor.close()
 
-                mssv = rec.get("mssv")
-                
-                cursor.execute(sql_check_student, (full_name,))
-                row = cursor.fetchone()
-                
-                if row:
-                    student_id = row[0]
-                else:
-                    cursor.execute(sql_insert_student, (full_name, mssv))
-                    student_id = cursor.lastrowid
-                
-                # 2. Check/Get Link
-                url = rec.get("url", "")
-                title = rec.get("title")
-                kind = rec.get("kind")
-                # Use 'main_sheet' (Spreadsheet Title) as gid primarily, fallback to 'program'
-                gid = rec.get("main_sheet") or rec.get("program")
-                
-                if not url:
-                    continue
-                
-                # Check link type for logging
-                if kind == 'drive' or 'drive.google.com' in url or 'docs.google.com' in url:
-                    print(f"[batch_insert] Processing Drive link: {url} (Title: {title}, Kind: {kind}, Gid: {gid})")
-                    
-                cursor.execute(sql_check_link, (url,))
-                row = cursor.fetchone()
-                
-                if row:
-                    link_id = row[0]
-                    # Update metadata if available
-                    if title or kind or gid:
-                        cursor.execute(
-                            "UPDATE link SET title = COALESCE(%s, title), kind = COALESCE(%s, kind), gid = COALESCE(%s, gid) WHERE link_id = %s",
-                            (title, kind, gid, link_id)
-                        )
-                else:
-                    cursor.execute(sql_insert_link, (url, title, kind, gid))
-                    link_id = cursor.lastrowid
-                
-                # 3. Check/Create Connection
-                row_num = rec.get("row") or 0
-                cursor.execute(sql_check_conn, (student_id, link_id, row_num))
-                
-                if not cursor.fetchone():
-                    cursor.execute(sql_insert_conn, (
-                        student_id, link_id, 
-                        rec.get("sheet"), row_num, 
-                        rec.get("address"), rec.get("snippet")
-                    ))
-                    inserted += 1
-                
-                conn.commit()
-                
+
+def get_ctv_by_sheet(sheet_name: str, limit: int = 100) -> Iterator[Dict[str, Any]]:
+    """Các dòng ctv_data của một sheet theo thứ tự dòng (stream)."""
+    return _iter_query(
+        f"""
+        SELECT id, sheet_name, row_number, full_name, mssv, unit, program, row_text, links
+        FROM {LINKS_DB_NAME}.ctv_data
+        WHERE sheet_name = %s
+        ORDER BY row_number
+        LIMIT %s
+        """,
+        (sheet_name, limit)
+    )
+
+
+# Các view tổng hợp quét cả bảng mỗi lần đọc; dashboard poll liên tục -> cache ngắn,
+# và xoá ngay khi có ghi (_invalidate_summaries) để không thấy số liệu cũ sau sync.
+_summary_cache: TTLCache = TTLCache(maxsize=8, ttl=30)
+_SUMMARY_LOCK = threading.Lock()
+
+
+def _invalidate_summaries() -> None:
+    with _SUMMARY_LOCK:
+        _summary_cache.clear()
+    with _APPROX_COUNT_LOCK:
+        _APPROX_COUNT_CACHE.clear()
+    with _EXACT_COUNT_LOCK:
+        _EXACT_COUNT_CACHE.clear()
+
+
+@cached(_summary_cache, key=lambda: "link_summary_by_sheet", lock=_SUMMARY_LOCK)
+def get_link_summary_by_sheet() -> List[Dict[str, Any]]:
+    """Tổng hợp links theo sheet (view link_summary_by_sheet), cache 30s."""
+    return list(_iter_query(
+        "SELECT sheet_name, total_links, unique_urls, unique_gids, last_updated "
+        f"FROM {LINKS_DB_NAME}.link_summary_by_sheet"
+    ))
+
+
+@cached(_summary_cache, key=lambda: "content_summary", lock=_SUMMARY_LOCK)
+def get_content_summary() -> List[Dict[str, Any]]:
+    """Tổng hợp fetched_content theo status/content_type (view content_summary), cache 30s."""
+    return list(_iter_query(
+        "SELECT status, content_type, total_urls, total_rows, last_fetched "
+        f"FROM {CONTENT_DB_NAME}.content_summary"
+    ))
+
+
+_CTV_COLS = "id, sheet_name, row_number, full_name, mssv, unit, program, links"
+
+
+@lru_cache(maxsize=4096)
+def _normalize(query: str) -> str:
+    """
+    Bỏ dấu + lowercase + gộp khoảng trắng cho query tìm kiếm, cache theo chuỗi query.
+    Dùng cùng bảng translate với fold_vietnamese nên khớp với cột *_normalized lúc ingest.
+    """
+    return " ".join(fold_vietnamese(query or "").split())
+
+
+def _like_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+_NGRAM_TOKEN_SIZE = 2  # ngram_token_size mặc định của server
+
+
+def _ngram_boolean_terms(q_fold: str) -> str:
+    """
+    Chuỗi BOOLEAN MODE cho index ngram: mọi âm tiết đều bắt buộc ("+tok"). Với parser
+    ngram, mỗi term được tách thành các bigram và khớp như cụm từ, nên không cần "*" để
+    khớp tiền tố; term ngắn hơn ngram_token_size (1 ký tự) bị bỏ vì không có trong index.
+    """
+    tokens = _FT_OPERATORS_RE.sub(" ", q_fold).split()
+    return " ".join(f"+{t}" for t in tokens if len(t) >= _NGRAM_TOKEN_SIZE)
+
+
+def search_ctv(mssv: str, q_fold: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Tìm CTV trong MỘT round-trip: khớp MSSV chính xác, rồi full-text trên tên/text không dấu.
+    Hai nhánh UNION ALL thay cho `mssv = %s OR MATCH(...)` — OR giữa B-tree và FULLTEXT
+    làm optimizer bỏ cả hai index; tách ra thì mỗi nhánh dùng đúng index của nó.
+    Nhánh full-text dùng BOOLEAN MODE trên idx_ctv_search_ngram (parser ngram, xem schema.sql):
+    mọi âm tiết phải có mặt, kể cả âm tiết 2 chữ cái mà parser mặc định bỏ qua.
+    """
+    terms = _ngram_boolean_terms(q_fold)  # rỗng -> nhánh full-text không trả dòng nào
+    with get_db_connection_ro() as conn:
+        sql = f"""
+            (SELECT {_CTV_COLS}, 1 AS mssv_match, 0 AS score
+             FROM {LINKS_DB_NAME}.ctv_data
+             WHERE mssv = %s
+             LIMIT %s)
+            UNION ALL
+            (SELECT {_CTV_COLS}, 0 AS mssv_match,
+                    MATCH(full_name_normalized, row_text_normalized)
+                        AGAINST (%s IN BOOLEAN MODE) AS score
+             FROM {LINKS_DB_NAME}.ctv_data
+             WHERE MATCH(full_name_normalized, row_text_normalized)
+                        AGAINST (%s IN BOOLEAN MODE)
+               AND mssv <> %s
+             LIMIT %s)
+            ORDER BY mssv_match DESC, score DESC
+            LIMIT %s
+        """
+        return _execute_prepared(conn, sql, (mssv, limit, terms, terms, mssv, limit, limit))
+
+
+def search_ctv_by_mssv(mssv: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Tìm CTV theo MSSV: khớp chính xác trước, rồi khớp một phần.
+    Nhánh chính xác dùng idx_mssv (equality); nhánh một phần dùng range scan trên
+    idx_mssv khi MSSV toàn chữ số (coi là tiền tố), còn lại mới phải LIKE '%q%'.
+    """
+    mssv = (mssv or "").strip()
+    if not mssv:
+        return []
+    escaped = _like_escape(mssv)
+    pattern = f"{escaped}%" if mssv.isdigit() else f"%{escaped}%"
+    with get_db_connection_ro() as conn:
+        sql = f"""
+            (SELECT {_CTV_COLS}, 1 AS exact_match
+             FROM {LINKS_DB_NAME}.ctv_data
+             WHERE mssv = %s
+             LIMIT %s)
+            UNION ALL
+            (SELECT {_CTV_COLS}, 0 AS exact_match
+             FROM {LINKS_DB_NAME}.ctv_data
+             WHERE mssv LIKE %s AND mssv <> %s
+             LIMIT %s)
+            ORDER BY exact_match DESC
+            LIMIT %s
+        """
+        return _execute_prepared(conn, sql, (mssv, limit, pattern, mssv, limit, limit))
+
+
+def search_ctv_by_name(name: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Tìm CTV theo tên (có dấu hoặc không dấu) bằng MỘT query FULLTEXT trên
+    full_name_normalized: bỏ dấu query ở Python một lần thay vì chạy hai lượt
+    (có dấu rồi không dấu). MATCH ở SELECT và WHERE giống hệt nhau nên MySQL chỉ tính một lần.
+    """
+    q_fold = _normalize(name)
+    if not q_fold:
+        return []
+    with get_db_connection_ro() as conn:
+        sql = f"""
+            SELECT {_CTV_COLS},
+                   MATCH(full_name_normalized) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score
+            FROM {LINKS_DB_NAME}.ctv_data
+            WHERE MATCH(full_name_normalized) AGAINST (%s IN NATURAL LANGUAGE MODE)
+            ORDER BY score DESC
+            LIMIT %s
+        """
+        return _execute_prepared(conn, sql, (q_fold, q_fold, limit))
+
+
+# Trần cho limit của search_in_parsed_rows: kết quả được đọc hết vào RAM
+_PARSED_SEARCH_MAX_LIMIT = 500
+
+
+def search_in_parsed_rows(query: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Full-text search trong parsed_rows: một query trên normalized_text (không dấu —
+    tập kết quả bao trùm bản có dấu), query được bỏ dấu ở Python.
+    Đọc hết (tối đa _PARSED_SEARCH_MAX_LIMIT dòng) rồi trả connection về pool ngay,
+    để response stream chậm phía client không giữ connection / transaction đọc.
+    """
+    q_fold = _normalize(query)
+    if not q_fold:
+        return []
+    limit = max(1, min(int(limit), _PARSED_SEARCH_MAX_LIMIT))
+    sql = f"""
+        SELECT url, row_number, row_data, row_text,
+               MATCH(normalized_text) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score
+        FROM {CONTENT_DB_NAME}.parsed_rows
+        WHERE MATCH(normalized_text) AGAINST (%s IN NATURAL LANGUAGE MODE)
+        ORDER BY score DESC
+        LIMIT %s
+    """
+    return list(_iter_query(sql, (q_fold, q_fold, limit)))
+
+
+_MULTI_INSERT_CHUNK = 1000
+_MULTI_INSERT_MAX_BYTES = 8 * 1024 * 1024  # giữ dưới max_allowed_packet mặc định (16MB+)
+
+
+@lru_cache(maxsize=64)
+def _insert_sql(table: str, cols: Tuple[str, ...], n: int, suffix: str = "", ignore: bool = False) -> str:
+    """SQL `INSERT ... VALUES (...) x n [suffix]`, cache theo (bảng, cột, số dòng): chunk đầy dùng lại mãi."""
+    row_ph = "(" + ", ".join(["%s"] * len(cols)) + ")"
+    verb = "INSERT IGNORE" if ignore else "INSERT"
+    sql = f"{verb} INTO {table} ({', '.join(cols)}) VALUES " + ", ".join([row_ph] * n)
+    return f"{sql} {suffix}" if suffix else sql
+
+
+def _multi_insert(cursor, table: str, cols: List[str], rows: List[Tuple[Any, ...]],
+                  chunk: int = _MULTI_INSERT_CHUNK, suffix: str = "", ignore: bool = False) -> int:
+    """
+    INSERT nhiều dòng bằng một câu `VALUES (...),(...),...` mỗi chunk (1 round-trip / chunk),
+    thay cho executemany. Chunk cũng bị cắt sớm khi tổng dữ liệu vượt ~8MB.
+    suffix: phần đuôi tuỳ chọn, VD "ON DUPLICATE KEY UPDATE ...".
+    ignore: INSERT IGNORE (bỏ qua dòng trùng khoá).
+    Trả tổng rowcount MySQL (với INSERT IGNORE = số dòng thực sự được thêm).
+    """
+    if not rows:
+        return 0
+    cols_key = tuple(cols)
+    affected = 0
+
+    def _flush(batch: List[Tuple[Any, ...]]) -> None:
+        nonlocal affected
+        sql = _insert_sql(table, cols_key, len(batch), suffix, ignore)
+        cursor.execute(sql, [v for row in batch for v in row])
+        affected += max(cursor.rowcount, 0)
+
+    batch: List[Tuple[Any, ...]] = []
+    batch_bytes = 0
+    for row in rows:
+        row_bytes = sum(len(v) for v in row if isinstance(v, (str, bytes)))
+        if batch and (len(batch) >= chunk or batch_bytes + row_bytes > _MULTI_INSERT_MAX_BYTES):
+            _flush(batch)
+            batch, batch_bytes = [], 0
+        batch.append(row)
+        batch_bytes += row_bytes
+    if batch:
+        _flush(batch)
+    return affected
+
+
+def insert_ctv_data_batch(records: List[Dict[str, Any]], conn=None, cursor=None,
+                          chunk: int = _MULTI_INSERT_CHUNK) -> int:
+    """
+    Ghi nhiều dòng ctv_data bằng multi-row INSERT; cột links serialize bằng _json_dumps.
+    records: dict có sheet, row, full_name, full_name_normalized, mssv, unit, program,
+             row_text, row_text_normalized, links
+    conn / cursor: từ bulk_session() / ingest_session() — khi truyền vào, hàm không tự commit.
+    """
+    if not records:
+        return 0
+
+    if cursor is None:
+        with _batch_cursor(conn, relax_checks=True) as own_cursor:
+            return insert_ctv_data_batch(records, cursor=own_cursor, chunk=chunk)
+
+    params = [
+        (
+            rec.get("sheet", ""),
+            rec.get("row", 0),
+            rec.get("full_name", ""),
+            rec.get("full_name_normalized") or fold_vietnamese(rec.get("full_name") or ""),
+            rec.get("mssv", ""),
+            rec.get("unit", ""),
+            rec.get("program", ""),
+            rec.get("row_text", ""),
+            rec.get("row_text_normalized") or fold_vietnamese(rec.get("row_text") or ""),
+            _json_dumps(rec.get("links") or []),
+        )
+        for rec in records
+    ]
+
+    _invalidate_summaries()
+    _multi_insert(
+        cursor,
+        f"{LINKS_DB_NAME}.ctv_data",
+        ["sheet_name", "row_number", "full_name", "full_name_normalized", "mssv", "unit",
+         "program", "row_text", "row_text_normalized", "links"],
+        params,
+        chunk=chunk
+    )
+
+    return len(params)
+
+
+_LINKS_COLS = ["url", "sheet_name", "row_number", "col_number", "address", "gid", "target_sheet_name"]
+
+
+def insert_links_batch(records: List[Dict[str, Any]], conn=None, cursor=None,
+                       chunk: int = _MULTI_INSERT_CHUNK) -> Tuple[int, int]:
+    """
+    Ghi nhiều link (dict url, sheet, row, col, address, gid, sheet_name) vào bảng links
+    bằng multi-row INSERT: cả batch thành một câu `VALUES (...),(...)` mỗi chunk thay vì
+    một round-trip mỗi link. Bảng links không có khoá UNIQUE nên không có dòng "updated".
+    conn / cursor: từ bulk_session() / ingest_session() — khi truyền vào, hàm không tự commit.
+    Trả (inserted, updated).
+    """
+    params = [
+        (
+            rec.get("url") or "",
+            rec.get("sheet") or "",
+            rec.get("row"),
+            rec.get("col"),
+            rec.get("address") or "",
+            rec.get("gid"),
+            rec.get("sheet_name") or "",
+        )
+        for rec in records
+        if rec.get("url")
+    ]
+    if not params:
+        return 0, 0
+    _invalidate_summaries()
+    with _batch_cursor(conn, cursor) as cur:
+        inserted = _multi_insert(cur, f"{LINKS_DB_NAME}.links", _LINKS_COLS, params, chunk=chunk)
+    return inserted, 0
+
+
+# Cột STT của các dòng tiêu đề/trang trí trong sheet hoạt động
+_CTV_SKIP_STT = frozenset({"STT", "***", "DANH SÁCH", "THÀNH ĐOÀN", "BAN CHẤP HÀNH", "ĐẠI HỌC"})
+
+
+def _ctv_record_from_row(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Dòng index (IndexService.build_index) -> record ctv_data, theo cấu trúc
+    [STT, MẢNG HOẠT ĐỘNG, ĐƠN VỊ, TÊN CHƯƠNG TRÌNH]; None với dòng tiêu đề/rỗng.
+    """
+    cols = row.get("cols") or []
+    stt, category, unit, program = (
+        [str(c).strip() if c is not None else "" for c in cols[:4]] + ["", "", "", ""]
+    )[:4]
+    if stt.upper() in _CTV_SKIP_STT or not (category or unit or program):
+        return None
+    text_fixed = row.get("text_fixed") or row.get("text") or ""
+    full_name = unit or category
+    links = row.get("links")
+    return {
+        "sheet": row.get("sheet", ""),
+        "row": row.get("row", 0),
+        "full_name": full_name,  # Tên đơn vị
+        "full_name_normalized": fold_vietnamese(full_name) if full_name else "",
+        "mssv": stt,  # Số thứ tự (thay vì MSSV)
+        "unit": category,  # Mảng hoạt động
+        "program": program,  # Tên chương trình
+        "row_text": text_fixed,
+        "row_text_normalized": row.get("text_fold") or fold_vietnamese(text_fixed),
+        "links": links if isinstance(links, list) else [],
+    }
+
+
+def sync_ctv_data(rows: List[Dict[str, Any]], conn=None, cursor=None,
+                  chunk: int = _MULTI_INSERT_CHUNK) -> int:
+    """
+    Thay dữ liệu ctv_data của các sheet có mặt trong `rows` (dòng index): DELETE theo sheet
+    rồi multi-row INSERT theo chunk. Trả số dòng đã ghi.
+    conn / cursor: từ bulk_session() / ingest_session() — khi truyền vào, hàm không tự commit.
+    """
+    records = [rec for rec in map(_ctv_record_from_row, rows) if rec]
+    if not records:
+        return 0
+    sheets = list(dict.fromkeys(rec["sheet"] for rec in records))
+    with _batch_cursor(conn, cursor, relax_checks=True) as cur:
+        cur.execute(
+            f"DELETE FROM {LINKS_DB_NAME}.ctv_data "
+            f"WHERE sheet_name IN ({', '.join(['%s'] * len(sheets))})",
+            sheets
+        )
+        return insert_ctv_data_batch(records, cursor=cur, chunk=chunk)
+
+
+def bulk_insert_rows(rows: List[Dict[str, Any]], chunk: int = _MULTI_INSERT_CHUNK) -> int:
+    """
+    Nạp toàn bộ dòng index vào ctv_data trong MỘT transaction: xoá dữ liệu cũ của các
+    sheet có mặt rồi multi-row INSERT theo chunk (1 round-trip / chunk, 1 COMMIT).
+    Trả số dòng đã ghi.
+    """
+    return sync_ctv_data(rows, chunk=chunk)
+
+
+def sync_links(links: List[Dict[str, Any]], conn=None, cursor=None,
+               chunk: int = _MULTI_INSERT_CHUNK) -> int:
+    """
+    Thay toàn bộ bảng links bằng `links` (LINK_POOL_LIST): DELETE (không TRUNCATE — TRUNCATE
+    tự commit) rồi insert_links_batch theo chunk, trong cùng transaction. Trả số link đã ghi.
+    conn / cursor: từ bulk_session() / ingest_session() — khi truyền vào, hàm không tự commit.
+    """
+    with _batch_cursor(conn, cursor, relax_checks=True) as cur:
+        cur.execute(f"DELETE FROM {LINKS_DB_NAME}.links")
+        inserted, _ = insert_links_batch(links, cursor=cur, chunk=chunk)
+        return inserted
+
+
+def sync_index(links: List[Dict[str, Any]], rows: List[Dict[str, Any]],
+               chunk: int = _MULTI_INSERT_CHUNK) -> Dict[str, Any]:
+    """
+    Đồng bộ LINK_POOL_LIST + DATABASE_ROWS trong MỘT transaction (một COMMIT).
+    Phần ctv_data là tuỳ chọn: lỗi ở đó chỉ ROLLBACK TO SAVEPOINT, links vẫn được commit.
+    Trả {"links": số link, "ctv_data": số dòng, "ctv_error": lỗi hoặc None}.
+    """
+    result: Dict[str, Any] = {"links": 0, "ctv_data": 0, "ctv_error": None}
+    with ingest_session(relax_checks=True) as (_, cursor):
+        result["links"] = sync_links(links, cursor=cursor, chunk=chunk)
+        cursor.execute("SAVEPOINT sync_ctv")
+        try:
+            result["ctv_data"] = sync_ctv_data(rows, cursor=cursor, chunk=chunk)
+        except MySQLError as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT sync_ctv")
+            result["ctv_error"] = str(e)
+    return result
+
+
+def insert_parsed_rows_multi(
+    pending_rows: List[Tuple[str, Dict[str, Any]]],
+    conn=None,
+    cursor=None
+) -> int:
+    """
+    Ghi parsed_rows của nhiều URL trong MỘT transaction (multi-row INSERT).
+    pending_rows: [(url, {"row_number", "values", "text", "normalized"}), ...]
+    Các dòng cũ của những URL có mặt trong batch sẽ bị thay thế.
+    conn / cursor: từ bulk_session() / ingest_session() — khi truyền vào, hàm không tự commit.
+    """
+    if not pending_rows:
+        return 0
+
+    if cursor is None:
+        with _batch_cursor(conn, relax_checks=True) as own_cursor:
+            return insert_parsed_rows_multi(pending_rows, cursor=own_cursor)
+
+    urls = list(dict.fromkeys(url for url, _ in pending_rows))
+    params = [
+        (
+            url,
+            row.get("row_number"),
+            _json_dumps(row.get("values") or []),
+            row.get("text"),
+            row.get("normalized") or fold_vietnamese(row.get("text") or ""),
+        )
+        for url, row in pending_rows
+    ]
+
+    _invalidate_summaries()
+    placeholders = ", ".join(["%s"] * len(urls))
+    cursor.execute(
+        f"DELETE FROM {CONTENT_DB_NAME}.parsed_rows WHERE url IN ({placeholders})",
+        urls
+    )
+    _multi_insert(
+        cursor,
+        f"{CONTENT_DB_NAME}.parsed_rows",
+        ["url", "row_number", "row_data", "row_text", "normalized_text"],
+        params
+    )
+
+    return len(params)
+
+
+def upsert_fetched_content(
+    url: str,
+    raw_content: Optional[str],
+    normalized_content: Optional[str],
+    content_type: str = "text/csv",
+    gid: Optional[str] = None,
+    row_count: int = 0,
+    status: str = "ok",
+    error_message: Optional[str] = None,
+    conn=None,
+    cursor=None
+) -> None:
+    """Ghi/cập nhật fetched_content của một URL (url là UNIQUE)."""
+    _invalidate_summaries()
+    with _batch_cursor(conn, cursor) as cur:
+        cur.execute(
+            f"""
+            INSERT INTO {CONTENT_DB_NAME}.fetched_content
+            (url, gid, content_type, raw_content, normalized_content, row_count, status, error_message)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                gid = VALUES(gid),
+                content_type = VALUES(content_type),
+                raw_content = VALUES(raw_content),
+                normalized_content = VALUES(normalized_content),
+                row_count = VALUES(row_count),
+                status = VALUES(status),
+                error_message = VALUES(error_message),
+                fetched_at = CURRENT_TIMESTAMP
+            """,
+            (url, gid, content_type, raw_content, normalized_content, row_count, status, error_message)
+        )
+
+
+def insert_parsed_rows_batch(url: str, rows_data: List[Dict[str, Any]], conn=None, cursor=None) -> int:
+    """parsed_rows của MỘT URL (thay các dòng cũ) — bản một-URL của insert_parsed_rows_multi."""
+    return insert_parsed_rows_multi([(url, row) for row in rows_data], conn=conn, cursor=cursor)
+
+
+def upsert_content_with_rows(
+    url: str,
+    raw_content: Optional[str],
+    normalized_content: Optional[str],
+    rows_data: Optional[List[Dict[str, Any]]] = None,
+    content_type: str = "text/csv",
+    gid: Optional[str] = None,
+    row_count: int = 0,
+    status: str = "ok",
+    error_message: Optional[str] = None
+) -> int:
+    """
+    upsert_fetched_content + thay parsed_rows của URL trong MỘT transaction trên một
+    connection (một COMMIT thay vì hai, không có lúc fetched_content mới mà parsed_rows cũ).
+    Trả số parsed_rows đã ghi.
+    """
+    with ingest_session() as (_, cur):
+        upsert_fetched_content(
+            url, raw_content, normalized_content, content_type=content_type, gid=gid,
+            row_count=row_count, status=status, error_message=error_message, cursor=cur
+        )
+        return insert_parsed_rows_batch(url, rows_data, cursor=cur) if rows_data else 0
+
+
+def ingest_urls_concurrent(
+    jobs: Iterable[Tuple[str, Dict[str, Any], List[Dict[str, Any]]]],
+    workers: int = 8
+) -> Dict[str, Any]:
+    """
+    Ghi nhiều URL song song: mỗi job (url, fetched_content_kwargs, rows_data) chạy
+    upsert_content_with_rows trên connection pool riêng của nó (một transaction).
+    Số worker bị chặn ở pool_size - 2 để chừa connection cho web.
+    """
+    workers = max(1, min(workers, int(MYSQL_CONFIG.get("pool_size", 8)) - 2))
+
+    def _one(url: str, fetched: Dict[str, Any], rows_data: List[Dict[str, Any]]) -> int:
+        return upsert_content_with_rows(url=url, rows_data=rows_data, **fetched)
+
+    result: Dict[str, Any] = {"urls": 0, "rows": 0, "errors": []}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_one, url, fetched, rows): url for url, fetched, rows in jobs}
+        for fut in as_completed(futures):
+            try:
+                result["rows"] += fut.result()
+                result["urls"] += 1
             except Exception as e:
-                print(f"[batch_insert] Error processing record {rec.get('full_name')}: {e}")
-                continue
-        
-        cursor.close()
-    
-    return inserted
+                result["errors"].append({"url": futures[fut], "error": str(e)})
+    return result
+
+
+def log_search_queries_many(entries: List[Tuple[str, str, int, int, float]]) -> int:
+    """
+    Ghi log nhiều search query một lần (executemany).
+    entries: [(query, normalized_query, result_count, execution_time_ms, searched_at_epoch), ...]
+    """
+    if not entries:
+        return 0
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(
+                f"""
+                INSERT INTO {CONTENT_DB_NAME}.search_queries
+                (query, normalized_query, result_count, execution_time_ms, searched_at)
+                VALUES (%s, %s, %s, %s, FROM_UNIXTIME(%s))
+                """,
+                entries
+            )
+            conn.commit()
+        finally:
+            cursor.close()
+
+    return len(entries)
 
 
 # =========================
 # Statistics
 # =========================
 
-def get_stats() -> Dict[str, Any]:
-    """Lấy thống kê tổng quan."""
-    with get_db_connection() as conn:
+# get_stats là số liệu tổng quan (không phải nguồn chính xác): COUNT(*) trên InnoDB quét
+# cả clustered index nên kết quả được giữ _STATS_TTL giây
+_STATS_TTL = 60
+_stats_cache: Dict[str, Any] = {"t": 0.0, "data": None}
+# Bốn số đếm trong MỘT round-trip (subquery vô hướng)
+_STATS_COUNTS_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM student) AS students,
+        (SELECT COUNT(*) FROM link) AS links,
+        (SELECT COUNT(*) FROM student_link) AS connections,
+        (SELECT COUNT(DISTINCT student_id) FROM student_link) AS students_with_links
+"""
+# Top students by link count: cột link_count có index -> đọc 10 dòng cuối index
+# thay vì GROUP BY cả student_link
+_TOP_STUDENTS_SQL = """
+    SELECT full_name, mssv, link_count
+    FROM student
+    WHERE link_count > 0
+    ORDER BY link_count DESC
+    LIMIT 10
+"""
+
+
+def get_stats(fresh: bool = False) -> Dict[str, Any]:
+    """Lấy thống kê tổng quan (cache 60s; fresh=True để đọc lại ngay)."""
+    if not fresh and _stats_cache["data"] and time.time() - _stats_cache["t"] < _STATS_TTL:
+        return _stats_cache["data"]
+    with get_db_connection_ro() as conn:
         cursor = conn.cursor(dictionary=True)
         
-        stats = {}
-        
-        # Student count
-        cursor.execute("SELECT COUNT(*) as count FROM student")
-        stats["students"] = cursor.fetchone()["count"]
-        
-        # Link count
-        cursor.execute("SELECT COUNT(*) as count FROM link")
-        stats["links"] = cursor.fetchone()["count"]
+        # Bốn số đếm trong MỘT round-trip (subquery vô hướng)
+        cursor.execute(_STATS_COUNTS_SQL)
+        stats = dict(cursor.fetchone())
         
-        # Student-Link connections
-        cursor.execute("SELECT COUNT(*) as count FROM student_link")
-        stats["connections"] = cursor.fetchone()["count"]
-        
-        # Students with links
-        cursor.execute("""
-            SELECT COUNT(DISTINCT student_id) as count 
-            FROM student_link
-        """)
-        stats["students_with_links"] = cursor.fetchone()["count"]
-        
-        # Top students by link count
-        cursor.execute("""
-            SELECT s.full_name, s.mssv, COUNT(*) as link_count
-            FROM student s
-            JOIN student_link sl ON s.student_id = sl.student_id
-            GROUP BY s.student_id, s.full_name, s.mssv
-            ORDER BY link_count DESC
-            LIMIT 10
-        """)
+        cursor.execute(_TOP_STUDENTS_SQL)
         stats["top_students"] = cursor.fetchall()
         
         cursor.close()
-        return stats
+    _stats_cache["data"], _stats_cache["t"] = stats, time.time()
+    return stats
 
 
 # =========================
 # Schema Init
 # =========================
 
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
+_SQL_LINE_COMMENT_RE = re.compile(r"--[^\n]*")
+
+
+def _split_sql(script: str) -> List[str]:
+    """Tách script (không có DELIMITER/string chứa ';') thành từng câu lệnh."""
+    body = _SQL_LINE_COMMENT_RE.sub("", script)
+    return [stmt.strip() for stmt in body.split(";") if stmt.strip()]
+
+
+def _execute_script(cursor, script: str):
+    """
+    Chạy nhiều câu lệnh trong MỘT round-trip (multi-statement); connector không hỗ trợ
+    tham số multi thì chạy từng câu. Trả "multi" hoặc số câu đã chạy.
+    """
+    try:
+        for result in cursor.execute(script, multi=True):
+            if result.with_rows:
+                result.fetchall()
+        return "multi"
+    except TypeError:  # mysql-connector bản mới bỏ tham số multi
+        statements = _split_sql(script)
+        for stmt in statements:
+            cursor.execute(stmt)
+            if cursor.with_rows:
+                cursor.fetchall()
+        return len(statements)
+
+
 def init_schema() -> Dict[str, Any]:
     """Tạo schema nếu chưa có."""
     try:
         # Connect without database first
-        config = MYSQL_CONFIG.copy()
-        config.pop("database", None)
-        
-        conn = mysql.connector.connect(**config)
+        conn = mysql.connector.connect(**_direct_config(with_database=False))
         cursor = conn.cursor()
         
-        # Create database if not exists
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
-        cursor.execute(f"USE {DB_NAME}")
-        
-        # Student table
-        cursor.execute("""
+        # Toàn bộ DDL gửi trong MỘT round-trip: tạo DB, USE, rồi ba bảng
+        _execute_script(cursor, f"""
+            CREATE DATABASE IF NOT EXISTS {DB_NAME} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
+            USE {DB_NAME};
+            
             CREATE TABLE IF NOT EXISTS student (
                 student_id BIGINT PRIMARY KEY AUTO_INCREMENT,
                 full_name VARCHAR(255) NOT NULL,
@@ -587,15 +1866,15 @@ def init_schema() -> Dict[str, Any]:
                 search_name VARCHAR(255) GENERATED ALWAYS AS (
                     LOWER(REPLACE(REPLACE(full_name, ' ', ''), '-', ''))
                 ) STORED,
+                link_count INT NOT NULL DEFAULT 0,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 UNIQUE KEY uq_student_name (full_name),
                 KEY idx_mssv (mssv),
-                KEY idx_search_name (search_name)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        """)
-        
-        # Link table
-        cursor.execute("""
+                KEY idx_search_name (search_name),
+                KEY idx_link_count (link_count),
+                FULLTEXT KEY ft_student (full_name, mssv, search_name)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+            
             CREATE TABLE IF NOT EXISTS link (
                 link_id BIGINT PRIMARY KEY AUTO_INCREMENT,
                 url TEXT NOT NULL,
@@ -607,11 +1886,8 @@ def init_schema() -> Dict[str, Any]:
                 UNIQUE KEY uq_link_hash (url_hash),
                 KEY idx_kind (kind),
                 KEY idx_gid (gid)
-            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-        """)
-        
-        # Student-Link junction table
-        cursor.execute("""
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+            
             CREATE TABLE IF NOT EXISTS student_link (
                 student_id BIGINT NOT NULL,
                 link_id BIGINT NOT NULL,
@@ -629,6 +1905,28 @@ def init_schema() -> Dict[str, Any]:
                 KEY idx_row (row_number)
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
         """)
+        # Bảng tạo từ schema cũ chưa có FULLTEXT (chạy riêng: lỗi 1061 là bình thường,
+        # đặt trong multi-statement sẽ cắt ngang các câu phía sau)
+        try:
+            cursor.execute("ALTER TABLE student ADD FULLTEXT KEY ft_student (full_name, mssv, search_name)")
+        except MySQLError as err:
+            if getattr(err, "errno", None) != 1061:  # Duplicate key name -> đã có
+                raise
+        # Bảng tạo từ schema cũ chưa có link_count: thêm cột + index rồi tính lại một lần
+        try:
+            cursor.execute(
+                "ALTER TABLE student ADD COLUMN link_count INT NOT NULL DEFAULT 0, "
+                "ADD KEY idx_link_count (link_count)"
+            )
+            cursor.execute("""
+                UPDATE student s
+                JOIN (SELECT student_id, COUNT(*) AS c FROM student_link GROUP BY student_id) x
+                  ON x.student_id = s.student_id
+                SET s.link_count = x.c
+            """)
+        except MySQLError as err:
+            if getattr(err, "errno", None) != 1060:  # Duplicate column name -> đã có
+                raise
         
         conn.commit()
         cursor.close()
@@ -640,6 +1938,54 @@ def init_schema() -> Dict[str, Any]:
         return {"ok": False, "error": str(e)}
 
 
+def _migrate_ctv_ngram_index(cursor) -> bool:
+    """
+    ctv_data tạo từ schema cũ có idx_ctv_search_normalized (parser mặc định): thay bằng
+    idx_ctv_search_ngram trong MỘT ALTER. Trả True nếu đã chuyển.
+    """
+    cursor.execute(
+        "SELECT INDEX_NAME FROM information_schema.statistics "
+        "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'ctv_data' "
+        "AND INDEX_NAME IN ('idx_ctv_search_normalized', 'idx_ctv_search_ngram')",
+        (LINKS_DB_NAME,)
+    )
+    names = {row[0] for row in cursor.fetchall()}
+    if "idx_ctv_search_ngram" in names:
+        return False
+    drop = "DROP INDEX idx_ctv_search_normalized, " if "idx_ctv_search_normalized" in names else ""
+    cursor.execute(
+        f"ALTER TABLE {LINKS_DB_NAME}.ctv_data {drop}"
+        "ADD FULLTEXT idx_ctv_search_ngram (full_name_normalized, row_text_normalized) WITH PARSER ngram"
+    )
+    return True
+
+
+def init_databases(schema_file: str = SCHEMA_FILE) -> Dict[str, Any]:
+    """
+    Tạo ctv_links_db / ctv_content_db từ schema.sql ngay trong process
+    (không gọi mysql CLI, không đưa password lên argv). Chạy cả script bằng
+    multi-statement trên một connection; connector không hỗ trợ multi thì chạy từng câu.
+    """
+    try:
+        with open(schema_file, encoding="utf-8") as f:
+            script = f.read()
+
+        conn = mysql.connector.connect(**_direct_config(with_database=False))
+        cursor = conn.cursor()
+        try:
+            executed = _execute_script(cursor, script)
+            _migrate_ctv_ngram_index(cursor)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+        return {"ok": True, "schema_file": schema_file, "statements": executed,
+                "databases": [LINKS_DB_NAME, CONTENT_DB_NAME]}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+
 if __name__ == "__main__":
     print("=" * 60)
     print("CTV Links Query System - Database Module")
@@ -1,11 +1,12 @@
 """
 Refactored main application with Swagger/OpenAPI documentation.
 """
+import asyncio
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import Response
 
 from backend.routers import search_router, mysql_router, links_router, admin_router
 from backend.config import USE_DEEP, HAS_GSPREAD
@@ -100,19 +101,26 @@ if FRONTEND_DIST.exists():
     # Mount static assets
     app.mount("/assets", StaticFiles(directory=str(FRONTEND_DIST / "assets")), name="assets")
     
+    _RESERVED_PATHS = frozenset(("docs", "redoc", "openapi.json"))
+    _INDEX_FILE = FRONTEND_DIST / "index.html"
+    _index_html = None  # bytes của index.html, đọc một lần khi có request đầu tiên
+    
     # Serve index.html for all non-API routes (SPA routing)
     @app.get("/{full_path:path}")
     async def serve_frontend(full_path: str):
         """Serve frontend for SPA routing."""
+        global _index_html
         # Skip API routes
-        if full_path.startswith("api/") or full_path in ["docs", "redoc", "openapi.json"]:
+        if full_path.startswith("api/") or full_path in _RESERVED_PATHS:
             return {"error": "Not found"}
         
-        # Serve index.html for all other routes
-        index_file = FRONTEND_DIST / "index.html"
-        if index_file.exists():
-            return FileResponse(index_file)
-        return {"error": "Frontend not built"}
+        # Serve index.html for all other routes (từ bộ nhớ, không stat/open file mỗi request)
+        if _index_html is None:
+            try:
+                _index_html = _INDEX_FILE.read_bytes()
+            except OSError:
+                return {"error": "Frontend not built"}
+        return Response(content=_index_html, media_type="text/html")
 
 # ============= Root Endpoint =============
 @app.get(
@@ -149,18 +157,51 @@ async def root():
 @app.on_event("startup")
 async def startup_event():
     """Initialize on startup."""
-    from backend.config import DATABASE_ROWS, SHEETS, debug_log as _dlog
+    from backend.config import DATABASE_ROWS, SHEETS, HAS_MYSQL, db_mysql, debug_log as _dlog
+    from backend.services.health_snapshot import health_snapshot
     from backend.services.index_service import IndexService
     
+    # Mở sẵn pool aiomysql cho các endpoint /api/mysql (bỏ qua nếu chưa cài aiomysql)
+    from backend import db_async
+    if db_async.HAS_AIOMYSQL:
+        try:
+            await db_async.get_pool()
+        except Exception as e:
+            _dlog(f"[startup] aiomysql pool init failed: {e}")
+    
+    # Gom các lần POST /api/links thành multi-row INSERT
+    if HAS_MYSQL:
+        from backend.services.link_writer import link_write_buffer
+        link_write_buffer.start()
+    
     _dlog("[startup] Building initial index...")
     
     try:
-        rows, sheets = IndexService.build_index(verbose=False, deep=USE_DEEP)
-        DATABASE_ROWS.extend(rows)
-        SHEETS.extend(sheets)
+        built = IndexService.build_index(verbose=False, deep=USE_DEEP)
+        IndexService.apply(built)
+        rows = built.rows
         _dlog(f"[startup] Index ready: {len(DATABASE_ROWS)} rows, {len(SHEETS)} sheets")
+        health_snapshot.refresh()
     except Exception as e:
         _dlog(f"[startup] Index build failed: {e}")
+        return
+    
+    # Nạp index vào MySQL một lần (1 transaction, multi-row INSERT theo chunk)
+    if HAS_MYSQL and rows:
+        try:
+            written = await asyncio.to_thread(db_mysql.bulk_insert_rows, rows, 1000)
+            _dlog(f"[startup] Bulk-inserted {written} rows into MySQL")
+        except Exception as e:
+            _dlog(f"[startup] MySQL bulk insert failed: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush pending link writes and close the async MySQL pool."""
+    from backend import db_async
+    from backend.services.link_writer import link_write_buffer
+    await link_write_buffer.stop()
+    await db_async.close_pool()
 
 
 if __name__ == "__main__":
@@ -1,37 +1,48 @@
 import time
 from fastapi import Request, HTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
-from collections import defaultdict
+from collections import deque
+from cachetools import TTLCache
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, max_requests: int = 60, window_seconds: int = 60):
+    def __init__(self, app, max_requests: int = 60, window_seconds: int = 60,
+                 max_clients: int = 100_000):
         super().__init__(app)
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.clients = defaultdict(list)
+        # client -> bounded deque of request timestamps (oldest on the left).
+        # TTLCache evicts clients idle for two windows and caps the table at max_clients
+        # (LRU), so neither idle nor spoofed IPs accumulate and no sweeper task is needed.
+        self.clients = TTLCache(maxsize=max_clients, ttl=window_seconds * 2)
 
     async def dispatch(self, request: Request, call_next):
         # Identify client by IP (prioritize X-Forwarded-For for proxies/testing)
         forwarded = request.headers.get("X-Forwarded-For")
         if forwarded:
-            client_ip = forwarded.split(",")[0].strip()
+            client_ip = forwarded.partition(",")[0].strip()  # first hop, no list allocation
         else:
             client_ip = request.client.host if request.client else "unknown"
-        
+
         # Current time
         now = time.time()
-        
-        # Clean up old requests
-        request_times = self.clients[client_ip]
-        self.clients[client_ip] = [t for t in request_times if now - t < self.window_seconds]
-        
+
+        request_times = self.clients.get(client_ip)
+        if request_times is None:
+            request_times = deque(maxlen=self.max_requests)
+
+        # Drop requests that fell out of the window (amortized O(1), no list rebuild)
+        cutoff = now - self.window_seconds
+        while request_times and request_times[0] <= cutoff:
+            request_times.popleft()
+
         # Check limit
-        if len(self.clients[client_ip]) >= self.max_requests:
+        if len(request_times) >= self.max_requests:
             return await self._error_response()
 
-        # Add new request
-        self.clients[client_ip].append(now)
-        
+        # Add new request; re-setting the key refreshes its TTL
+        request_times.append(now)
+        self.clients[client_ip] = request_times
+
         response = await call_next(request)
         return response
 
@@ -91,6 +91,7 @@ class LinksIndexResponse(BaseModel):
     urls: int
     links: List[LinkRecord]
     limit: int
+    next_cursor: Optional[str] = None  # pass as cursor for the next page; None = last page
 
 
 # ============= Health & Stats Models =============
@@ -127,6 +128,13 @@ class RebuildResponse(BaseModel):
     unique_urls: int
     duration_seconds: float
     stats: List[BuildStats]
+    skipped: bool = False  # incremental rebuild: spreadsheet unchanged, index kept
+
+
+class RebuildJobResponse(BaseModel):
+    """Rebuild job handle (progress: GET /api/admin/rebuild/progress/{job_id})."""
+    job_id: str
+    status: str
 
 
 # ============= Preview Models =============
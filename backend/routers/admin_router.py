@@ -1,25 +1,25 @@
 """Admin router - endpoints for system management."""
-import time
-from fastapi import APIRouter, Query
+import asyncio
+from fastapi import APIRouter, Query, Path, Request, HTTPException
+from fastapi.responses import Response, StreamingResponse
 from typing import Optional, List
 
 from backend.config import (
     DATABASE_ROWS,
-    SHEETS,
-    LINK_POOL,
     LINK_POOL_LIST,
     STATS,
     HAS_MYSQL,
-    HAS_GSPREAD,
-    HAS_GOOGLE_API,
-    USE_DEEP
+    JSON_RESPONSE_CLASS
 )
-from backend.models import HealthResponse, RebuildResponse, BuildStats
-from backend.services.index_service import IndexService
+from backend.models import HealthResponse, RebuildJobResponse
+from backend.services.health_snapshot import health_snapshot
+from backend.services.rebuild_jobs import rebuild_jobs, format_sse
 from backend.services.student_extractor import StudentExtractor
 from backend.services.link_extractor import LinkExtractor
 
-router = APIRouter(prefix="/api/admin", tags=["Admin"])
+router = APIRouter(prefix="/api/admin", tags=["Admin"], default_response_class=JSON_RESPONSE_CLASS)
+
+_SSE_KEEPALIVE_SECONDS = 15
 
 
 @router.get(
@@ -28,66 +28,77 @@ router = APIRouter(prefix="/api/admin", tags=["Admin"])
     summary="Kiểm tra trạng thái hệ thống",
     description="Trả về thông tin về database, links, và các services có sẵn"
 )
-async def health():
-    """Health check endpoint."""
-    return HealthResponse(
-        status="ok",
-        database_rows=len(DATABASE_ROWS),
-        sheets=SHEETS,
-        links={
-            "total": len(LINK_POOL_LIST),
-            "unique_urls": len(LINK_POOL)
-        },
-        mysql_available=HAS_MYSQL,
-        gspread_available=HAS_GSPREAD,
-        google_api_available=HAS_GOOGLE_API,
-        deep_scan=USE_DEEP
-    )
+async def health(request: Request):
+    """Health check endpoint (pre-serialized snapshot, supports If-None-Match)."""
+    body, etag = health_snapshot.current()
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @router.post(
     "/rebuild",
-    response_model=RebuildResponse,
+    response_model=RebuildJobResponse,
     summary="Rebuild index từ Google Sheets",
     description="""
-    Đọc lại dữ liệu từ Google Sheets và rebuild index.
+    Đọc lại dữ liệu từ Google Sheets và rebuild index (chạy nền).
+    
+    Trả về job_id ngay; theo dõi tiến độ qua GET /api/admin/rebuild/progress/{job_id} (SSE).
+    Nếu đang có job chạy thì trả về job đó.
     
     Options:
     - verbose: Enable chi tiết logging
     - deep: Enable deep scan để tìm rich-text links qua Sheets API
+    - incremental: Bỏ qua nếu spreadsheet chưa đổi từ lần build trước (Drive modifiedTime)
     """
 )
 async def rebuild_index(
     verbose: bool = Query(False, description="Enable verbose logging"),
-    deep: bool = Query(False, description="Enable deep scan for rich-text links")
+    deep: bool = Query(False, description="Enable deep scan for rich-text links"),
+    incremental: bool = Query(True, description="Skip the rebuild if the spreadsheet is unchanged since the last build")
 ):
-    """Rebuild the search index."""
-    start = time.time()
-    
-    # Clear existing data
-    DATABASE_ROWS.clear()
-    SHEETS.clear()
-    
-    # Build index
-    rows, sheets = IndexService.build_index(verbose=verbose, deep=deep)
-    
-    # Update globals
-    DATABASE_ROWS.extend(rows)
-    SHEETS.extend(sheets)
-    
-    duration = time.time() - start
+    """Start a background rebuild of the search index."""
+    job = rebuild_jobs.start(verbose=verbose, deep=deep, incremental=incremental)
+    return RebuildJobResponse(job_id=job.job_id, status=job.status)
+
+
+@router.get(
+    "/rebuild/progress/{job_id}",
+    summary="Theo dõi tiến độ rebuild (Server-Sent Events)",
+    description="""
+    Stream text/event-stream:
+    - event: sheet — per-sheet stats ngay khi sheet đó index xong
+    - event: done — kết quả cuối (như RebuildResponse)
+    - event: error — build thất bại
+    """
+)
+async def rebuild_progress(request: Request, job_id: str = Path(..., description="job_id từ POST /rebuild")):
+    """Stream a rebuild job's progress as Server-Sent Events."""
+    job = rebuild_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Rebuild job not found")
     
-    # Build stats
-    stats = [BuildStats(**s) for s in STATS.get("per_sheet", [])]
+    async def event_stream():
+        queue = job.subscribe()
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), _SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"  # sheets can take minutes; keep proxies from closing
+                    continue
+                yield format_sse(item)
+                if item["event"] in ("done", "error"):
+                    return
+        finally:
+            job.unsubscribe(queue)
     
-    return RebuildResponse(
-        ok=True,
-        indexed_rows=len(DATABASE_ROWS),
-        sheets=SHEETS,
-        total_links=len(LINK_POOL_LIST),
-        unique_urls=len(LINK_POOL),
-        duration_seconds=duration,
-        stats=stats
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
@@ -112,20 +123,19 @@ async def sync_mysql():
     
     if not db_mysql:
         return {"ok": False, "error": "MySQL not available"}
+    if rebuild_jobs.running:
+        # sync_index rewrites the links table from the pools: wait until the rebuilt ones are swapped in
+        return {"ok": False, "error": "Index rebuild in progress, retry when it finishes"}
     
     try:
-        # Sync links
-        db_mysql.sync_links(LINK_POOL_LIST)
-        
-        # Sync CTV data if available
-        try:
-            db_mysql.sync_ctv_data(DATABASE_ROWS)
-        except Exception as e:
-            pass  # CTV sync is optional
+        # Links + CTV data in one transaction, multi-row INSERT per 1000-row chunk
+        # Snapshots taken on the loop: a rebuild swapping the globals can't change them mid-write
+        result = await asyncio.to_thread(db_mysql.sync_index, list(LINK_POOL_LIST), list(DATABASE_ROWS))
         
         return {
             "ok": True,
-            "links_synced": len(LINK_POOL_LIST),
+            "links_synced": result["links"],
+            "ctv_rows_synced": result["ctv_data"],
             "message": "Data synced to MySQL"
         }
     except Exception as e:
@@ -167,7 +177,7 @@ async def extract_students(
     summary="Thống kê MySQL database",
     description="Lấy thống kê về số sinh viên, links, connections trong MySQL"
 )
-async def get_db_stats():
+async def get_db_stats(fresh: bool = Query(False, description="Bỏ qua cache 60s")):
     """Get database statistics."""
     from backend.db_mysql import get_stats, HAS_MYSQL
     
@@ -175,7 +185,7 @@ async def get_db_stats():
         return {"ok": False, "error": "MySQL not available"}
     
     try:
-        stats = get_stats()
+        stats = get_stats(fresh=fresh)
         return {"ok": True, **stats}
     except Exception as e:
         return {"ok": False, "error": str(e)}
@@ -236,7 +246,7 @@ async def process_linked_sheets(
     if sheet_names:
         sheets_list = [s.strip() for s in sheet_names.split(",")]
     
-    result = LinkExtractor.scan_main_sheet_and_process_links(
+    result = await LinkExtractor.scan_main_sheet_and_process_links(
         spreadsheet_id=spreadsheet_id,
         sheet_names=sheets_list,
         dry_run=dry_run,
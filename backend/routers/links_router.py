@@ -2,21 +2,36 @@
 from typing import Optional
 from fastapi import APIRouter, Query, HTTPException
 
-from backend.config import LINK_POOL, LINK_POOL_LIST, db_mysql, debug_log as _dlog
+from backend.config import JSON_RESPONSE_CLASS, LINK_POOL, LINK_POOL_LIST, db_mysql, debug_log as _dlog
 from backend.models import AddLinkRequest, AddLinkResponse, LinkRecord, LinksIndexResponse
+from backend.services.health_snapshot import health_snapshot
+from backend.services.index_service import IndexService
+from backend.services.link_writer import link_write_buffer
 from backend.utils.url_helpers import extract_gid_from_url
 
-router = APIRouter(prefix="/api/links", tags=["Links"])
+router = APIRouter(prefix="/api/links", tags=["Links"], default_response_class=JSON_RESPONSE_CLASS)
 
 
-def _a1_addr(row: int, col: int) -> str:
-    """Convert row/col to A1 notation."""
-    COL_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+COL_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def _col_label(col: int) -> str:
+    """Column number to letters (1 → A, 27 → AA)."""
     c = col
     label = ""
     while c:
         c, rem = divmod(c - 1, 26)
         label = COL_LETTERS[rem] + label
+    return label
+
+
+# Precomputed labels for columns 1..16384 (A..XFD, the spreadsheet column limit)
+_COL_LABELS = tuple(_col_label(i) for i in range(1, 16385))
+
+
+def _a1_addr(row: int, col: int) -> str:
+    """Convert row/col to A1 notation."""
+    label = _COL_LABELS[col - 1] if 0 < col <= len(_COL_LABELS) else _col_label(col)
     return f"{label}{row}"
 
 
@@ -29,7 +44,7 @@ def _a1_addr(row: int, col: int) -> str:
     
     Link sẽ được:
     - Thêm vào LINK_POOL và LINK_POOL_LIST trong memory
-    - Sync vào MySQL (nếu available)
+    - Sync vào MySQL (nếu available, ghi theo lô mỗi 50ms / 500 links)
     - Có thể tìm kiếm qua /search với follow_links=true
     """
 )
@@ -73,12 +88,16 @@ async def add_link(
             "address": address,
             **({"sheet_gid": gid} if gid else {})
         })
+        health_snapshot.refresh()
         
-        # Sync to MySQL if available
+        # Sync to MySQL if available: queued, flushed in batches by link_write_buffer
         if db_mysql:
             try:
-                db_mysql.insert_links_batch([link_record])
-                _dlog(f"[add_link] Synced to MySQL: {url}")
+                if link_write_buffer.running:
+                    await link_write_buffer.put(link_record)
+                else:
+                    db_mysql.insert_links_batch([link_record])
+                    _dlog(f"[add_link] Synced to MySQL: {url}")
             except Exception as e:
                 _dlog(f"[add_link] MySQL sync failed: {e}")
         
@@ -102,23 +121,44 @@ async def add_link(
         )
 
 
+def _parse_cursor(cursor: str) -> int:
+    """
+    "<generation>.<offset>" -> offset into LINK_POOL_LIST. A rebuild replaces the
+    list, so cursors from an older generation would skip or repeat records: 400.
+    """
+    generation, sep, offset = cursor.partition(".")
+    if not sep or not generation.isdigit() or not offset.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if int(generation) != IndexService.generation:
+        raise HTTPException(status_code=400, detail="Cursor expired: links were re-indexed, restart from the first page")
+    return int(offset)
+
+
 @router.get(
     "",
     response_model=LinksIndexResponse,
     summary="Lấy danh sách links đã index",
-    description="Trả về danh sách tất cả links trong LINK_POOL_LIST"
+    description="Trả về danh sách links trong LINK_POOL_LIST theo trang (cursor = next_cursor của trang trước; "
+                "rebuild index làm cursor cũ hết hạn -> 400)"
 )
 async def get_links(
-    limit: int = Query(100, ge=1, le=10000, description="Số links tối đa")
+    limit: int = Query(100, ge=1, le=10000, description="Số links tối đa"),
+    cursor: Optional[str] = Query(None, description="Cursor: next_cursor của trang trước")
 ):
-    """Get indexed links."""
-    links = LINK_POOL_LIST[:limit] if limit else LINK_POOL_LIST
+    """Get indexed links, one page at a time."""
+    start = _parse_cursor(cursor) if cursor else 0
+    generation = IndexService.generation
+    total = len(LINK_POOL_LIST)
+    end = min(start + limit, total)
+    # Only the requested page is touched; records are trusted internal dicts (no validation)
+    links = [LinkRecord.model_construct(**link) for link in LINK_POOL_LIST[start:end]]
     
-    return LinksIndexResponse(
-        total=len(LINK_POOL_LIST),
+    return LinksIndexResponse.model_construct(
+        total=total,
         urls=len(LINK_POOL),
-        links=[LinkRecord(**link) for link in links],
-        limit=limit
+        links=links,
+        limit=limit,
+        next_cursor=f"{generation}.{end}" if end < total else None
     )
 
 
@@ -2,8 +2,10 @@
 import time
 from typing import List, Optional
 from fastapi import APIRouter, Query, Path, HTTPException
+from starlette.concurrency import run_in_threadpool
 
-from backend.config import db_mysql
+from backend import db_async
+from backend.config import JSON_RESPONSE_CLASS, db_mysql
 from backend.models import MySQLSearchRequest, MySQLSearchResponse, MySQLActivity
 from backend.db_mysql import (
     search_student_links,
@@ -13,7 +15,14 @@ from backend.db_mysql import (
     HAS_MYSQL
 )
 
-router = APIRouter(prefix="/api/mysql", tags=["MySQL"])
+router = APIRouter(prefix="/api/mysql", tags=["MySQL"], default_response_class=JSON_RESPONSE_CLASS)
+
+
+async def _query(async_fn, sync_fn, *args, **kwargs):
+    """Run a read through the aiomysql pool; without aiomysql, fall back to the sync driver on the threadpool."""
+    if db_async.HAS_AIOMYSQL:
+        return await async_fn(*args, **kwargs)
+    return await run_in_threadpool(sync_fn, *args, **kwargs)
 
 
 @router.get(
@@ -25,7 +34,7 @@ router = APIRouter(prefix="/api/mysql", tags=["MySQL"])
     Alias cho /students/search để backward compatibility.
     """
 )
-def mysql_search(
+async def mysql_search(
     q: str = Query(..., description="Search query", example="Nguyễn"),
     limit: int = Query(50, ge=1, le=100, description="Max results")
 ):
@@ -35,7 +44,7 @@ def mysql_search(
     
     try:
         start = time.time()
-        results = search_student_links(q, limit=limit)
+        results = await _query(db_async.search_student_links, search_student_links, q, limit=limit)
         elapsed_ms = (time.time() - start) * 1000
         
         return {
@@ -55,13 +64,13 @@ def mysql_search(
     summary="Thống kê database MySQL",
     description="Lấy thống kê tổng quan về students, links, connections"
 )
-def mysql_stats():
+async def mysql_stats(fresh: bool = Query(False, description="Bỏ qua cache 60s")):
     """Get MySQL database statistics."""
     if not HAS_MYSQL:
         raise HTTPException(status_code=503, detail="MySQL not available")
     
     try:
-        stats = get_stats()
+        stats = await _query(db_async.get_stats, get_stats, fresh=fresh)
         return {
             "ok": True,
             **stats
@@ -81,7 +90,7 @@ def mysql_stats():
     - /api/mysql/students/search?q=2012345
     """
 )
-def search_students(
+async def search_students(
     q: str = Query(..., description="Tên hoặc MSSV sinh viên", example="Nguyễn"),
     limit: int = Query(50, ge=1, le=100, description="Số kết quả tối đa")
 ):
@@ -91,7 +100,7 @@ def search_students(
     
     try:
         start = time.time()
-        results = search_student_links(q, limit=limit)
+        results = await _query(db_async.search_student_links, search_student_links, q, limit=limit)
         elapsed_ms = (time.time() - start) * 1000
         
         return {
@@ -110,7 +119,7 @@ def search_students(
     summary="Quick search sinh viên (chỉ count links)",
     description="Tìm nhanh sinh viên, chỉ trả về thông tin cơ bản + số lượng links"
 )
-def quick_search_students(
+async def quick_search_students(
     q: str = Query(..., description="Tên hoặc MSSV sinh viên", example="Trần"),
     limit: int = Query(20, ge=1, le=50, description="Số kết quả tối đa")
 ):
@@ -120,7 +129,7 @@ def quick_search_students(
     
     try:
         start = time.time()
-        results = quick_search(q, limit=limit)
+        results = await _query(db_async.quick_search, quick_search, q, limit=limit)
         elapsed_ms = (time.time() - start) * 1000
         
         return {
@@ -139,7 +148,7 @@ def quick_search_students(
     summary="Lấy thông tin sinh viên theo MSSV (exact)",
     description="Lấy tất cả links của sinh viên theo MSSV (exact match)"
 )
-def get_student_by_mssv(
+async def get_student_by_mssv(
     mssv: str = Path(..., description="MSSV của sinh viên", example="2012345")
 ):
     """Get student by exact MSSV."""
@@ -147,7 +156,7 @@ def get_student_by_mssv(
         raise HTTPException(status_code=503, detail="MySQL not available")
     
     try:
-        result = get_student_links_by_mssv(mssv)
+        result = await _query(db_async.get_student_links_by_mssv, get_student_links_by_mssv, mssv)
         
         if not result:
             raise HTTPException(status_code=404, detail=f"Student with MSSV {mssv} not found")
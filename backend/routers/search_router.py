@@ -3,13 +3,14 @@ import time
 from typing import List, Optional
 from fastapi import APIRouter, Query, HTTPException
 
+from backend.config import JSON_RESPONSE_CLASS
 from backend.models import SearchResponse, SearchResult
 try:
     from backend import db_mysql
 except ImportError:
     import db_mysql
 
-router = APIRouter(prefix="/api/search", tags=["Search"])
+router = APIRouter(prefix="/api/search", tags=["Search"], default_response_class=JSON_RESPONSE_CLASS)
 
 
 @router.get(
@@ -39,9 +40,8 @@ def search(
     start_time = time.time()
     
     try:
-        # Search via DB
-        # returns list of students with their links
-        students = db_mysql.search_student_links(query, limit=top_k)
+        # Search via DB: at most top_k flat (student x link) rows, LIMIT applied in SQL
+        rows = db_mysql.search_student_link_rows(query, limit=top_k)
     except Exception as e:
         print(f"[Search Microservice] DB Error: {e}")
         # Fail gracefully or return empty
@@ -52,16 +52,17 @@ def search(
             execution_time=time.time() - start_time
         )
 
+    # DB rows are trusted shapes: model_construct skips Pydantic validation per result
     results: List[SearchResult] = []
     
-    for student in students:
-        full_name = student.get("full_name", "Unknown")
-        mssv = student.get("mssv", "")
-        student_links = student.get("links", [])
+    for row in rows:
+        full_name = row["full_name"]
+        res_url = row["url"]
         
-        if not student_links:
+        if res_url is None:
             # Entry for student without links
-            results.append(SearchResult(
+            mssv = row["mssv"]
+            results.append(SearchResult.model_construct(
                 sheet="Student Info",
                 row=0,
                 snippet=f"{full_name} ({mssv})" if mssv else full_name,
@@ -71,29 +72,21 @@ def search(
                 url=None
             ))
         else:
-            # Flatten links
-            for link in student_links:
-                res_url = link.get("url")
-                res_snippet = link.get("snippet") or f"{full_name} - {link.get('title') or 'Link'}"
-                
-                results.append(SearchResult(
-                    sheet=link.get("sheet_name") or "Unknown",
-                    row=link.get("row_number") or 0,
-                    snippet=res_snippet,
-                    snippet_nodau=None,
-                    links=[res_url] if res_url else [],
-                    score=100,
-                    url=res_url
-                ))
-    
-    # Slice to top_k matching the request
-    filtered_results = results[:top_k]
+            results.append(SearchResult.model_construct(
+                sheet=row["sheet_name"] or "Unknown",
+                row=row["row_number"] or 0,
+                snippet=row["snippet"] or f"{full_name} - {row['title'] or 'Link'}",
+                snippet_nodau=None,
+                links=[res_url],
+                score=100,
+                url=res_url
+            ))
     
     elapsed = time.time() - start_time
     
-    return SearchResponse(
-        results=filtered_results,
-        count=len(filtered_results),
+    return SearchResponse.model_construct(
+        results=results,
+        count=len(results),
         query=query,
         execution_time=elapsed
     )
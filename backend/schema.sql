@@ -52,7 +52,9 @@ CREATE TABLE IF NOT EXISTS ctv_data (
     FULLTEXT idx_row_text (row_text),
     FULLTEXT idx_row_text_normalized (row_text_normalized),
     FULLTEXT idx_full_name_fulltext (full_name),
-    FULLTEXT idx_full_name_normalized_fulltext (full_name_normalized)
+    FULLTEXT idx_full_name_normalized_fulltext (full_name_normalized),
+    -- ngram (ngram_token_size=2 mặc định): âm tiết 2 chữ cái (An, Hà, Lê...) vẫn vào index
+    FULLTEXT idx_ctv_search_ngram (full_name_normalized, row_text_normalized) WITH PARSER ngram
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- =====================================================
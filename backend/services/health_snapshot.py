@@ -0,0 +1,61 @@
+"""Health snapshot - /health body serialized once per index mutation."""
+import hashlib
+import threading
+from dataclasses import dataclass, field
+
+from backend.config import (
+    DATABASE_ROWS,
+    SHEETS,
+    LINK_POOL,
+    LINK_POOL_LIST,
+    HAS_MYSQL,
+    HAS_GSPREAD,
+    HAS_GOOGLE_API,
+    USE_DEEP
+)
+from backend.models import HealthResponse
+
+
+@dataclass
+class HealthSnapshot:
+    """
+    Pre-serialized /health response.
+
+    The index globals only change in a few places (startup, rebuild_index, add_link);
+    each calls refresh(), so probes read ready-made bytes plus an ETag instead of
+    re-reading the shared lists and re-encoding JSON on every hit.
+    """
+    bytes_body: bytes = b""
+    etag: str = ""
+    rebuilding: threading.Event = field(default_factory=threading.Event)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def refresh(self) -> None:
+        """Re-read the index counters and re-serialize the body."""
+        payload = HealthResponse(
+            status="rebuilding" if self.rebuilding.is_set() else "ok",
+            database_rows=len(DATABASE_ROWS),
+            sheets=list(SHEETS),
+            links={
+                "total": len(LINK_POOL_LIST),
+                "unique_urls": len(LINK_POOL)
+            },
+            mysql_available=HAS_MYSQL,
+            gspread_available=HAS_GSPREAD,
+            google_api_available=HAS_GOOGLE_API,
+            deep_scan=USE_DEEP
+        )
+        body = payload.model_dump_json().encode()
+        etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        with self._lock:
+            self.bytes_body, self.etag = body, etag
+
+    def current(self) -> tuple[bytes, str]:
+        """(body, etag), serializing on first use."""
+        if not self.bytes_body:
+            self.refresh()
+        with self._lock:
+            return self.bytes_body, self.etag
+
+
+health_snapshot = HealthSnapshot()
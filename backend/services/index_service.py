@@ -1,10 +1,14 @@
 """Index service - business logic for building index."""
+import json
+import os
 import time
-from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
 import re
 
 from backend.config import (
     DEFAULT_SPREADSHEET_ID,
+    INDEX_STATE_FILE,
     DATABASE_ROWS,
     SHEETS,
     LINK_POOL,
@@ -18,9 +22,12 @@ from backend.config import (
 from backend.utils.google_api import (
     get_gspread_client,
     get_sheets_service,
+    get_drive_modified_time,
     deep_scan_all_sheets
 )
 from backend.utils.url_helpers import classify_google_url
+from backend.utils.text_processing import fix_vietnamese_text, fold_vi_fast
+from backend.services.search_service import SearchService
 
 
 COL_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
@@ -38,64 +45,169 @@ def _a1_addr(row: int, col: int) -> str:
 
 def extract_links_from_cell(val: Any, formula: Any) -> List[str]:
     """Extract URLs from cell value and formula (HYPERLINK)."""
-    from backend.utils.url_helpers import URL_RE, clean_urls
-    
     val_s = val if isinstance(val, str) else ("" if val is None else str(val))
     fm_s = formula if isinstance(formula, str) else ("" if formula is None else str(formula))
+    # Fast substring precheck: most cells have no link, skip regex entirely
+    val_has_url = "://" in val_s
+    fm_has_url = "://" in fm_s
+    fm_has_hl = bool(fm_s) and "HYPERLINK" in fm_s.upper()
+    if not (val_has_url or fm_has_url or fm_has_hl):
+        return []
+    
+    from backend.utils.url_helpers import URL_RE, clean_urls
+    
     links: List[str] = []
     
-    if val_s:
+    if val_has_url:
         links += URL_RE.findall(val_s)
     
-    if fm_s:
+    if fm_has_hl:
         m = re.search(r'HYPERLINK\s*\(\s*"([^"]+)"', fm_s, re.IGNORECASE)
         if m:
             u = m.group(1)
             if not u.startswith("http") and ("docs.google.com" in u or "drive.google.com" in u):
                 u = "https://" + u
             links.append(u)
+    
+    if fm_has_url:
         links += URL_RE.findall(fm_s)
     
     return clean_urls(links)
 
 
+def _load_index_state() -> Dict[str, Any]:
+    try:
+        with open(INDEX_STATE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index_state(state: Dict[str, Any]) -> None:
+    tmp = f"{INDEX_STATE_FILE}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, INDEX_STATE_FILE)  # atomic: never leaves a half-written state
+    except OSError as e:
+        _dlog(f"[index] cannot save index state: {e}")
+
+
+@dataclass
+class BuiltIndex:
+    """
+    Result of one build. The link pools are built here, not in the shared globals,
+    so a build running on a worker thread never exposes a half-filled pool.
+    """
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    sheets: List[str] = field(default_factory=list)
+    link_pool: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)  # as LINK_POOL
+    link_list: List[Dict[str, Any]] = field(default_factory=list)  # as LINK_POOL_LIST
+
+
 class IndexService:
     """Service for building and managing search index."""
+
+    # Bumped by every apply(): positions in LINK_POOL_LIST/DATABASE_ROWS are only
+    # meaningful within one generation (e.g. /api/links page cursors)
+    generation: int = 0
+
+    @staticmethod
+    def apply(built: BuiltIndex, links_mark: Optional[int] = None) -> None:
+        """
+        Swap a finished build into the shared index globals (in place).
+
+        Call it on the event loop: it never awaits, so handlers see either the old
+        index or the new one. Links that add_link appended to LINK_POOL_LIST after
+        `links_mark` (its length when the build started) are carried over.
+        """
+        carried = LINK_POOL_LIST[links_mark:] if links_mark is not None else []
+        if carried:
+            seen = {f"{rec['url']}@@{rec['address']}" for rec in built.link_list}
+            for rec in carried:
+                if f"{rec['url']}@@{rec['address']}" in seen:
+                    continue
+                built.link_list.append(rec)
+                built.link_pool.setdefault(rec["url"], []).append({
+                    "sheet": rec["sheet"], "row": rec["row"], "col": rec["col"], "address": rec["address"],
+                    **({"sheet_gid": rec["gid"]} if rec.get("gid") else {})
+                })
+
+        DATABASE_ROWS[:] = built.rows
+        SHEETS[:] = built.sheets
+        LINK_POOL.clear()
+        LINK_POOL.update(built.link_pool)
+        LINK_POOL_LIST[:] = built.link_list
+        IndexService.generation += 1
+        SearchService.invalidate()  # column store is rebuilt lazily by the next search
     
     @staticmethod
-    def build_index(verbose: bool = False, deep: bool = False) -> Tuple[List[Dict[str, Any]], List[str]]:
+    def needs_rebuild(deep: bool = False) -> bool:
+        """
+        True unless the spreadsheet is known unchanged since the last build made with the
+        same `deep` setting. Unknown modifiedTime (no Drive API) always means rebuild.
+        """
+        state = _load_index_state()
+        modified = get_drive_modified_time(DEFAULT_SPREADSHEET_ID)
+        return not (
+            modified
+            and state.get("spreadsheet_id") == DEFAULT_SPREADSHEET_ID
+            and state.get("deep") == deep
+            and state.get("modified_time") == modified
+        )
+
+    @staticmethod
+    def build_incremental(verbose: bool = False, deep: bool = False,
+                          on_sheet: Optional[Callable[[Dict[str, Any]], None]] = None
+                          ) -> Optional[BuiltIndex]:
+        """
+        Rebuild only when the spreadsheet changed since the last build (Drive modifiedTime).
+
+        Returns:
+            None if the current index is still up to date, else the BuiltIndex from build_index
+        """
+        if not IndexService.needs_rebuild(deep):
+            _dlog("[index] spreadsheet unchanged since last build → keeping index")
+            return None
+        return IndexService.build_index(verbose=verbose, deep=deep, on_sheet=on_sheet)
+
+    @staticmethod
+    def build_index(verbose: bool = False, deep: bool = False,
+                    on_sheet: Optional[Callable[[Dict[str, Any]], None]] = None
+                    ) -> BuiltIndex:
         """
         Build index from DEFAULT_SPREADSHEET_ID.
+        Shared globals are left untouched; pass the result to IndexService.apply().
         
         Args:
             verbose: Enable verbose logging
             deep: Enable deep scanning for rich-text links via Sheets API
+            on_sheet: Called with each per-sheet stat as soon as that sheet is indexed
             
         Returns:
-            Tuple of (rows, sheets)
+            BuiltIndex (rows, sheets and the new link pools)
         """
-        rows: List[Dict[str, Any]] = []
-        sheets: List[str] = []
-
-        # Reset link pools
-        LINK_POOL.clear()
-        LINK_POOL_LIST.clear()
+        built = BuiltIndex()
+        rows, sheets = built.rows, built.sheets
+        pool_map, pool_list = built.link_pool, built.link_list
+        # Read before the scan, so edits made while building trigger the next rebuild
+        modified = get_drive_modified_time(DEFAULT_SPREADSHEET_ID) if DEFAULT_SPREADSHEET_ID else None
 
         STATS["per_sheet"] = []
         start_ts = time.time()
 
         if not DEFAULT_SPREADSHEET_ID:
             _dlog("[index] No SPREADSHEET_ID set → empty index.")
-            return rows, sheets
+            return built
         
         if not HAS_GSPREAD:
             _dlog("[index] gspread not available → cannot open spreadsheet.")
-            return rows, sheets
+            return built
 
         client = get_gspread_client()
         if not client:
             _dlog("[index] cannot get gspread client")
-            return rows, sheets
+            return built
 
         try:
             ss = client.open_by_key(DEFAULT_SPREADSHEET_ID)
@@ -103,7 +215,7 @@ class IndexService:
             _dlog(f"[index] Opened spreadsheet with {len(worksheets)} sheets")
         except Exception as e:
             _dlog(f"[index] open spreadsheet failed: {e}")
-            return rows, sheets
+            return built
 
         # Build gid -> sheet_name mapping
         gid_to_name: Dict[str, str] = {}
@@ -127,6 +239,7 @@ class IndexService:
 
         seen_flat_keys: set[str] = set()
         sheet_row_base: Dict[str, int] = {}
+        incomplete = False  # a sheet failed to load: don't mark this build as up to date
 
         for ws in worksheets:
             title = ws.title
@@ -136,6 +249,7 @@ class IndexService:
                 values = ws.get_all_values()
             except Exception as e:
                 _dlog(f"[index] cannot read values: {title}: {e}")
+                incomplete = True
                 continue
 
             nrows = len(values)
@@ -158,8 +272,8 @@ class IndexService:
             value_http_cells = 0
             formula_http_cells = 0
             cell_with_links = 0
-            list_before = len(LINK_POOL_LIST)
-            map_before = len(LINK_POOL)
+            list_before = len(pool_list)
+            map_before = len(pool_map)
 
             if verbose:
                 _dlog(f"[index] Sheet '{title}' size = {nrows}x{ncols}")
@@ -169,17 +283,29 @@ class IndexService:
             sheet_row_base[title] = base_row_index
             for r in range(nrows):
                 row_vals = values[r]
-                if any((cell or "").strip() for cell in row_vals):
+                # any() drops fully empty rows in C; one join+isspace beats per-cell strip
+                if any(row_vals) and not "".join(filter(None, row_vals)).isspace():
+                    text = " ".join(x for x in row_vals if isinstance(x, str))
+                    text_fixed = fix_vietnamese_text(text)
                     rows.append({
                         "sheet": title,
                         "row": r + 1,
                         "cols": row_vals,
-                        "text": " ".join(x for x in row_vals if isinstance(x, str)),
+                        "text": text,
+                        # Normalized once here so search doesn't redo it per query
+                        "text_fixed": text_fixed,
+                        "text_fold": fold_vi_fast(text_fixed),
                         "links": []
                     })
 
-            # Extract links from cells
-            for r in range(nrows):
+            # Extract links from cells. One substring scan over the whole sheet first:
+            # link-free sheets (the common case) skip the per-cell loop entirely.
+            vblob = "\n".join("\t".join(x for x in row if isinstance(x, str)) for row in values)
+            fblob = "\n".join("\t".join(row) for row in formulas)
+            scan_cells = "://" in vblob or "://" in fblob or "HYPERLINK" in fblob.upper()
+            if not scan_cells:
+                non_empty_cells = sum(1 for row in values for v in row if isinstance(v, str) and v.strip())
+            for r in range(nrows if scan_cells else 0):
                 for c in range(ncols):
                     v = values[r][c] if c < len(values[r]) else ""
                     if isinstance(v, str) and v.strip():
@@ -207,13 +333,13 @@ class IndexService:
                             loc["sheet_gid"] = maybe_gid
                             if sheet_name:
                                 loc["sheet_name"] = sheet_name
-                        LINK_POOL.setdefault(u, []).append(loc)
+                        pool_map.setdefault(u, []).append(loc)
 
                         # Add to flat list
                         k = f"{u}@@{a1}"
                         if k not in seen_flat_keys:
                             seen_flat_keys.add(k)
-                            LINK_POOL_LIST.append({
+                            pool_list.append({
                                 "url": u,
                                 "sheet": title,
                                 "row": r + 1,
@@ -246,9 +372,9 @@ class IndexService:
 
                     # Map
                     exists = any(loc.get("sheet") == title and loc.get("address") == a1_deep
-                               for loc in LINK_POOL.get(u, []))
+                               for loc in pool_map.get(u, []))
                     if not exists:
-                        LINK_POOL.setdefault(u, []).append({
+                        pool_map.setdefault(u, []).append({
                             "sheet": title, "row": r1, "col": c1, "address": a1_deep,
                             **({"sheet_gid": maybe_gid2} if maybe_gid2 else {}),
                             **({"sheet_name": sheet_name2} if sheet_name2 else {})
@@ -259,7 +385,7 @@ class IndexService:
                     k2 = f"{u}@@{a1_deep}"
                     if k2 not in seen_flat_keys:
                         seen_flat_keys.add(k2)
-                        LINK_POOL_LIST.append({
+                        pool_list.append({
                             "url": u, "sheet": title, "row": r1, "col": c1, "address": a1_deep,
                             "gid": maybe_gid2, "sheet_name": sheet_name2
                         })
@@ -278,15 +404,17 @@ class IndexService:
                 "value_http_cells": value_http_cells,
                 "formula_http_cells": formula_http_cells,
                 "cells_with_links_extracted": cell_with_links,
-                "added_to_list_flat": len(LINK_POOL_LIST) - list_before,
-                "added_url_keys_map": len(LINK_POOL) - map_before,
+                "added_to_list_flat": len(pool_list) - list_before,
+                "added_url_keys_map": len(pool_map) - map_before,
                 "deep_occurrences_seen": deep_occurs,
                 "deep_added_to_list_flat": deep_added_list,
                 "deep_added_url_keys_map": deep_added_map,
-                "flat_links_total_now": len(LINK_POOL_LIST),
-                "url_keys_total_now": len(LINK_POOL),
+                "flat_links_total_now": len(pool_list),
+                "url_keys_total_now": len(pool_map),
             }
             STATS["per_sheet"].append(sheet_stat)
+            if on_sheet:
+                on_sheet(sheet_stat)
 
             _dlog(
                 f"[index] '{title}': non-empty={non_empty_cells}, "
@@ -294,16 +422,23 @@ class IndexService:
                 f"cells_extracted_links={cell_with_links}, "
                 f"add_flat={sheet_stat['added_to_list_flat']}, add_map_keys={sheet_stat['added_url_keys_map']}, "
                 f"deep_occurs={deep_occurs}, deep_add_flat={deep_added_list}, deep_add_map={deep_added_map}, "
-                f"total_flat={len(LINK_POOL_LIST)}, total_map_keys={len(LINK_POOL)}"
+                f"total_flat={len(pool_list)}, total_map_keys={len(pool_map)}"
             )
 
         STATS["built_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
-        STATS["total_links_flat"] = len(LINK_POOL_LIST)
-        STATS["total_links_map_keys"] = len(LINK_POOL)
+        STATS["total_links_flat"] = len(pool_list)
+        STATS["total_links_map_keys"] = len(pool_map)
         
         _dlog(
-            f"[index] Indexed {len(LINK_POOL_LIST)} flat link records and "
-            f"{len(LINK_POOL)} unique URL keys from {len(sheets)} sheets "
+            f"[index] Indexed {len(pool_list)} flat link records and "
+            f"{len(pool_map)} unique URL keys from {len(sheets)} sheets "
             f"in {round(time.time()-start_ts,2)}s"
         )
-        return rows, sheets
+        if modified and not incomplete:
+            _save_index_state({
+                "spreadsheet_id": DEFAULT_SPREADSHEET_ID,
+                "modified_time": modified,
+                "deep": deep,
+                "built_at": STATS["built_at"],
+            })
+        return built
@@ -1,6 +1,7 @@
 """
 Link Extractor Service - Extract links from sheets and process student data from linked documents.
 """
+import asyncio
 import re
 import os
 import io
@@ -624,8 +625,38 @@ class LinkExtractor:
                 _dlog(f"[link_extractor] Error processing Doc {file_id}: {e}")
             return []
     
+    # Linked files fetched at once; keeps bursts well under the Sheets/Drive per-user quota
+    LINKED_FILE_CONCURRENCY = 10
+
+    @staticmethod
+    def _fetch_link(link: Dict[str, Any], main_title: str) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """
+        Fetch one linked file and extract its student records (no DB writes).
+        Runs in a worker thread. Returns (file_type or None if skipped, records).
+        """
+        file_id = link['file_id']
+        file_type = link['file_type']
+        context = link.get('context', '')
+        row = link.get('row', '?')
+        col = link.get('col', '?')
+        
+        _dlog(f"[link_extractor] Processing link at Row {row}, Col {col} - File ID: {file_id} (Type: {file_type})")
+        
+        if file_type == 'sheets':
+            records = LinkExtractor.process_linked_sheet(file_id, context)
+        elif file_type == 'docs':
+            records = LinkExtractor.process_linked_doc(file_id, context)
+        else:
+            _dlog(f"[link_extractor] Skipping drive file: {file_id} (Row {row}, Col {col})")
+            return None, []
+
+        # Inject main sheet info
+        for rec in records:
+            rec['main_sheet'] = main_title
+        return file_type, records
+
     @staticmethod
-    def scan_main_sheet_and_process_links(
+    async def scan_main_sheet_and_process_links(
         spreadsheet_id: Optional[str] = None,
         sheet_names: Optional[List[str]] = None,
         dry_run: bool = False,
@@ -639,6 +670,11 @@ class LinkExtractor:
         4. If Docs: extract from tables (TODO)
         5. Populate database
         
+        Linked files are fetched concurrently (LINKED_FILE_CONCURRENCY at a time) on
+        worker threads; the blocking Google/MySQL clients never run on the event loop.
+        DB writes go through one writer at a time: concurrent upserts of the same
+        student/link keys in different orders would deadlock and drop whole chunks.
+        
         Returns: {
             "ok": bool,
             "main_sheet": str,
@@ -657,14 +693,14 @@ class LinkExtractor:
         if not spreadsheet_id:
             return {"ok": False, "error": "No spreadsheet ID provided"}
         
-        client = get_gspread_client()
+        client = await asyncio.to_thread(get_gspread_client)
         if not client:
             return {"ok": False, "error": "Cannot get gspread client"}
         
         try:
             _dlog(f"[link_extractor] Opening main spreadsheet: {spreadsheet_id}")
-            ss = client.open_by_key(spreadsheet_id)
-            worksheets = ss.worksheets()
+            ss = await asyncio.to_thread(client.open_by_key, spreadsheet_id)
+            worksheets = await asyncio.to_thread(ss.worksheets)
             _dlog(f"[link_extractor] Opened '{ss.title}' with {len(worksheets)} sheets")
         except Exception as e:
             return {"ok": False, "error": f"Cannot open spreadsheet: {e}"}
@@ -676,7 +712,7 @@ class LinkExtractor:
         # Step 1: Extract all links from main sheet(s)
         all_links = []
         for ws in worksheets:
-            links = LinkExtractor.extract_links_from_sheet(ws)
+            links = await asyncio.to_thread(LinkExtractor.extract_links_from_sheet, ws)
             all_links.extend(links)
         
         _dlog(f"[link_extractor] Total links found: {len(all_links)}")
@@ -689,45 +725,38 @@ class LinkExtractor:
                 "links": all_links
             }
         
-        # Step 2: Process each link
+        # Step 2: Fetch links concurrently, write them one file at a time (results come back in link order)
+        semaphore = asyncio.Semaphore(LinkExtractor.LINKED_FILE_CONCURRENCY)
+        write_lock = asyncio.Lock()
+        
+        async def process(link: Dict[str, Any]):
+            file_id = link.get('file_id')
+            async with semaphore:
+                try:
+                    file_type, records = await asyncio.to_thread(LinkExtractor._fetch_link, link, ss.title)
+                except Exception as e:
+                    _dlog(f"[link_extractor] Failed processing {file_id}: {e}")
+                    return link.get('file_type'), [], 0
+            if dry_run or not records:
+                return file_type, records, 0
+            async with write_lock:  # released the fetch slot: other files keep downloading meanwhile
+                try:
+                    inserted = await asyncio.to_thread(batch_insert_student_links, records)
+                except Exception as e:
+                    _dlog(f"[link_extractor] Failed inserting records from {file_id}: {e}")
+                    return file_type, [], 0
+            _dlog(f"[link_extractor] Inserted {inserted} records from {file_id}")
+            return file_type, [], inserted  # records not kept: only the count is reported
+        
+        outcomes = await asyncio.gather(*(process(link) for link in all_links))
+        
         all_records = []  # Only used for dry_run or summary if needed
-        sheets_processed = 0
-        docs_processed = 0
-        total_inserted = 0
-        
-        for link in all_links:
-            file_id = link['file_id']
-            file_type = link['file_type']
-            context = link.get('context', '')
-            row = link.get('row', '?')
-            col = link.get('col', '?')
-            
-            _dlog(f"[link_extractor] Processing link at Row {row}, Col {col} - File ID: {file_id} (Type: {file_type})")
-            
-            records = []
-            if file_type == 'sheets':
-                records = LinkExtractor.process_linked_sheet(file_id, context)
-                sheets_processed += 1
-            
-            elif file_type == 'docs':
-                records = LinkExtractor.process_linked_doc(file_id, context)
-                docs_processed += 1
-            
-            else:
-                _dlog(f"[link_extractor] Skipping drive file: {file_id} (Row {row}, Col {col})")
-                continue
-
-            # Inject main sheet info
-            for rec in records:
-                rec['main_sheet'] = ss.title
-
-            if dry_run:
+        sheets_processed = sum(1 for file_type, _, _ in outcomes if file_type == 'sheets')
+        docs_processed = sum(1 for file_type, _, _ in outcomes if file_type == 'docs')
+        total_inserted = sum(inserted for _, _, inserted in outcomes)
+        if dry_run:
+            for _, records, _ in outcomes:
                 all_records.extend(records)
-            else:
-                if records:
-                    inserted = batch_insert_student_links(records)
-                    total_inserted += inserted
-                    _dlog(f"[link_extractor] Inserted {inserted} records from {file_id}")
         
         result = {
             "ok": True,
@@ -0,0 +1,88 @@
+"""Link write buffer - coalesces per-request link inserts into batched MySQL writes."""
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from backend.config import db_mysql, debug_log as _dlog
+
+_STOP = object()  # sentinel queued by stop(): flush the current batch, then exit
+
+
+class LinkWriteBuffer:
+    """
+    Queue of link records drained by one background task.
+
+    Each flush sends up to `max_batch` records as a single multi-row INSERT
+    (db_mysql.insert_links_batch), instead of one round-trip per add_link call.
+    A batch is flushed when it is full or `flush_interval` seconds after its
+    first record arrived.
+    """
+
+    def __init__(self, max_batch: int = 500, flush_interval: float = 0.05, max_pending: int = 10_000):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the flusher task on the running event loop (idempotent)."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._task = asyncio.create_task(self._flusher())
+
+    async def put(self, record: Dict[str, Any]) -> None:
+        """Enqueue a link record; waits only when max_pending records are already queued."""
+        await self._queue.put(record)
+
+    async def stop(self) -> None:
+        """Stop the flusher and write whatever is still queued."""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def _flusher(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = loop.time() + self.flush_interval
+            stopping = False
+            while len(batch) < self.max_batch:
+                try:
+                    record = self._queue.get_nowait()  # burst: no timer per record
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        record = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch or not db_mysql:
+            return
+        try:
+            inserted, _ = await asyncio.to_thread(db_mysql.insert_links_batch, batch)
+            _dlog(f"[link_writer] Flushed {inserted} links to MySQL")
+        except Exception as e:
+            _dlog(f"[link_writer] MySQL flush of {len(batch)} links failed: {e}")
+
+
+link_write_buffer = LinkWriteBuffer()
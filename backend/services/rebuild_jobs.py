@@ -0,0 +1,142 @@
+"""Rebuild jobs - index rebuilds run as background tasks, progress fanned out to SSE streams."""
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from cachetools import TTLCache
+
+from backend.config import (
+    DATABASE_ROWS,
+    SHEETS,
+    LINK_POOL,
+    LINK_POOL_LIST,
+    STATS,
+    debug_log as _dlog
+)
+from backend.models import RebuildResponse, BuildStats
+from backend.services.health_snapshot import health_snapshot
+from backend.services.index_service import IndexService
+
+_TERMINAL = ("done", "error")
+
+
+@dataclass
+class RebuildJob:
+    """
+    One rebuild run and every event it produced.
+
+    Events are kept in order so a client that connects late (or reconnects)
+    replays the sheets already indexed before following the live ones.
+    """
+    job_id: str
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    _subscribers: Set[asyncio.Queue] = field(default_factory=set, repr=False)
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return bool(self.events) and self.events[-1]["event"] in _TERMINAL
+
+    @property
+    def status(self) -> str:
+        return self.events[-1]["event"] if self.finished else "running"
+
+    def publish(self, event: str, data: Any) -> None:
+        """Record an event and hand it to every open stream (event loop thread only)."""
+        item = {"event": event, "data": data}
+        self.events.append(item)
+        for queue in self._subscribers:
+            queue.put_nowait(item)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Queue pre-filled with the events so far, then fed live events."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in self.events:
+            queue.put_nowait(item)
+        if not self.finished:
+            self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+
+class RebuildJobs:
+    """
+    Registry of rebuild jobs; at most one runs at a time.
+
+    The build itself runs on a worker thread (it blocks on Google APIs for
+    minutes). Per-sheet stats are pushed back onto the event loop with
+    call_soon_threadsafe, so the SSE streams see each sheet as it finishes.
+    Finished jobs stay readable for an hour.
+    """
+
+    def __init__(self, keep_seconds: int = 3600, max_jobs: int = 32):
+        self._jobs: TTLCache = TTLCache(maxsize=max_jobs, ttl=keep_seconds)
+        self._current: Optional[RebuildJob] = None
+
+    @property
+    def running(self) -> bool:
+        return self._current is not None and not self._current.finished
+
+    def get(self, job_id: str) -> Optional[RebuildJob]:
+        return self._jobs.get(job_id)
+
+    def start(self, verbose: bool = False, deep: bool = False, incremental: bool = True) -> RebuildJob:
+        """Start a rebuild task, or return the one already running."""
+        if self.running:
+            return self._current
+        job = RebuildJob(job_id=uuid.uuid4().hex)
+        self._jobs[job.job_id] = job
+        self._current = job
+        job._task = asyncio.create_task(self._run(job, verbose, deep, incremental))
+        return job
+
+    async def _run(self, job: RebuildJob, verbose: bool, deep: bool, incremental: bool) -> None:
+        loop = asyncio.get_running_loop()
+        start = time.time()
+
+        def on_sheet(stat: Dict[str, Any]) -> None:
+            loop.call_soon_threadsafe(job.publish, "sheet", dict(stat))
+
+        # Incremental: only if the spreadsheet changed since the last build
+        build = IndexService.build_incremental if incremental and DATABASE_ROWS else IndexService.build_index
+        health_snapshot.rebuilding.set()
+        health_snapshot.refresh()
+        try:
+            links_mark = len(LINK_POOL_LIST)  # add_link calls after this are carried over
+            built = await asyncio.to_thread(build, verbose=verbose, deep=deep, on_sheet=on_sheet)
+
+            # The worker built private rows/link pools; swap them in here, on the loop
+            if built is not None:
+                IndexService.apply(built, links_mark)
+        except Exception as e:
+            _dlog(f"[rebuild] job {job.job_id} failed: {e}")
+            job.publish("error", {"ok": False, "error": str(e)})
+            return
+        finally:
+            health_snapshot.rebuilding.clear()
+            health_snapshot.refresh()
+
+        result = RebuildResponse(
+            ok=True,
+            indexed_rows=len(DATABASE_ROWS),
+            sheets=SHEETS,
+            total_links=len(LINK_POOL_LIST),
+            unique_urls=len(LINK_POOL),
+            duration_seconds=time.time() - start,
+            stats=[BuildStats(**s) for s in STATS.get("per_sheet", [])],
+            skipped=built is None
+        )
+        job.publish("done", result.model_dump())
+
+
+def format_sse(item: Dict[str, Any]) -> str:
+    """One Server-Sent Events message."""
+    return f"event: {item['event']}\ndata: {json.dumps(item['data'], ensure_ascii=False)}\n\n"
+
+
+rebuild_jobs = RebuildJobs()
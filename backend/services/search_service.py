@@ -1,8 +1,11 @@
 """Search service - business logic for searching."""
-from typing import Any, Dict, List
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 import re
 import time
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
 
 from backend.config import DATABASE_ROWS
 from backend.utils.text_processing import fix_vietnamese_text, fold_vietnamese, normalize_query
@@ -13,32 +16,123 @@ def _tokens(q_fold: str) -> List[str]:
     return [t for t in re.split(r"\s+", q_fold) if len(t) >= 2]
 
 
+@lru_cache(maxsize=1024)
+def _compiled_tokens(q_fold: str) -> Tuple[re.Pattern, ...]:
+    """Word-boundary patterns for each query token, compiled once per query."""
+    return tuple(re.compile(rf"\b{re.escape(t)}\b") for t in _tokens(q_fold))
+
+
 def _all_tokens_in_text(q_fold: str, text_fold: str) -> bool:
     """Check if all query tokens appear in text (word boundary)."""
-    toks = _tokens(q_fold)
-    return all(re.search(rf"\b{re.escape(tok)}\b", text_fold) for tok in toks)
+    return all(p.search(text_fold) for p in _compiled_tokens(q_fold))
 
 
-def _snippet(s: str, q: str, window: int = 60) -> str:
-    """Extract snippet around query match."""
-    s_fix = fix_vietnamese_text(s)
-    q_fix = fix_vietnamese_text(q)
-    s_fold = fold_vietnamese(s_fix)
-    q_fold = fold_vietnamese(q_fix)
-    
-    m = re.search(re.escape(q_fold), s_fold, flags=re.IGNORECASE)
-    if not m:
+def _snippet(s_fix: str, s_fold: str, q_fold: str, window: int = 60) -> str:
+    """
+    Extract snippet around query match.
+    Takes already fixed/folded text; folded text is lowercase, so a plain
+    str.find is enough (no regex).
+    """
+    i = s_fold.find(q_fold)
+    if i < 0:
         return s_fix[:window * 2]
     
-    i = m.start()
     left = max(0, i - window)
     right = min(len(s_fix), i + window)
     return s_fix[left:right]
 
 
+_SEP = "\0"  # row separator in the text blobs; never produced by the sheet text
+
+
+def _offsets(texts: List[str]) -> List[int]:
+    """Start offset of each text in _SEP.join(texts)."""
+    starts, pos = [], 0
+    for text in texts:
+        starts.append(pos)
+        pos += len(text) + 1
+    return starts
+
+
+@dataclass(frozen=True)
+class _TextColumn:
+    """One text per row, plus the same texts joined into a single blob for str.find."""
+    texts: List[str]
+    blob: str
+    starts: List[int]
+
+    @classmethod
+    def build(cls, texts: List[str]) -> "_TextColumn":
+        return cls(texts, _SEP.join(texts), _offsets(texts))
+
+    def rows_containing(self, needle: str) -> List[int]:
+        """Indices of rows whose text contains `needle` (ascending)."""
+        if not needle or _SEP in needle:
+            return [i for i, t in enumerate(self.texts) if needle in t]
+        hits = []
+        starts, blob = self.starts, self.blob
+        pos = blob.find(needle)
+        while pos >= 0:
+            i = bisect_right(starts, pos) - 1
+            hits.append(i)
+            pos = blob.find(needle, starts[i + 1]) if i + 1 < len(starts) else -1
+        return hits
+
+
+@dataclass(frozen=True)
+class _RowColumns:
+    """
+    Column-wise (structure-of-arrays) copy of the texts in DATABASE_ROWS.
+
+    Searches scan flat lists of str instead of one dict lookup per row, and
+    substring queries run one str.find pass over a joined blob per column;
+    a hit's row index comes from bisecting the row start offsets.
+    `rows` pins the row dicts the columns were built from, so indices stay valid
+    even if the index is swapped mid-search.
+    """
+    generation: int
+    rows: List[Dict[str, Any]]
+    fixed: List[str]
+    fixed_lower: _TextColumn
+    fold: _TextColumn
+
+    @classmethod
+    def build(cls, rows: List[Dict[str, Any]], generation: int) -> "_RowColumns":
+        rows = list(rows)
+        fixed = [row["text_fixed"] for row in rows]
+        return cls(
+            generation,
+            rows,
+            fixed,
+            _TextColumn.build([t.lower() for t in fixed]),
+            _TextColumn.build([row["text_fold"] for row in rows]),
+        )
+
+
+_COLUMNS: Optional[_RowColumns] = None
+_GENERATION = 0  # bumped by SearchService.invalidate() whenever DATABASE_ROWS is replaced
+
+
+def _columns() -> _RowColumns:
+    """Column store for the current rows, built on first use after each invalidate()."""
+    global _COLUMNS
+    cols = _COLUMNS
+    generation = _GENERATION
+    if cols is None or cols.generation != generation:
+        cols = _COLUMNS = _RowColumns.build(DATABASE_ROWS, generation)
+    return cols
+
+
 class SearchService:
     """Service for searching in indexed rows."""
     
+    @staticmethod
+    def invalidate() -> None:
+        """Mark the column store stale; call after DATABASE_ROWS is replaced."""
+        global _GENERATION, _COLUMNS
+        _GENERATION += 1
+        _COLUMNS = None  # free the old texts now, not at the next search
+    
     @staticmethod
     def search_rows(
         query: str,
@@ -58,41 +152,52 @@ class SearchService:
         Returns:
             List of search results sorted by score
         """
-        results: List[tuple[int, Dict[str, Any]]] = []
         if not query or not str(query).strip():
             return []
         
         q_fixed, q_fold = normalize_query(query)
+        cols = _columns()
+        rows = cols.rows
+        scores: Dict[int, float] = {}
         
-        for row in DATABASE_ROWS:
-            raw = row.get("text") or ""
-            text_fixed = fix_vietnamese_text(raw)
-            text_fold = fold_vietnamese(text_fixed)
-            
-            if exact:
-                ok = _all_tokens_in_text(q_fold, text_fold)
-                score = 100 if ok else 0
-            else:
-                if q_fixed.lower() in text_fixed.lower() or q_fold in text_fold:
-                    score = 100
-                else:
-                    score = max(
-                        fuzz.partial_ratio(q_fixed, text_fixed),
-                        fuzz.partial_ratio(q_fold, text_fold)
-                    )
-            
-            if score >= (100 if exact else fuzz_threshold):
-                results.append((score, {
-                    "sheet": row["sheet"],
-                    "row": row["row"],
-                    "snippet": _snippet(text_fixed, q_fixed),
-                    "snippet_nodau": _snippet(text_fold, q_fold),
-                    "links": sorted(set(row.get("links", []))),
-                    "score": score
-                }))
+        if exact:
+            # Rows containing every token as a substring (blob scans), then word boundaries
+            candidates: Optional[set] = None
+            for t in _tokens(q_fold):
+                hits = set(cols.fold.rows_containing(t))
+                candidates = hits if candidates is None else candidates & hits
+            for i in (range(len(cols.fixed)) if candidates is None else sorted(candidates)):
+                if _all_tokens_in_text(q_fold, cols.fold.texts[i]):
+                    scores[i] = 100
+        else:
+            # Fuzzy scores for all rows in two batched RapidFuzz calls (C++ loop, rows
+            # under the threshold are pruned inside the scorer) instead of 2 calls per row
+            for texts, q in ((cols.fixed, q_fixed), (cols.fold.texts, q_fold)):
+                for _, score, i in process.extract(q, texts, scorer=fuzz.partial_ratio,
+                                                   score_cutoff=fuzz_threshold, limit=None):
+                    if score > scores.get(i, -1):
+                        scores[i] = score
+            for i in cols.fixed_lower.rows_containing(q_fixed.lower()):
+                scores[i] = 100
+            for i in cols.fold.rows_containing(q_fold):
+                scores[i] = 100
         
-        results.sort(key=lambda x: x[0], reverse=True)
-        return [r for _, r in results[:top_k]]
+        # Highest score first, ties in index order
+        ranked = sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:top_k]
+        results: List[Dict[str, Any]] = []
+        for i, score in ranked:
+            row = rows[i]
+            text_fixed = row["text_fixed"]
+            text_fold = row["text_fold"]
+            results.append({
+                "sheet": row["sheet"],
+                "row": row["row"],
+                "snippet": _snippet(text_fixed, text_fold, q_fold),
+                "snippet_nodau": _snippet(text_fold, text_fold, q_fold),
+                "links": sorted(set(row.get("links", []))),
+                "score": score
+            })
+        return results
     
     @staticmethod
     def search_with_timing(
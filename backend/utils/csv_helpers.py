@@ -5,7 +5,7 @@ import io
 import csv
 import re
 import requests
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
 from backend.utils.text_processing import fix_vietnamese_text, decode_http_response
 from backend.utils.url_helpers import (
@@ -28,6 +28,15 @@ def read_csv_text(csv_text: str) -> List[List[str]]:
     return [row for row in reader]
 
 
+def read_csv_text_iter(csv_text: str) -> Iterator[List[str]]:
+    """
+    Lazy version of read_csv_text: yields rows one at a time.
+    Use with itertools.islice to bound memory when only the first N rows are needed.
+    """
+    csv_text = fix_vietnamese_text(csv_text)
+    return csv.reader(io.StringIO(csv_text))
+
+
 def read_csv_bytes(csv_bytes: bytes, encoding_hint: Optional[str] = None) -> List[List[str]]:
     """
     Parse CSV from bytes with proper encoding detection.
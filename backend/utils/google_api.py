@@ -5,6 +5,7 @@ Handles gspread, Google Sheets API, and Google Drive API clients.
 import os
 import io
 import re
+import threading
 from typing import Any, Dict, List, Optional
 
 from backend.config import (
@@ -12,6 +13,7 @@ from backend.config import (
     HAS_GSPREAD,
     HAS_GOOGLE_API,
     DRIVE_META_CACHE,
+    DRIVE_META_LOCK,
     debug_log,
 )
 
@@ -30,9 +32,9 @@ if HAS_GOOGLE_API:
 # =========================
 # Singleton Services
 # =========================
-_SHEETS_SERVICE = None
-_DRIVE_SERVICE = None
-_DOCS_SERVICE = None
+# googleapiclient services sit on httplib2, which is not thread-safe:
+# one service instance per thread (linked files are fetched from worker threads)
+_SERVICES = threading.local()
 
 # =========================
 # Helper Functions
@@ -73,10 +75,10 @@ def get_gspread_client() -> Optional["gspread.Client"]:
 # Google Sheets API Service
 # =========================
 def get_sheets_service():
-    """Get or create Sheets API service singleton."""
-    global _SHEETS_SERVICE
-    if _SHEETS_SERVICE:
-        return _SHEETS_SERVICE
+    """Get or create the Sheets API service for this thread."""
+    svc = getattr(_SERVICES, "sheets", None)
+    if svc:
+        return svc
     
     if not HAS_GOOGLE_API or Credentials is None:
         debug_log("[sheets] googleapiclient not available")
@@ -90,8 +92,8 @@ def get_sheets_service():
                 "https://www.googleapis.com/auth/drive.readonly",
             ],
         )
-        _SHEETS_SERVICE = build("sheets", "v4", credentials=creds, cache_discovery=False)
-        return _SHEETS_SERVICE
+        _SERVICES.sheets = build("sheets", "v4", credentials=creds, cache_discovery=False)
+        return _SERVICES.sheets
     except Exception as e:
         debug_log(f"[sheets] cannot build service: {e}")
         return None
@@ -101,10 +103,10 @@ def get_sheets_service():
 # Google Drive API Service
 # =========================
 def get_drive_service():
-    """Get or create Drive API service singleton."""
-    global _DRIVE_SERVICE
-    if _DRIVE_SERVICE:
-        return _DRIVE_SERVICE
+    """Get or create the Drive API service for this thread."""
+    svc = getattr(_SERVICES, "drive", None)
+    if svc:
+        return svc
     
     if not HAS_GOOGLE_API or Credentials is None:
         debug_log("[drive] googleapiclient not available")
@@ -115,8 +117,8 @@ def get_drive_service():
             _resolve_creds_path(GOOGLE_CREDS),
             scopes=["https://www.googleapis.com/auth/drive.readonly"],
         )
-        _DRIVE_SERVICE = build("drive", "v3", credentials=creds, cache_discovery=False)
-        return _DRIVE_SERVICE
+        _SERVICES.drive = build("drive", "v3", credentials=creds, cache_discovery=False)
+        return _SERVICES.drive
     except Exception as e:
         debug_log(f"[drive] cannot build service: {e}")
         return None
@@ -126,10 +128,10 @@ def get_drive_service():
 # Google Docs API Service
 # =========================
 def get_docs_service():
-    """Get or create Docs API service singleton."""
-    global _DOCS_SERVICE
-    if _DOCS_SERVICE:
-        return _DOCS_SERVICE
+    """Get or create the Docs API service for this thread."""
+    svc = getattr(_SERVICES, "docs", None)
+    if svc:
+        return svc
     
     if not HAS_GOOGLE_API or Credentials is None:
         debug_log("[docs] googleapiclient not available")
@@ -140,8 +142,8 @@ def get_docs_service():
             _resolve_creds_path(GOOGLE_CREDS),
             scopes=["https://www.googleapis.com/auth/documents.readonly"],
         )
-        _DOCS_SERVICE = build("docs", "v1", credentials=creds, cache_discovery=False)
-        return _DOCS_SERVICE
+        _SERVICES.docs = build("docs", "v1", credentials=creds, cache_discovery=False)
+        return _SERVICES.docs
     except Exception as e:
         debug_log(f"[docs] cannot build service: {e}")
         return None
@@ -158,8 +160,10 @@ def get_drive_file_meta(file_id: str) -> Optional[dict]:
     if not file_id:
         return None
     
-    if file_id in DRIVE_META_CACHE:
-        return DRIVE_META_CACHE[file_id]
+    with DRIVE_META_LOCK:
+        cached = DRIVE_META_CACHE.get(file_id)
+    if cached is not None:
+        return cached
     
     svc = get_drive_service()
     if not svc:
@@ -185,7 +189,8 @@ def get_drive_file_meta(file_id: str) -> Optional[dict]:
                 "mimeType": meta2.get("mimeType")
             }
         
-        DRIVE_META_CACHE[file_id] = meta
+        with DRIVE_META_LOCK:
+            DRIVE_META_CACHE[file_id] = meta
         return meta
     
     except Exception as e:
@@ -193,6 +198,22 @@ def get_drive_file_meta(file_id: str) -> Optional[dict]:
         return None
 
 
+def get_drive_modified_time(file_id: str) -> Optional[str]:
+    """
+    Get a Drive file's RFC 3339 modifiedTime (not cached: used to detect edits).
+    Returns None if the Drive API is unavailable or the call fails.
+    """
+    svc = get_drive_service()
+    if not svc or not file_id:
+        return None
+    try:
+        meta = svc.files().get(fileId=file_id, fields="modifiedTime").execute()
+        return meta.get("modifiedTime")
+    except Exception as e:
+        debug_log(f"[drive] get modifiedTime failed {file_id}: {e}")
+        return None
+
+
 def download_drive_file(file_id: str) -> Optional[bytes]:
     """Download file content from Drive."""
     svc = get_drive_service()
@@ -286,10 +307,10 @@ def get_sheet_values_as_csv(file_id: str, gid: Optional[str]) -> Optional[str]:
 # Google Docs API Service 
 # =========================
 def get_docs_service():
-    """Get or create Docs API service singleton."""
-    global _DOCS_SERVICE
-    if _DOCS_SERVICE:
-        return _DOCS_SERVICE
+    """Get or create the Docs API service for this thread."""
+    svc = getattr(_SERVICES, "docs", None)
+    if svc:
+        return svc
     
     if not HAS_GOOGLE_API or Credentials is None:
         debug_log("[docs] googleapiclient not available")
@@ -303,8 +324,8 @@ def get_docs_service():
                 "https://www.googleapis.com/auth/drive.readonly",
             ],
         )
-        _DOCS_SERVICE = build("docs", "v1", credentials=creds, cache_discovery=False)
-        return _DOCS_SERVICE
+        _SERVICES.docs = build("docs", "v1", credentials=creds, cache_discovery=False)
+        return _SERVICES.docs
     except Exception as e:
         debug_log(f"[docs] cannot build service: {e}")
         return None
@@ -4,10 +4,16 @@ Handles encoding fixes, diacritic removal, and text normalization.
 """
 import re
 import unicodedata
+from functools import lru_cache
 from typing import Optional, Tuple
 
 from ftfy import fix_text, fix_encoding
 
+# Cell-sized strings repeat a lot (headers, unit names, queries); memoize those.
+# Whole documents are not cached so the LRU never pins megabytes of text.
+_CACHE_MAX_LEN = 1024
+_CACHE_SIZE = 200_000
+
 # Mojibake detection patterns
 _MOJIBAKE_SIGNS = ("Ã", "Â", "Æ°", "Ä'", "áº", "á»", "â€", "Ê", "Ð", "Þ")
 
@@ -45,12 +51,18 @@ def fix_vietnamese_text(s: str) -> str:
     3. cp1252 -> utf-8 if still has mojibake
     4. ftfy.fix_text + normalize Unicode to NFC
     
-    This is the primary text fixing function.
+    This is the primary text fixing function. Results for short strings
+    are memoized.
     """
     if s is None:
         return ""
-    s0 = str(s)
+    s0 = s if isinstance(s, str) else str(s)
+    if len(s0) <= _CACHE_MAX_LEN:
+        return _fix_vietnamese_text_cached(s0)
+    return _fix_vietnamese_text_impl(s0)
+
 
+def _fix_vietnamese_text_impl(s0: str) -> str:
     # Step 1: fix_encoding
     try:
         s1 = fix_encoding(s0)
@@ -83,6 +95,9 @@ def fix_vietnamese_text(s: str) -> str:
     return s4.strip()
 
 
+_fix_vietnamese_text_cached = lru_cache(maxsize=_CACHE_SIZE)(_fix_vietnamese_text_impl)
+
+
 def fold_vietnamese(s: str) -> str:
     """
     Remove Vietnamese diacritics for fuzzy matching.
@@ -93,17 +108,65 @@ def fold_vietnamese(s: str) -> str:
     - NFKD decomposition
     - Remove combining characters
     - Lowercase
+
+    Results for short strings are memoized.
     """
     if not isinstance(s, str):
         s = "" if s is None else str(s)
-    
-    s = fix_vietnamese_text(s)
-    s = s.replace("đ", "d").replace("Đ", "D")
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    if len(s) <= _CACHE_MAX_LEN:
+        return _fold_vietnamese_cached(s)
+    return _fold_vietnamese_impl(s)
+
+
+def _fold_vietnamese_impl(s: str) -> str:
+    # Table lookup in C handles Vietnamese/Latin text; only text that still has
+    # non-ASCII characters afterwards (CJK, compatibility forms, ...) pays for
+    # the per-character NFKD pass. Both paths give the same result.
+    s = fix_vietnamese_text(s).translate(_FOLD_TABLE)
+    if not s.isascii():
+        s = unicodedata.normalize("NFKD", s)
+        s = "".join(ch for ch in s if not unicodedata.combining(ch))
     return s.lower()
 
 
+_fold_vietnamese_cached = lru_cache(maxsize=_CACHE_SIZE)(_fold_vietnamese_impl)
+
+
+def _build_fold_table() -> dict:
+    """
+    Build a str.translate table equivalent to fold_vietnamese's NFKD + strip-combining
+    step for Latin letters (Latin-1, Extended-A/B, Extended Additional) plus đ/Đ.
+    Bare combining marks (text already in NFD) are dropped.
+    """
+    table = {}
+    for cp in list(range(0x00C0, 0x0250)) + list(range(0x1E00, 0x1F00)):
+        ch = chr(cp)
+        base = "".join(c for c in unicodedata.normalize("NFKD", ch) if not unicodedata.combining(c))
+        if base != ch:
+            table[cp] = base
+    for cp in range(0x0300, 0x0370):
+        table[cp] = None
+    table[ord("đ")] = "d"
+    table[ord("Đ")] = "D"
+    return table
+
+
+_FOLD_TABLE = _build_fold_table()
+
+
+def fold_vi_fast(s: str) -> str:
+    """
+    Fast diacritic folding via str.translate (runs in C).
+
+    Unlike fold_vietnamese this does NOT fix encoding: pass text that has
+    already been through fix_vietnamese_text. Output matches fold_vietnamese
+    on such text.
+    """
+    if not isinstance(s, str):
+        s = "" if s is None else str(s)
+    return s.translate(_FOLD_TABLE).lower()
+
+
 def normalize_query(q: str) -> Tuple[str, str]:
     """
     Normalize a search query.
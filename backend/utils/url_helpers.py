@@ -3,6 +3,7 @@ URL parsing and validation utilities.
 Handles Google Sheets/Docs URLs, file ID extraction, and export URL generation.
 """
 import re
+from functools import lru_cache
 from typing import List, Optional, Tuple
 from urllib.parse import urlparse, parse_qs
 
@@ -25,6 +26,9 @@ _GSHEETS_ID_PATTERNS = [
 # =========================
 # File ID Extraction
 # =========================
+# Classification/extraction helpers below are pure and get called repeatedly
+# on the same URLs (LINK_POOL has many duplicates), so they are memoized.
+@lru_cache(maxsize=65536)
 def extract_gsheets_file_id(url: str) -> Optional[str]:
     """Extract Google Sheets/Drive file ID from URL."""
     for pat in _GSHEETS_ID_PATTERNS:
@@ -34,6 +38,7 @@ def extract_gsheets_file_id(url: str) -> Optional[str]:
     return None
 
 
+@lru_cache(maxsize=65536)
 def extract_gid_from_url(url: str) -> Optional[str]:
     """
     Extract GID (sheet ID) from Google Sheets URL.
@@ -58,6 +63,7 @@ def extract_gid_from_url(url: str) -> Optional[str]:
 # =========================
 # URL Type Detection
 # =========================
+@lru_cache(maxsize=65536)
 def is_google_sheets_url(url: str) -> bool:
     """Check if URL is a Google Sheets URL."""
     try:
@@ -70,6 +76,7 @@ def is_google_sheets_url(url: str) -> bool:
         return False
 
 
+@lru_cache(maxsize=65536)
 def is_google_docs_url(url: str) -> bool:
     """Check if URL is a Google Docs URL."""
     try:
@@ -79,6 +86,7 @@ def is_google_docs_url(url: str) -> bool:
         return False
 
 
+@lru_cache(maxsize=65536)
 def classify_google_url(url: str) -> Tuple[str, Optional[str], Optional[str]]:
     """
     Classify Google URL and extract metadata.